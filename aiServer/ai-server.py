@@ -1,23 +1,110 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+import time
+
+# 프로세스 시작 시각 (import 포함 기동 시간 측정용)
+_T0 = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, WebSocket
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-import shutil
+import asyncio
 import os
-import requests
 import json
-import time
-import numpy as np
-import cv2
-import joblib
+import uuid
+import contextvars
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from ultralytics import YOLO
+from typing import List
+
+# 서비스 모듈 임포트 (torch / ultralytics / joblib 등 무거운 의존성은 모델 로드 시점에 import)
+from services import vision_service
+from services.vision_service import analyze_leaf_area, analyze_leaf_area_batch, is_valid_result
+from services.predict_service import predict_harvest_days, predict_harvest_days_batch, evaluate_growth_status, harvest_registry
+from services.inference_pool import InferenceExecutor, QueueFullError, DeadlineExceededError
+from services.outbox_service import Outbox
+from services.cache_service import ResultCache
+from services.growth_service import GrowthStore
+from services.coalesce_service import SingleFlight
+from services.crop_registry import CROPS, UnknownCropError, get_crop, model_cache
+from services.stream_service import FrameStreamServer
+from services.logging_service import get_logger, request_id_var
+from services.metrics_service import Counter, Gauge, STAGE_SECONDS, REQUESTS_TOTAL, render_metrics
+
+IMPORT_SECONDS = time.perf_counter() - _T0
+
+logger = get_logger("server")
+
+# 블로킹 추론 전용 워커 풀 (이벤트 루프가 멈추지 않도록 분리)
+inference_executor = InferenceExecutor()
+
+# 일괄 분석 마감 시간(초) - 이미지 수가 많으므로 단건보다 길게
+BATCH_TIMEOUT = float(os.getenv("AI_BATCH_TIMEOUT", "300"))
+
+# =========================================================
+# [기동] 모델 로드는 백그라운드에서 진행 (준비 전 요청은 503 + Retry-After)
+# =========================================================
+startup_state = {"ready": False, "done": False, "seconds": {"import": round(IMPORT_SECONDS, 3)}}
+
+def _timed(name, fn):
+    """기동 단계 실행 시간을 startup_state에 기록"""
+    start = time.perf_counter()
+    try:
+        return fn()
+    finally:
+        startup_state["seconds"][name] = round(time.perf_counter() - start, 3)
+
+def _load_models():
+    """Vision / 수확 예측 모델 로드 + 워밍업 (process 모드는 이어서 워커 fork)"""
+    vision_ok = _timed("vision_model", vision_service.load_model)
+    startup_state["seconds"]["vision_load"] = round(vision_service.load_seconds, 3)
+    startup_state["seconds"]["vision_warmup"] = round(vision_service.warmup_seconds, 3)
+    try:
+        harvest_version = _timed("harvest_model", harvest_registry.load)
+    except Exception as e:
+        logger.error("Harvest Model Load Failed", error=str(e))
+        harvest_version = None
+    if inference_executor.mode == "process":
+        # 모델을 부모에 올린 뒤 워커를 fork -> 워커들이 가중치 메모리를 copy-on-write로 공유
+        _timed("executor_start", inference_executor.start)
+    return vision_ok, harvest_version is not None
+
+def _run_startup():
+    try:
+        vision_ok, harvest_ok = _load_models()
+        startup_state["ready"] = vision_ok and harvest_ok
+    except Exception as e:
+        logger.error("Startup Failed", error=str(e))
+    finally:
+        startup_state["done"] = True
+        startup_state["seconds"]["total"] = round(time.perf_counter() - _T0, 3)
+        logger.info("Startup Complete", ready=startup_state["ready"], **startup_state["seconds"])
 
-# 서비스 모듈 임포트
-from services.vision_service import analyze_leaf_area
-from services.predict_service import predict_harvest_days, evaluate_growth_status
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    process_mode = inference_executor.mode == "process"
+    if process_mode:
+        # 워커 fork는 다른 스레드(전송 대기열 / 생육 저장 / to_thread 풀)가 생기기 전에 메인 스레드에서 수행
+        # -> 모델 로드 + fork가 끝난 뒤에 기동 완료 (이 모드에서는 /healthz도 그 이후부터 응답)
+        _run_startup()
+    else:
+        # thread 모드: 워커 풀은 바로 시작, 모델 로드는 기다리지 않음 (/healthz는 즉시 응답)
+        _timed("executor_start", inference_executor.start)
+    _timed("outbox_start", outbox.start)
+    _timed("growth_store_start", growth_store.start)
+    startup_task = None if process_mode else asyncio.create_task(asyncio.to_thread(_run_startup))
+    yield
+    if startup_task is not None:
+        startup_task.cancel()
+    inference_executor.shutdown()
+    outbox.stop()
+    growth_store.stop()
 
-app = FastAPI(title="Codeponics AI Analysis Server")
+def require_started():
+    """모델 로드가 끝나기 전에는 분석 요청을 받지 않음 (로드 실패 시에는 기존 대체 로직으로 처리)"""
+    if not startup_state["done"]:
+        raise HTTPException(status_code=503, detail="AI server starting", headers={"Retry-After": "5"})
+
+app = FastAPI(title="Codeponics AI Analysis Server", lifespan=lifespan)
 
 # CORS 설정
 app.add_middleware(
@@ -27,16 +114,262 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 요청 수신 시각 (업로드 구간 측정용)
+request_started_var = contextvars.ContextVar("request_started", default=None)
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """
+    요청마다 요청 ID를 부여(X-Request-ID 헤더가 있으면 그대로 사용)하고,
+    응답 헤더로 돌려주며 요청 수를 집계합니다.
+    """
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
+    request_id_var.set(request_id)
+    request_started_var.set(time.perf_counter())
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        REQUESTS_TOTAL.inc(path=request.url.path, status=status)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+def observe_upload():
+    """요청 수신 ~ 업로드 본문 읽기 완료까지를 upload 구간으로 기록"""
+    started = request_started_var.get()
+    if started is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="upload")
+
 # =========================================================
 # [설정] 경로 및 환경 변수
 # =========================================================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_DIR = os.path.join(BASE_DIR, "temp_uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# [디버그] 1이면 업로드 원본을 temp_uploads에 저장 후 파일 경로로 분석 (기본: 메모리 처리)
+DEBUG_SAVE_UPLOADS = os.getenv("AI_DEBUG_SAVE_UPLOADS", "0") == "1"
+if DEBUG_SAVE_UPLOADS:
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # Express 백엔드 주소 (ai.js의 save-analysis 경로)
 EXPRESS_SERVER_URL = "http://127.0.0.1:5000/api/ai/save-analysis"
 
+# 분석 결과 전송 대기열 (디스크 스풀 + 재시도)
+outbox = Outbox(EXPRESS_SERVER_URL)
+
+# Vision 결과 캐시 (같은 사진 재분석 시 YOLO 생략)
+vision_cache = ResultCache()
+
+# 모듈별 분석 이력 + 누적 생육 상태 (EMA 면적, 성장률)
+growth_store = GrowthStore()
+
+# 중복 분석 요청 합치기 (재전송 폭주 시 YOLO / 백엔드 전송 중복 방지)
+crop_flights = SingleFlight()
+
+# WebSocket 연속 분석 (연결당 순서 보장 + 동시 분석 수 제한)
+frame_streams = FrameStreamServer()
+
+def save_debug_upload(data, module_id):
+    """[디버그 모드 전용] 업로드 바이트를 고유한 이름의 임시 파일로 저장"""
+    file_path = os.path.join(UPLOAD_DIR, f"temp_m{module_id}_{uuid.uuid4().hex}.jpg")
+    with open(file_path, "wb") as buffer:
+        buffer.write(data)
+    return file_path
+
+def run_harvest_prediction(vision_result, days_grown, avg_temp, total_lux, avg_hum, water_ph, crop_type=None):
+    """
+    3. 수확일 예측 (LGBM) - Vision 결과(캐시 또는 신규)와 환경 데이터로 남은 일수 계산
+    """
+    leaf_area = vision_result.get("leaf_area", 0.0)
+    leaf_count = vision_result.get("leaf_count", 0.0)
+    # remaining_days: 수확까지 남은 일수 (정수)
+    return predict_harvest_days(days_grown, avg_temp, total_lux, leaf_area, avg_hum, water_ph, leaf_count, crop_type)
+
+def run_batch_prediction(vision_results, env_rows, crops):
+    """
+    3. 수확일 예측 (LGBM 다중 행 예측 - 작물별로 1회)
+    """
+    predict_rows = [{
+        "days_grown": row["days_grown"],
+        "avg_temp": row["avg_temp"],
+        "total_lux": row["total_lux"],
+        "leaf_area": vision.get("leaf_area", 0.0),
+        "avg_hum": row["avg_hum"],
+        "water_ph": row["water_ph"],
+        "leaf_count": vision.get("leaf_count", 0.0)
+    } for row, vision in zip(env_rows, vision_results)]
+    remaining_list = [None] * len(predict_rows)
+    for crop, indices in group_by_crop(crops).items():
+        for i, days in zip(indices, predict_harvest_days_batch([predict_rows[i] for i in indices], crop)):
+            remaining_list[i] = days
+    return remaining_list
+
+def group_by_crop(crops):
+    """작물 이름 목록 -> {작물: [인덱스, ...]} (요청 순서 유지)"""
+    groups = {}
+    for i, crop in enumerate(crops):
+        groups.setdefault(crop, []).append(i)
+    return groups
+
+def resolve_crop(crop_type):
+    """요청의 작물 종류 검증 (없으면 기본 작물, 등록되지 않은 작물이면 400)"""
+    try:
+        return get_crop(crop_type)[0]
+    except UnknownCropError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def vision_cache_key(image_bytes, crop):
+    """결과 캐시 키: 사진 해시 + 작물 + 작물 Vision 모델 버전"""
+    if crop == get_crop()[0]:
+        version = vision_service.MODEL_VERSION
+    else:
+        # 처음 쓰는 작물 모델은 파일 해시 계산이 필요하므로 이벤트 루프 밖에서
+        version = await asyncio.to_thread(vision_service.model_version_for, crop)
+    return ResultCache.make_key(image_bytes, f"{crop}:{version}")
+
+async def run_inference(fn, *args, timeout=None):
+    """워커 풀 실행 + 과부하/마감 초과를 HTTP 에러로 변환"""
+    try:
+        return await inference_executor.run(fn, *args, timeout=timeout)
+    except QueueFullError:
+        logger.warning("추론 대기열 가득 참 - 요청 거절", in_flight=inference_executor.in_flight)
+        raise HTTPException(status_code=503, detail="AI server busy", headers={"Retry-After": "1"})
+    except DeadlineExceededError as e:
+        logger.warning("추론 마감 시간 초과", error=str(e))
+        raise HTTPException(status_code=504, detail=str(e))
+
+CROP_ROW_FIELDS = ["module_id", "days_grown", "avg_temp", "avg_hum", "total_lux", "water_ph"]
+
+def parse_crop_row(row, where):
+    """
+    환경 데이터 1건 검증 + 형 변환 (/analyze/crop 폼 필드와 같은 타입) -> dict
+    일괄 분석 rows / 스트리밍 헤더용. 잘못된 값은 이미지 읽기·추론 전에 400으로 거절
+    """
+    if not isinstance(row, dict):
+        raise HTTPException(status_code=400, detail=f"{where}: JSON 객체여야 합니다.")
+    missing = [f for f in CROP_ROW_FIELDS if f not in row]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"{where} 필드 누락: {missing}")
+    try:
+        return {
+            "module_id": int(row["module_id"]),
+            "days_grown": int(row["days_grown"]),
+            "avg_temp": float(row["avg_temp"]),
+            "avg_hum": float(row["avg_hum"]),
+            "total_lux": float(row["total_lux"]),
+            "water_ph": float(row["water_ph"]),
+            "crop_type": row.get("crop_type"),
+        }
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"{where} 값 오류: {e}")
+
+def build_crop_payload(module_id, days_grown, vision_result, remaining_days):
+    """
+    Vision 결과 + 예측 남은 일수로 DB 스키마(ai_results_crops)용 페이로드 생성
+    """
+    leaf_area = vision_result.get("leaf_area", 0.0)
+    health_score = vision_result.get("health_score", 0)
+    health_msg = vision_result.get("health_msg", 0)
+
+    # 5. DB 스키마 필드 계산
+    # (1) 성장률: (현재일 / 총 예상재배일) * 100
+    total_expected_days = days_grown + remaining_days
+    growth_rate = min(100.0, round((days_grown / total_expected_days) * 100, 1)) if total_expected_days > 0 else 0.0
+    
+    # (2) 예상 수확 날짜: 오늘 + 남은 일수
+    harvest_date = (datetime.now() + timedelta(days=remaining_days)).strftime("%Y-%m-%d")
+    
+    # (3) 추정 크기: 픽셀 면적을 cm 단위로 보정 (프로젝트 설정값에 따라 조정 가능)
+    estimated_size = round(leaf_area * 0.005, 2)
+
+    # 6. 최종 페이로드 구성 (DB 테이블 ai_results_crops 컬럼명과 일치)
+    analysis_data = {
+        "growth_rate_pct": float(growth_rate),
+        "leaf_health_status": health_msg[:50],  # varchar(50) 제한
+        "estimated_size_cm": float(estimated_size),
+        "expected_harvest_date": harvest_date
+    }
+    
+    payload = {
+        "type": "CROP",
+        "module_id": module_id,
+        "data": analysis_data,
+        "health_score": health_score
+    }
+    return analysis_data, payload
+
+def send_to_backend(payload):
+    """
+    7. 백엔드로 결과 전송 (Express 서버)
+    디스크 스풀(outbox)에 저장만 하고 바로 반환 -> 실제 전송/재시도는 백그라운드 스레드가 담당
+    """
+    try:
+        outbox.enqueue(payload)
+        return "Queued"
+    except Exception as e:
+        logger.error("Outbox 저장 실패", error=str(e))
+        return f"Queue Error: {str(e)}"
+
+async def record_growth(items):
+    """생육 상태 저장 (SQLite 쓰기는 스레드에서 실행, 실패해도 분석 응답은 그대로 반환)"""
+    try:
+        await asyncio.to_thread(growth_store.record_many, items)
+    except Exception as e:
+        logger.error("생육 상태 저장 실패", error=str(e))
+
+async def run_crop_analysis(module_id, days_grown, avg_temp, avg_hum, total_lux, water_ph, crop, source, cache_key):
+    """
+    단건 분석 2~7단계 (Vision -> 수확일 예측 -> 생육 상태 저장 -> 백엔드 전송)
+    """
+    # 2. Vision 분석 (YOLOv8 & HSV) - 같은 사진 + 같은 모델이면 캐시 결과 재사용
+    # vision_result 예시: {"leaf_area": 1200.5, "health_score": 95, "health_msg": "..."}
+    vision_result = await vision_cache.get(cache_key)
+    cache_hit = vision_result is not None
+    if not cache_hit:
+        # 워커 풀에서 실행 (이벤트 루프는 계속 응답)
+        vision_result = await run_inference(analyze_leaf_area, source, crop)
+        if is_valid_result(vision_result):
+            await vision_cache.put(cache_key, vision_result)
+
+    # 3. 수확일 예측 (LGBM) - 환경 데이터가 바뀌어도 이 단계만 다시 계산
+    remaining_days = await asyncio.to_thread(
+        run_harvest_prediction, vision_result,
+        days_grown, avg_temp, total_lux, avg_hum, water_ph, crop
+    )
+
+    # 4~6. DB 스키마 필드 계산 및 페이로드 구성
+    analysis_data, payload = build_crop_payload(module_id, days_grown, vision_result, remaining_days)
+    if is_valid_result(vision_result):
+        await record_growth([(module_id, days_grown, vision_result, remaining_days, cache_key)])
+
+    # 7. 백엔드로 결과 전송 (Express 서버) - outbox에 넣고 바로 응답
+    send_status = send_to_backend(payload)
+
+    return {
+        "status": "success",
+        "send_to_backend": send_status,
+        "model_version": harvest_registry.version,
+        "crop_type": crop,
+        "cache_hit": cache_hit,
+        "db_data": analysis_data
+    }
+
+async def analyze_single(module_id, days_grown, avg_temp, avg_hum, total_lux, water_ph, crop, image_bytes, source):
+    """
+    단건 분석 (HTTP / WebSocket 공통)
+    같은 모듈 + 같은 사진 + 같은 환경 데이터 요청(재전송 / 재요청)이 겹치면
+    분석과 백엔드 전송은 1회만 수행하고 모든 요청이 같은 결과를 받음
+    """
+    cache_key = await vision_cache_key(image_bytes, crop)
+    flight_key = (module_id, cache_key, days_grown, avg_temp, avg_hum, total_lux, water_ph)
+    response, coalesced = await crop_flights.do(flight_key, lambda: run_crop_analysis(
+        module_id, days_grown, avg_temp, avg_hum, total_lux, water_ph, crop, source, cache_key
+    ))
+    if coalesced:
+        logger.info("중복 분석 요청 합침", module_id=module_id)
+    return {**response, "coalesced": coalesced}
+
 @app.post("/analyze/crop")
 async def analyze_crop(
     image: UploadFile = File(...),
@@ -45,83 +378,289 @@ async def analyze_crop(
     avg_temp: float = Form(...),
     avg_hum: float = Form(...),
     total_lux: float = Form(...),
-    water_ph: float = Form(...)
+    water_ph: float = Form(...),
+    crop_type: str = Form(None)
 ):
     """
     백엔드로부터 수신된 사진과 환경 데이터를 분석하여 
     DB 스키마(ai_results_crops)에 최적화된 결과를 반환합니다.
+    crop_type을 생략하면 기본 작물(상추) 모델을 사용합니다.
     """
-    print(f"\n📡 [분석 요청] 모듈 ID: {module_id} ({days_grown}일차)")
+    require_started()
+    crop = resolve_crop(crop_type)
+    logger.info("분석 요청", module_id=module_id, days_grown=days_grown, crop_type=crop)
 
-    file_path = os.path.join(UPLOAD_DIR, f"temp_m{module_id}_{int(time.time())}.jpg")
+    # 1. 이미지 수신 (메모리에서 바로 디코딩, 디버그 모드에서만 임시 파일 저장)
+    image_bytes = await image.read()
+    observe_upload()
+    file_path = save_debug_upload(image_bytes, module_id) if DEBUG_SAVE_UPLOADS else None
     
     try:
-        # 1. 이미지 임시 저장
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-        
-        # 2. Vision 분석 (YOLOv8 & HSV)
-        # vision_result 예시: {"leaf_area": 1200.5, "health_score": 95, "health_msg": "..."}
-        vision_result = analyze_leaf_area(file_path)
-        leaf_area = vision_result.get("leaf_area", 0.0)
-        leaf_count = vision_result.get("leaf_count", 0.0)
-        health_score = vision_result.get("health_score", 0)
-        health_msg = vision_result.get("health_msg", 0)
-        avg_hue = vision_result.get("avg_hue", 0)
-        
-        # 3. 수확일 예측 (LGBM)
-        # remaining_days: 수확까지 남은 일수 (정수)
-        remaining_days = predict_harvest_days(days_grown, avg_temp, total_lux, leaf_area, avg_hum, water_ph, leaf_count)
-        
-        # 4. 종합 상태 평가 (DB 필드 규격에 맞춤)
-        # health_msg: varchar(50)에 저장될 건강 상태 요약
-        
-        
-        # 5. DB 스키마 필드 계산
-        # (1) 성장률: (현재일 / 총 예상재배일) * 100
-        total_expected_days = days_grown + remaining_days
-        growth_rate = min(100.0, round((days_grown / total_expected_days) * 100, 1)) if total_expected_days > 0 else 0.0
-        
-        # (2) 예상 수확 날짜: 오늘 + 남은 일수
-        harvest_date = (datetime.now() + timedelta(days=remaining_days)).strftime("%Y-%m-%d")
-        
-        # (3) 추정 크기: 픽셀 면적을 cm 단위로 보정 (프로젝트 설정값에 따라 조정 가능)
-        estimated_size = round(leaf_area * 0.005, 2)
-
-        # 6. 최종 페이로드 구성 (DB 테이블 ai_results_crops 컬럼명과 일치)
-        analysis_data = {
-            "growth_rate_pct": float(growth_rate),
-            "leaf_health_status": health_msg[:50],  # varchar(50) 제한
-            "estimated_size_cm": float(estimated_size),
-            "expected_harvest_date": harvest_date
-        }
-        
-        payload = {
-            "type": "CROP",
-            "module_id": module_id,
-            "data": analysis_data,
-            "health_score": health_score
-        }
-        
-        # 7. 백엔드로 결과 전송 (Express 서버)
-        try:
-            res = requests.post(EXPRESS_SERVER_URL, json=payload, timeout=5)
-            send_status = "Success" if res.status_code == 200 else f"Fail({res.status_code})"
-        except Exception as e:
-            send_status = f"Backend Offline: {str(e)}"
+        return await analyze_single(module_id, days_grown, avg_temp, avg_hum, total_lux, water_ph,
+                                    crop, image_bytes, file_path or image_bytes)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("분석 중 오류", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+
+@app.post("/analyze/crop/batch")
+async def analyze_crop_batch(
+    images: List[UploadFile] = File(...),
+    rows: str = Form(...)
+):
+    """
+    여러 모듈의 사진과 환경 데이터를 한 번의 요청으로 분석합니다. (야간 일괄 분석용)
+    - images: 이미지 파일 N개
+    - rows: 이미지와 같은 순서의 환경 데이터 JSON 배열
+      [{"module_id": 1, "days_grown": 12, "avg_temp": 22.5, "avg_hum": 60,
+        "total_lux": 5000, "water_ph": 6.8, "crop_type": "lettuce"}, ...]
+      (crop_type은 생략 가능 - 기본 작물)
+    YOLO와 LGBM은 작물별로 1회씩만 호출합니다.
+    """
+    require_started()
+    try:
+        raw_rows = json.loads(rows)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"rows JSON 파싱 실패: {e}")
+
+    if not isinstance(raw_rows, list) or len(raw_rows) != len(images):
+        raise HTTPException(status_code=400, detail="images와 rows의 개수가 일치해야 합니다.")
+    env_rows = [parse_crop_row(row, f"rows[{i}]") for i, row in enumerate(raw_rows)]
+    crops = [resolve_crop(row["crop_type"]) for row in env_rows]
+
+    logger.info("일괄 분석 요청", count=len(images))
+
+    # 1. 이미지 수신 (메모리에서 바로 디코딩, 디버그 모드에서만 임시 파일 저장)
+    image_bytes_list = [await image.read() for image in images]
+    observe_upload()
+    file_paths = []
+    if DEBUG_SAVE_UPLOADS:
+        file_paths = [save_debug_upload(data, row["module_id"]) for data, row in zip(image_bytes_list, env_rows)]
+
+    try:
+        # 2. Vision 분석 - 캐시에 없는 이미지만 작물별로 모아서 YOLO 배치 추론 (워커 풀)
+        cache_keys = [await vision_cache_key(data, crop) for data, crop in zip(image_bytes_list, crops)]
+        vision_results = [await vision_cache.get(key) for key in cache_keys]
+        misses = [i for i, vision in enumerate(vision_results) if vision is None]
+        if misses:
+            sources = file_paths or image_bytes_list
+            groups = group_by_crop([crops[i] for i in misses])
+            fresh_groups = await asyncio.gather(*[
+                run_inference(analyze_leaf_area_batch, [sources[misses[j]] for j in indices], crop,
+                              timeout=BATCH_TIMEOUT)
+                for crop, indices in groups.items()
+            ])
+            for indices, fresh in zip(groups.values(), fresh_groups):
+                for j, vision in zip(indices, fresh):
+                    i = misses[j]
+                    vision_results[i] = vision
+                    if is_valid_result(vision):
+                        await vision_cache.put(cache_keys[i], vision)
+
+        # 3. 수확일 예측 (LGBM 다중 행 예측 - 작물별 1회)
+        remaining_list = await asyncio.to_thread(run_batch_prediction, vision_results, env_rows, crops)
+
+        # 모듈별 생육 상태 갱신 (정상 분석 결과만, 한 트랜잭션)
+        await record_growth([
+            (row["module_id"], row["days_grown"], vision, remaining_days, key)
+            for row, vision, remaining_days, key in zip(env_rows, vision_results, remaining_list, cache_keys)
+            if is_valid_result(vision)
+        ])
+
+        # 4~7. 모듈별 페이로드 구성 및 백엔드 전송 (outbox가 묶어서 전송)
+        results = []
+        for row, crop, vision, remaining_days in zip(env_rows, crops, vision_results, remaining_list):
+            module_id = row["module_id"]
+            analysis_data, payload = build_crop_payload(module_id, row["days_grown"], vision, remaining_days)
+            results.append({
+                "module_id": module_id,
+                "crop_type": crop,
+                "send_to_backend": send_to_backend(payload),
+                "db_data": analysis_data
+            })
 
         return {
             "status": "success",
-            "send_to_backend": send_status,
-            "db_data": analysis_data
+            "count": len(results),
+            "cache_hits": len(results) - len(misses),
+            "model_version": harvest_registry.version,
+            "results": results
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ 분석 중 오류: {e}")
+        logger.error("일괄 분석 중 오류", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        for file_path in file_paths:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+async def analyze_stream_frame(header, image_bytes):
+    """WebSocket 프레임 1개 분석 (헤더 검증은 /analyze/crop 폼과 동일, 실패 시 HTTPException -> 에러 결과)"""
+    require_started()
+    row = parse_crop_row(header, "헤더")
+    crop = resolve_crop(row["crop_type"])
+    return await analyze_single(row["module_id"], row["days_grown"], row["avg_temp"], row["avg_hum"],
+                                row["total_lux"], row["water_ph"], crop, image_bytes, image_bytes)
+
+@app.websocket("/ws/analyze/crop")
+async def analyze_crop_stream(websocket: WebSocket):
+    """
+    연결 하나로 사진을 계속 보내고 분석 결과를 받는 스트리밍 분석 (짧은 주기 모니터링용)
+    - 보내기: 텍스트 메시지(JSON 헤더) 다음에 바이너리 메시지(JPEG)
+      {"seq": 1, "module_id": 1, "days_grown": 12, "avg_temp": 22.5, "avg_hum": 60,
+       "total_lux": 5000, "water_ph": 6.8, "crop_type": "lettuce"}  (seq / crop_type 생략 가능)
+    - 받기: {"seq": 1, "status": "success", ...} 또는 {"seq": 1, "status": "error", "code": 503, "detail": ...}
+      결과는 보낸 순서대로 도착하고, code는 /analyze/crop의 HTTP 상태 코드와 같음
+    - 연결당 AI_STREAM_MAX_IN_FLIGHT개를 분석 중이면 다음 프레임을 읽지 않음 (보내는 쪽이 대기)
+    """
+    await frame_streams.serve(websocket, analyze_stream_frame)
+
+@app.get("/healthz")
+def healthz():
+    """프로세스 생존 확인 (모델 로드 여부와 무관하게 즉시 응답)"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+def readyz():
+    """모델 로드 + 워밍업 완료 여부 (준비 전 / 로드 실패 시 503)"""
+    body = {
+        "status": "ready" if startup_state["ready"] else ("degraded" if startup_state["done"] else "starting"),
+        "vision_model": {
+            "loaded": vision_service.model is not None,
+            "backend": vision_service.VISION_BACKEND,
+            "error": vision_service.load_error
+        },
+        "harvest_model": {"loaded": harvest_registry.version is not None},
+        "startup_seconds": startup_state["seconds"]
+    }
+    return JSONResponse(body, status_code=200 if startup_state["ready"] else 503)
+
+@app.get("/modules/{module_id}/growth")
+def module_growth(module_id: int, history: int = 0):
+    """
+    모듈의 누적 생육 상태 (최근 분석값, EMA 면적 / 잎 개수 / Hue, 일일 성장률)
+    - 메모리 상태를 그대로 반환 (이력 재계산 없음)
+    - history=N: 최근 분석 이력 N건 함께 반환 (최대 500)
+    """
+    summary = growth_store.summary(module_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"module {module_id} 분석 기록 없음")
+    if history > 0:
+        summary["history"] = growth_store.history(module_id, history)
+    return summary
+
+@app.get("/models")
+def model_info():
+    """현재 메모리에 상주 중인 모델 버전 + 작물별 모델 캐시 조회"""
+    return {
+        "default_crop": get_crop()[0],
+        "crops": {name: {"vision_model": spec["vision_model"], "harvest_model": spec["harvest_model"]}
+                  for name, spec in CROPS.items()},
+        "model_cache": model_cache.stats(),
+        "harvest_model": {
+            "version": harvest_registry.version,
+            "load_seconds": round(harvest_registry.load_seconds, 3)
+        },
+        "vision_model": {
+            "backend": vision_service.VISION_BACKEND,
+            "version": vision_service.MODEL_VERSION
+        }
+    }
+
+@app.get("/batching")
+def batching_info():
+    """마이크로 배칭 지표 조회 (평균 배치 크기 등)"""
+    if vision_service.micro_batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **vision_service.micro_batcher.stats()}
+
+@app.get("/cache")
+def cache_info():
+    """Vision 결과 캐시 지표 (히트/미스 등)"""
+    return {"vision_model_version": vision_service.MODEL_VERSION, **vision_cache.stats(),
+            "coalescing": crop_flights.stats()}
+
+@app.get("/workers")
+def workers_info():
+    """추론 워커 풀 상태 + 프로세스별 메모리 (process 모드에서 워커 간 공유량 확인용)"""
+    return inference_executor.stats()
+
+@app.get("/streams")
+def streams_info():
+    """WebSocket 스트리밍 분석 연결 수 / 처리 프레임 수"""
+    return frame_streams.stats()
+
+@app.get("/outbox")
+def outbox_info():
+    """백엔드 전송 대기열 상태 및 전송 지표 조회"""
+    return outbox.stats()
+
+# =========================================================
+# Prometheus 지표 (/metrics 수집 시점에 현재 값을 읽음)
+# =========================================================
+Gauge("ai_inference_queue_depth", "Requests waiting for an inference worker",
+      callback=lambda: inference_executor.queue_depth)
+Gauge("ai_inference_in_flight", "Requests running or waiting in the inference pool",
+      callback=lambda: inference_executor.in_flight)
+Counter("ai_inference_rejected_total", "Requests rejected because the inference queue was full",
+      callback=lambda: inference_executor.rejected)
+Gauge("ai_process_pss_bytes", "Proportional set size of the server and inference worker processes", ["process"],
+      callback=lambda: {(name,): usage.get("pss_kb", 0) * 1024
+                        for name, usage in inference_executor.memory_stats().items()})
+def _model_load_seconds():
+    """로드된 모델만 (아직 로드 전인 모델은 시리즈를 내보내지 않음)"""
+    seconds = {}
+    if vision_service.MODEL_VERSION is not None:
+        seconds[("vision",)] = vision_service.load_seconds + vision_service.warmup_seconds
+    if harvest_registry.version is not None:
+        seconds[("harvest",)] = harvest_registry.load_seconds
+    return seconds
+
+
+def _model_info():
+    info = {}
+    if vision_service.MODEL_VERSION is not None:
+        info[("vision", vision_service.VISION_BACKEND, vision_service.MODEL_VERSION)] = 1
+    if harvest_registry.version is not None:
+        info[("harvest", "lightgbm", harvest_registry.version)] = 1
+    return info
+
+
+Gauge("ai_model_load_seconds", "Time spent loading and warming up each model", ["model"],
+      callback=_model_load_seconds)
+Gauge("ai_model_info", "Loaded model versions", ["model", "backend", "version"],
+      callback=_model_info)
+Gauge("ai_model_resident_bytes", "Model file bytes held by the on-demand crop model cache",
+      callback=lambda: model_cache.resident_bytes)
+Counter("ai_model_evictions_total", "Crop models unloaded to stay within the memory budget",
+      callback=lambda: model_cache.evictions)
+Gauge("ai_growth_modules", "Modules with growth state in the local store",
+      callback=lambda: growth_store.modules)
+Counter("ai_coalesced_requests_total", "Analysis requests answered from an identical in-flight or just-finished request",
+      callback=lambda: crop_flights.joined + crop_flights.recent_hits)
+Gauge("ai_stream_connections", "Open WebSocket analysis streams",
+      callback=lambda: frame_streams.connections)
+Counter("ai_stream_frames_total", "Frames answered over WebSocket analysis streams",
+      callback=lambda: frame_streams.frames)
+Gauge("ai_outbox_pending", "Analysis results waiting to be delivered to the backend",
+      callback=lambda: outbox.pending)
+Counter("ai_cache_hits_total", "Vision result cache hits (memory + disk)",
+      callback=lambda: vision_cache.hits + vision_cache.disk_hits)
+Counter("ai_cache_misses_total", "Vision result cache misses",
+      callback=lambda: vision_cache.misses)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus 수집용 지표 (단계별 지연 히스토그램, 대기열 깊이, 모델 버전 등)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
@@ -0,0 +1,14 @@
+"""
+AI 분석 서버 벤치마크 (/analyze/crop 처리량 / 지연 시간 측정)
+
+사용 예 (aiServer 디렉터리에서 실행):
+    # 앱을 같은 프로세스에서 구동 (Express는 로컬 스텁으로 대체)
+    python -m benchmark --mode inprocess --concurrency 1,4 --requests 40
+
+    # 이미 떠 있는 서버를 HTTP로 측정 (스텁 Express를 5000 포트에 띄움)
+    python -m benchmark --mode http --url http://127.0.0.1:8001 --server-pid 12345
+
+    # 기준선 저장 / 비교 (CI에서 회귀 검사)
+    python -m benchmark --write-baseline benchmark/baseline.json
+    python -m benchmark --baseline benchmark/baseline.json --tolerance 0.2
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from benchmark.runner import main
+
+sys.exit(main())
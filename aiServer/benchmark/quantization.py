@@ -0,0 +1,199 @@
+"""
+FP32 vs INT8 잎 Segmentation 모델 비교 (정확도 손실 + 지연 / 메모리 이득)
+
+    python -m benchmark.quantization --images <사진 폴더> --candidates onnx-int8,openvino-int8
+
+- 백엔드마다 별도 프로세스에서 vision_service.analyze_leaf_area()를 그대로 실행
+  (서비스와 같은 경로, 모델 로드 메모리가 서로 섞이지 않음)
+- 기준(--reference, 기본 torch) 대비 leaf_area 변화율, leaf_count 차이, 건강 상태 분류 일치율
+- 사진 폴더에 labels.csv(image,leaf_count,health_msg)가 있으면 라벨 대비 오차도 함께 출력
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import cv2
+import numpy as np
+
+from benchmark.runner import RssSampler, percentile
+from benchmark.synthetic import make_lettuce_image
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+def _measure_backend(backend, image_paths, warmup):
+    """[자식 프로세스] 지정 백엔드로 vision_service를 올려 이미지별 결과 / 지연 / 메모리 측정"""
+    os.environ["AI_VISION_BACKEND"] = backend
+    os.environ["AI_MICROBATCH_MAX_SIZE"] = "1"
+
+    with RssSampler(os.getpid()) as rss_load:
+        start = time.perf_counter()
+        from services import vision_service
+        loaded = vision_service.load_model()
+        load_sec = time.perf_counter() - start
+    if not loaded:
+        raise RuntimeError(f"{backend} 모델 로드 실패: {vision_service.load_error}")
+    if vision_service.VISION_BACKEND != backend:
+        raise RuntimeError(f"{backend} 모델이 없어 {vision_service.VISION_BACKEND}로 대체됨 (export 먼저 실행)")
+
+    images = [(os.path.basename(p), cv2.imread(p)) for p in image_paths]
+    for _, img in images[:warmup]:
+        vision_service.analyze_leaf_area(img)
+
+    results, latencies = {}, []
+    with RssSampler(os.getpid()) as rss_run:
+        for name, img in images:
+            start = time.perf_counter()
+            results[name] = vision_service.analyze_leaf_area(img)
+            latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return {
+        "backend": backend,
+        "version": vision_service.MODEL_VERSION,
+        "load_sec": round(load_sec, 3),
+        "rss_after_load_mb": rss_load.peak_mb,
+        "peak_rss_mb": rss_run.peak_mb,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "images_per_sec": round(len(latencies) / sum(latencies), 2) if latencies else 0.0,
+        "results": results,
+    }
+
+
+def measure(backend, image_paths, warmup=1):
+    """백엔드마다 새 프로세스(spawn)에서 측정"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(_measure_backend, backend, image_paths, warmup).result()
+
+
+def load_labels(path):
+    """labels.csv -> {이미지 파일명: {"leaf_count": int | None, "health_msg": str | None}}"""
+    if not path or not os.path.exists(path):
+        return {}
+    labels = {}
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            count = row.get("leaf_count")
+            labels[row["image"]] = {
+                "leaf_count": int(count) if count not in (None, "") else None,
+                "health_msg": row.get("health_msg") or None,
+            }
+    return labels
+
+
+def compare_to_reference(reference, candidate):
+    """기준 모델 대비 이미지별 변화 요약"""
+    area_changes, count_diffs, health_agree = [], [], []
+    for name, ref in reference["results"].items():
+        cand = candidate["results"][name]
+        if ref["leaf_area"] > 0:
+            area_changes.append((cand["leaf_area"] - ref["leaf_area"]) / ref["leaf_area"])
+        count_diffs.append(cand["leaf_count"] - ref["leaf_count"])
+        health_agree.append(cand["health_msg"] == ref["health_msg"])
+
+    abs_area = sorted(abs(c) for c in area_changes)
+    return {
+        "leaf_area_mean_change_pct": round(float(np.mean(area_changes)) * 100, 2) if area_changes else 0.0,
+        "leaf_area_abs_p95_pct": round(percentile(abs_area, 95) * 100, 2),
+        "leaf_count_mean_abs_diff": round(float(np.mean(np.abs(count_diffs))), 3) if count_diffs else 0.0,
+        "leaf_count_exact_match": round(float(np.mean([d == 0 for d in count_diffs])), 3) if count_diffs else 1.0,
+        "health_class_agreement": round(float(np.mean(health_agree)), 3) if health_agree else 1.0,
+        "speedup": round(reference["p50_ms"] / candidate["p50_ms"], 2) if candidate["p50_ms"] else None,
+        "rss_saving_mb": (round(reference["peak_rss_mb"] - candidate["peak_rss_mb"], 1)
+                          if reference["peak_rss_mb"] and candidate["peak_rss_mb"] else None),
+    }
+
+
+def score_against_labels(measured, labels):
+    """라벨 대비 잎 개수 MAE / 건강 상태 정확도"""
+    count_err, health_ok = [], []
+    for name, label in labels.items():
+        result = measured["results"].get(name)
+        if result is None:
+            continue
+        if label["leaf_count"] is not None:
+            count_err.append(abs(result["leaf_count"] - label["leaf_count"]))
+        if label["health_msg"] is not None:
+            health_ok.append(result["health_msg"] == label["health_msg"])
+    return {
+        "leaf_count_mae": round(float(np.mean(count_err)), 3) if count_err else None,
+        "health_accuracy": round(float(np.mean(health_ok)), 3) if health_ok else None,
+    }
+
+
+def _synthetic_images(count):
+    """사진 폴더가 없을 때 합성 이미지를 임시 폴더에 저장 (라벨 없음, 동작 확인용)"""
+    out_dir = tempfile.mkdtemp(prefix="quant_bench_")
+    paths = []
+    for i in range(count):
+        path = os.path.join(out_dir, f"synthetic_{i:03d}.png")
+        cv2.imwrite(path, make_lettuce_image(640, 480, 4 + i % 8, seed=i))
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark.quantization", description="FP32 vs INT8 모델 비교")
+    parser.add_argument("--images", help="라벨링된 사진 폴더 (없으면 합성 이미지)")
+    parser.add_argument("--labels", help="라벨 CSV (기본: <images>/labels.csv)")
+    parser.add_argument("--reference", default="torch", help="기준 백엔드 (FP32)")
+    parser.add_argument("--candidates", default="onnx-int8", help="비교할 백엔드 목록 (쉼표 구분)")
+    parser.add_argument("--count", type=int, default=20, help="합성 이미지 수")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    args = parser.parse_args(argv)
+
+    if args.images:
+        paths = sorted(p for p in glob.glob(os.path.join(args.images, "*")) if p.lower().endswith(IMAGE_EXTS))
+        labels = load_labels(args.labels or os.path.join(args.images, "labels.csv"))
+    else:
+        paths = _synthetic_images(args.count)
+        labels = load_labels(args.labels)
+    if not paths:
+        print("비교할 이미지가 없습니다.")
+        return 1
+
+    backends = [args.reference] + [b for b in args.candidates.split(",") if b and b != args.reference]
+    measured = {b: measure(b, paths, args.warmup) for b in backends}
+    reference = measured[args.reference]
+
+    report = {"images": len(paths), "labelled": len(labels), "backends": {}}
+    print(f"{'backend':<15} {'p50 ms':>9} {'p95 ms':>9} {'img/s':>8} {'load s':>7} {'peak MB':>8}  accuracy vs {args.reference}")
+    for backend, m in measured.items():
+        entry = {k: v for k, v in m.items() if k != "results"}
+        if backend != args.reference:
+            entry["vs_reference"] = compare_to_reference(reference, m)
+        if labels:
+            entry["vs_labels"] = score_against_labels(m, labels)
+        report["backends"][backend] = entry
+
+        line = (f"{backend:<15} {m['p50_ms']:>9.1f} {m['p95_ms']:>9.1f} {m['images_per_sec']:>8.2f} "
+                f"{m['load_sec']:>7.2f} {str(m['peak_rss_mb']):>8}  ")
+        if "vs_reference" in entry:
+            v = entry["vs_reference"]
+            line += (f"area {v['leaf_area_mean_change_pct']:+.2f}% (|p95| {v['leaf_area_abs_p95_pct']:.2f}%), "
+                     f"count match {v['leaf_count_exact_match']:.1%}, health agree {v['health_class_agreement']:.1%}, "
+                     f"speedup x{v['speedup']}")
+        else:
+            line += "(reference)"
+        if "vs_labels" in entry:
+            line += f" | labels: count MAE {entry['vs_labels']['leaf_count_mae']}, health acc {entry['vs_labels']['health_accuracy']}"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"결과 저장: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
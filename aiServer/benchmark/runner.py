@@ -0,0 +1,415 @@
+import argparse
+import importlib.util
+import itertools
+import json
+import math
+import os
+import platform
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmark.synthetic import make_jpeg
+from benchmark.stub_backend import start_stub_backend, stub_url
+
+try:
+    import psutil
+except ImportError:  # RSS 측정만 생략
+    psutil = None
+
+# =========================================================
+# [설정] 기본 시나리오
+# =========================================================
+SERVER_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ai-server.py")
+DEFAULT_RESOLUTIONS = "640x480,1280x720"
+DEFAULT_LEAF_COUNTS = "3,12"
+DEFAULT_CONCURRENCY = "1,4"
+DEFAULT_REQUESTS = 20
+DEFAULT_WARMUP = 2
+RSS_SAMPLE_INTERVAL = 0.05  # 초
+READY_TIMEOUT = 300         # 서버 준비(/readyz 200) 대기 최대 시간(초)
+READY_POLL_INTERVAL = 0.5   # 초
+
+# 분석 요청에 함께 보내는 환경 데이터 (고정값 -> 재현 가능)
+ENV_FORM = {"days_grown": 12, "avg_temp": 22.5, "avg_hum": 60.0, "total_lux": 5000.0, "water_ph": 6.8}
+
+
+# =========================================================
+# 요청 클라이언트
+# =========================================================
+class InProcessClient:
+    """
+    ai-server.py 앱을 현재 프로세스에 올려 TestClient로 호출
+    (Express는 스텁으로 대체, 네트워크 비용 없이 서버 내부 처리 시간만 측정)
+    outbox / 생육 상태 DB는 임시 폴더를 사용 -> 같은 호스트의 실제 전송 대기열과 생육 기록을 건드리지 않음
+    """
+    mode = "inprocess"
+
+    def __init__(self):
+        from fastapi.testclient import TestClient
+
+        # 서버 모듈 import 전에 설정해야 기본 경로(aiServer/outbox.db, growth.db) 대신 사용됨
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="ai-bench-")
+        os.environ["AI_OUTBOX_PATH"] = os.path.join(self._tmpdir.name, "outbox.db")
+        os.environ["AI_GROWTH_PATH"] = os.path.join(self._tmpdir.name, "growth.db")
+
+        spec = importlib.util.spec_from_file_location("ai_server", SERVER_FILE)
+        self.server = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.server)
+
+        self.stub = start_stub_backend()
+        self.server.outbox.url = stub_url(self.stub)
+        self._client = TestClient(self.server.app)
+        self._client.__enter__()  # lifespan 실행 (모델 로드 / 워커 풀 시작)
+        self.pid = os.getpid()
+
+    def post(self, image_bytes, module_id):
+        res = self._client.post(
+            "/analyze/crop",
+            files={"image": ("bench.jpg", image_bytes, "image/jpeg")},
+            data={"module_id": module_id, **ENV_FORM},
+        )
+        return res.status_code
+
+    def readyz(self):
+        res = self._client.get("/readyz")
+        return res.status_code, res.json()
+
+    def metrics_text(self):
+        return self._client.get("/metrics").text
+
+    def close(self):
+        self._client.__exit__(None, None, None)
+        self.stub.shutdown()
+        self._tmpdir.cleanup()
+
+
+class HttpClient:
+    """이미 실행 중인 서버(uvicorn)를 HTTP로 호출 (스레드마다 keep-alive 세션)"""
+    mode = "http"
+
+    def __init__(self, url, pid=None, stub_port=5000):
+        self.url = url.rstrip("/")
+        self.pid = pid
+        self._local = threading.local()
+        # 서버의 기본 Express 주소(127.0.0.1:5000)를 스텁으로 받음 (stub_port=0이면 띄우지 않음)
+        self.stub = start_stub_backend(port=stub_port) if stub_port else None
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def post(self, image_bytes, module_id):
+        res = self._session().post(
+            f"{self.url}/analyze/crop",
+            files={"image": ("bench.jpg", image_bytes, "image/jpeg")},
+            data={"module_id": module_id, **ENV_FORM},
+            timeout=120,
+        )
+        return res.status_code
+
+    def readyz(self):
+        res = requests.get(f"{self.url}/readyz", timeout=10)
+        return res.status_code, res.json()
+
+    def metrics_text(self):
+        return requests.get(f"{self.url}/metrics", timeout=10).text
+
+    def close(self):
+        if self.stub is not None:
+            self.stub.shutdown()
+
+
+def wait_until_ready(client, timeout=READY_TIMEOUT):
+    """
+    /readyz가 200이 될 때까지 대기
+    모델은 백그라운드에서 로드되므로 그 전 요청은 바로 503 -> 워밍업 / 측정에 에러로 섞이지 않도록
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            status, body = client.readyz()
+        except (requests.RequestException, ValueError):
+            status, body = None, {}  # 서버가 아직 포트를 열지 않음
+        if status == 200:
+            print(f"서버 준비 완료 (기동 {(body.get('startup_seconds') or {}).get('total')}초)")
+            return body
+        if body.get("status") == "degraded":
+            raise RuntimeError(f"서버 기동 실패: {body}")
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"{timeout}초 안에 서버가 준비되지 않음 (/readyz {status})")
+        time.sleep(READY_POLL_INTERVAL)
+
+
+# =========================================================
+# 측정 도구
+# =========================================================
+class RssSampler:
+    """측정 구간 동안 대상 프로세스의 RSS를 주기적으로 샘플링해 최댓값 기록"""
+
+    def __init__(self, pid, interval=RSS_SAMPLE_INTERVAL):
+        self.proc = psutil.Process(pid) if (psutil is not None and pid) else None
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        try:
+            self.peak = max(self.peak, self.proc.memory_info().rss)
+        except psutil.Error:
+            pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        if self.proc is not None:
+            self._sample()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / (1024 * 1024), 1) if self.peak else None
+
+
+def percentile(sorted_values, q):
+    """선형 보간 백분위수 (q: 0~100)"""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo, hi = math.floor(pos), math.ceil(pos)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+_BUCKET_RE = re.compile(r'^ai_stage_seconds_bucket\{stage="([^"]+)",le="([^"]+)"\} (\S+)$')
+_SUM_RE = re.compile(r'^ai_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+
+def parse_stage_histograms(text):
+    """/metrics 텍스트에서 ai_stage_seconds 히스토그램을 {stage: {"buckets", "sum", "count"}}로 파싱"""
+    stages = {}
+    for line in text.splitlines():
+        m = _BUCKET_RE.match(line)
+        if m:
+            stage, le, value = m.groups()
+            entry = stages.setdefault(stage, {"buckets": {}, "sum": 0.0, "count": 0})
+            entry["buckets"][float(le)] = float(value)
+            continue
+        m = _SUM_RE.match(line)
+        if m:
+            kind, stage, value = m.groups()
+            entry = stages.setdefault(stage, {"buckets": {}, "sum": 0.0, "count": 0})
+            entry[kind] = float(value)
+    return stages
+
+
+def _bucket_quantile(buckets, count, q):
+    """누적 버킷에서 백분위수 추정 (버킷 내부 선형 보간, Prometheus histogram_quantile과 동일한 방식)"""
+    if count <= 0:
+        return 0.0
+    rank = count * q / 100.0
+    prev_bound, prev_count = 0.0, 0.0
+    for bound, cum in sorted(buckets.items()):
+        if cum >= rank:
+            if bound == math.inf:
+                return prev_bound
+            width = cum - prev_count
+            return prev_bound + (bound - prev_bound) * ((rank - prev_count) / width if width else 0.0)
+        prev_bound, prev_count = bound, cum
+    return prev_bound
+
+
+def stage_breakdown(before, after):
+    """두 시점의 히스토그램 차이로 시나리오 구간의 단계별 지연 요약 (ms)"""
+    out = {}
+    for stage, cur in sorted(after.items()):
+        old = before.get(stage, {"buckets": {}, "sum": 0.0, "count": 0})
+        count = cur["count"] - old["count"]
+        if count <= 0:
+            continue
+        buckets = {b: v - old["buckets"].get(b, 0.0) for b, v in cur["buckets"].items()}
+        out[stage] = {
+            "count": int(count),
+            "mean_ms": round((cur["sum"] - old["sum"]) / count * 1000, 2),
+            "p50_ms": round(_bucket_quantile(buckets, count, 50) * 1000, 2),
+            "p95_ms": round(_bucket_quantile(buckets, count, 95) * 1000, 2),
+            "p99_ms": round(_bucket_quantile(buckets, count, 99) * 1000, 2),
+        }
+    return out
+
+
+# =========================================================
+# 시나리오 실행
+# =========================================================
+def run_scenario(client, images, concurrency):
+    """이미지 목록을 고정 동시성으로 전송하고 요청별 지연 시간 수집"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(args):
+        nonlocal errors
+        i, data = args
+        start = time.perf_counter()
+        try:
+            status = client.post(data, module_id=i % 100 + 1)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if status != 200:
+                errors += 1
+
+    before = parse_stage_histograms(client.metrics_text())
+    with RssSampler(client.pid) as rss:
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, enumerate(images)))
+        wall = time.perf_counter() - wall_start
+    after = parse_stage_histograms(client.metrics_text())
+
+    latencies.sort()
+    return {
+        "requests": len(images),
+        "errors": errors,
+        "wall_sec": round(wall, 3),
+        "images_per_sec": round(len(images) / wall, 2) if wall > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": rss.peak_mb,
+        "stages": stage_breakdown(before, after),
+    }
+
+
+def _parse_list(text, cast=int):
+    return [cast(v) for v in text.split(",") if v.strip()]
+
+
+def _parse_resolution(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def run_benchmark(client, resolutions, leaf_counts, concurrencies, n_requests, warmup):
+    scenarios = {}
+    seed = itertools.count(1)
+    for (w, h), leaves in itertools.product(resolutions, leaf_counts):
+        # 워밍업 (첫 추론의 지연 로딩 / 캐시 효과 제외)
+        for _ in range(warmup):
+            client.post(make_jpeg(w, h, leaves, seed=next(seed)), module_id=1)
+        for concurrency in concurrencies:
+            # 요청마다 다른 이미지 -> 같은 사진 + 같은 모델의 Vision 결과를 재사용하는 결과 캐시에 걸리지 않도록
+            images = [make_jpeg(w, h, leaves, seed=next(seed)) for _ in range(n_requests)]
+            key = f"{client.mode}/{w}x{h}/leaves{leaves}/c{concurrency}"
+            result = run_scenario(client, images, concurrency)
+            scenarios[key] = result
+            print(f"{key:<40} {result['images_per_sec']:>8.2f} img/s  "
+                  f"p50 {result['p50_ms']:>8.1f}ms  p95 {result['p95_ms']:>8.1f}ms  "
+                  f"p99 {result['p99_ms']:>8.1f}ms  rss {result['peak_rss_mb']}MB  errors {result['errors']}")
+    return scenarios
+
+
+def compare_to_baseline(current, baseline, tolerance):
+    """
+    기준선 대비 회귀 검사 (p95 지연 증가 / 처리량 감소가 tolerance 비율을 넘으면 실패)
+    반환: 회귀 메시지 리스트
+    """
+    regressions = []
+    for key, base in baseline.get("scenarios", {}).items():
+        cur = current["scenarios"].get(key)
+        if cur is None:
+            continue
+        if base["p95_ms"] > 0 and cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {base['p95_ms']}ms -> {cur['p95_ms']}ms")
+        if base["images_per_sec"] > 0 and cur["images_per_sec"] < base["images_per_sec"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {base['images_per_sec']} -> {cur['images_per_sec']} img/s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="AI 분석 서버 /analyze/crop 벤치마크")
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--url", default="http://127.0.0.1:8001", help="http 모드 서버 주소")
+    parser.add_argument("--server-pid", type=int, default=None, help="http 모드에서 RSS를 측정할 서버 PID")
+    parser.add_argument("--stub-port", type=int, default=5000, help="http 모드 Express 스텁 포트 (0: 띄우지 않음)")
+    parser.add_argument("--resolutions", default=DEFAULT_RESOLUTIONS, help="예: 640x480,1280x720")
+    parser.add_argument("--leaves", default=DEFAULT_LEAF_COUNTS, help="이미지당 잎 개수 목록")
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY, help="동시 요청 수 목록")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="시나리오당 요청 수")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--ready-timeout", type=float, default=READY_TIMEOUT, help="서버 준비 대기 최대 시간(초)")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    parser.add_argument("--write-baseline", help="결과를 기준선 파일로 저장")
+    parser.add_argument("--baseline", help="비교할 기준선 파일 (회귀 시 종료 코드 1)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="허용 오차 비율 (기본 20%%)")
+    args = parser.parse_args(argv)
+
+    if args.mode == "http":
+        client = HttpClient(args.url, pid=args.server_pid, stub_port=args.stub_port)
+    else:
+        client = InProcessClient()
+
+    try:
+        wait_until_ready(client, args.ready_timeout)
+        scenarios = run_benchmark(
+            client,
+            [_parse_resolution(r) for r in args.resolutions.split(",")],
+            _parse_list(args.leaves),
+            _parse_list(args.concurrency),
+            args.requests,
+            args.warmup,
+        )
+    finally:
+        client.close()
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "mode": args.mode,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "requests_per_scenario": args.requests,
+        },
+        "scenarios": scenarios,
+    }
+
+    for path in (args.output, args.write_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False, sort_keys=True)
+            print(f"결과 저장: {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("성능 회귀 감지:")
+            for msg in regressions:
+                print(f"  - {msg}")
+            return 1
+        print(f"기준선 대비 회귀 없음 (허용 오차 {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =========================================================
+# Express(/api/ai/save-analysis) 대신 응답하는 로컬 스텁
+# - 단건: {"success": true}
+# - BATCH: {"success": true, "results": [{"success": true}, ...]}
+# =========================================================
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive (outbox 세션 재사용)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if body.get("type") == "BATCH":
+            items = body.get("items", [])
+            out = {"success": True, "results": [{"success": True}] * len(items)}
+        else:
+            items = [body]
+            out = {"success": True}
+        self.server.received += len(items)
+
+        data = json.dumps(out).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_backend(host="127.0.0.1", port=0):
+    """백그라운드 스레드에서 스텁 서버 시작 (port=0이면 빈 포트 자동 선택)"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.received = 0
+    threading.Thread(target=server.serve_forever, name="stub-backend", daemon=True).start()
+    return server
+
+
+def stub_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/api/ai/save-analysis"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Express save-analysis 스텁 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), _Handler)
+    server.received = 0
+    print(f"Stub backend listening on {stub_url(server)}")
+    server.serve_forever()
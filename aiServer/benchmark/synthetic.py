@@ -0,0 +1,49 @@
+import cv2
+import numpy as np
+
+# =========================================================
+# 합성 상추 이미지 생성 (실제 사진 없이 재현 가능한 입력)
+# =========================================================
+JPEG_QUALITY = 85  # 라즈베리파이 카메라 설정(settings.json)과 동일
+
+# 잎 색상 (HSV Hue, OpenCV 0~179) - 대부분 건강한 녹색, 일부 노란 잎
+LEAF_HUES = (45, 50, 55, 60, 65, 70, 30)
+
+
+def make_lettuce_image(width, height, leaf_count, seed=0):
+    """
+    배지(갈색 배경) 위에 타원형 잎 leaf_count장을 그린 BGR 이미지 생성
+    같은 인자 + seed면 항상 같은 이미지
+    """
+    rng = np.random.default_rng(seed)
+
+    # 배경: 어두운 갈색 + 노이즈 (JPEG 압축률이 실제 사진과 비슷해지도록)
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:] = (40, 60, 80)
+    noise = rng.integers(-20, 21, size=(height, width, 3), dtype=np.int16)
+    img = np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+    # 잎: 중앙 부근에 모인 회전된 타원
+    cx, cy = width / 2, height / 2
+    scale = min(width, height)
+    for _ in range(leaf_count):
+        center = (int(cx + rng.normal(0, scale * 0.15)), int(cy + rng.normal(0, scale * 0.15)))
+        axes = (int(scale * rng.uniform(0.06, 0.14)), int(scale * rng.uniform(0.03, 0.07)))
+        angle = float(rng.uniform(0, 180))
+        hue = int(rng.choice(LEAF_HUES))
+        hsv = np.uint8([[[hue, int(rng.integers(140, 230)), int(rng.integers(110, 210))]]])
+        color = tuple(int(c) for c in cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0, 0])
+        cv2.ellipse(img, center, axes, angle, 0, 360, color, -1, cv2.LINE_AA)
+        # 잎맥
+        cv2.ellipse(img, center, (axes[0], 1), angle, 0, 360, tuple(min(255, c + 30) for c in color), 1, cv2.LINE_AA)
+
+    return img
+
+
+def make_jpeg(width, height, leaf_count, seed=0, quality=JPEG_QUALITY):
+    """합성 이미지를 업로드용 JPEG 바이트로 인코딩"""
+    img = make_lettuce_image(width, height, leaf_count, seed)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("JPEG 인코딩 실패")
+    return buf.tobytes()
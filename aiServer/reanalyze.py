@@ -0,0 +1,400 @@
+"""
+사진 보관함 일괄 재분석 (모델 교체 후 전체 재채점, HTTP 서버를 거치지 않음)
+
+사용 예 (aiServer 디렉터리에서 실행):
+    # 폴더의 사진 전체 -> Vision 결과만 (환경 데이터가 없으므로 수확일 예측 생략)
+    python reanalyze.py --images /data/crop_photos --output rescored.csv
+
+    # 매니페스트(image,module_id,days_grown,avg_temp,avg_hum,total_lux,water_ph[,crop_type]) -> Vision + 수확일 예측
+    python reanalyze.py --manifest archive.csv --output rescored.parquet --workers 8 --batch-size 8
+
+    # 중단 후 같은 명령을 다시 실행하면 체크포인트 이후부터 이어서 처리 (--restart: 처음부터)
+
+- 부모 프로세스가 Vision / 수확 예측 모델을 1회 로드한 뒤 워커를 fork (모델 메모리 공유)
+- 워커는 사진 batch-size장을 작물별로 analyze_leaf_area_batch() 1회, predict_harvest_days_batch() 1회로 처리
+  (기본 작물 외 모델은 워커가 처음 필요할 때 로드)
+- 결과는 묶음 단위로 바로 기록: .csv는 한 파일에 이어쓰기, .parquet은 폴더에 part 파일 추가 (polars)
+- 체크포인트(<output>.checkpoint)에 완료된 묶음을 기록 -> 재시작 시 기록되지 않은 결과는 잘라내고 이어서 처리
+"""
+import argparse
+import csv
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
+# 대량 처리에서는 마이크로 배칭 대신 묶음 단위 배치 추론을 직접 사용
+os.environ.setdefault("AI_MICROBATCH_MAX_SIZE", "1")
+# 부모는 단일 스레드로 로드 / 워밍업 (fork 후 워커에서 스레드 수 지정, inference_pool과 동일한 이유)
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+ENV_FIELDS = ["days_grown", "avg_temp", "avg_hum", "total_lux", "water_ph"]
+OUTPUT_FIELDS = [
+    "image", "module_id", "crop_type", "days_grown", "leaf_area", "leaf_count", "avg_hue",
+    "health_score", "health_msg", "remaining_days", "vision_model_version", "harvest_model_version",
+]
+PARQUET_TYPES = {
+    "image": "Utf8", "module_id": "Int64", "crop_type": "Utf8", "days_grown": "Int64", "leaf_area": "Float64", "leaf_count": "Int64",
+    "avg_hue": "Float64", "health_score": "Int64", "health_msg": "Utf8", "remaining_days": "Int64",
+    "vision_model_version": "Utf8", "harvest_model_version": "Utf8",
+}
+PROGRESS_INTERVAL = 10.0  # 진행 상황 출력 간격(초)
+
+
+# =========================================================
+# 입력 목록
+# =========================================================
+def _number(value, cast):
+    return cast(value) if value not in (None, "") else None
+
+
+def load_items(images_dir=None, manifest=None):
+    """
+    분석 대상 목록 [{"image", "path", "module_id", "crop_type", ENV_FIELDS...}, ...]
+    - images_dir: 하위 폴더까지 사진 검색 (환경 데이터 없음, 기본 작물)
+    - manifest: CSV (image 열은 매니페스트 기준 상대 경로 또는 절대 경로, crop_type 열은 생략 가능)
+    """
+    from services.crop_registry import get_crop
+
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        items = []
+        with open(manifest, encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                item = {"image": row["image"], "path": os.path.join(base, row["image"]),
+                        "module_id": _number(row.get("module_id"), int),
+                        "crop_type": get_crop(row.get("crop_type") or None)[0],
+                        "days_grown": _number(row.get("days_grown"), int)}
+                for field in ENV_FIELDS[1:]:
+                    item[field] = _number(row.get(field), float)
+                items.append(item)
+        return items
+
+    root = os.path.abspath(images_dir)
+    paths = sorted(p for p in glob.glob(os.path.join(root, "**", "*"), recursive=True)
+                   if p.lower().endswith(IMAGE_EXTS))
+    crop = get_crop()[0]
+    return [dict({"image": os.path.relpath(p, root), "path": p, "module_id": None, "crop_type": crop},
+                 **{field: None for field in ENV_FIELDS}) for p in paths]
+
+
+def has_env(item):
+    return all(item[field] is not None for field in ENV_FIELDS)
+
+
+# =========================================================
+# 워커 (fork된 프로세스에서 실행)
+# =========================================================
+def _init_worker(threads):
+    """[워커] 코어를 워커끼리 나눠 쓰도록 네이티브 스레드 수 제한"""
+    import cv2
+    cv2.setNumThreads(threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def analyze_chunk(items):
+    """사진 묶음 1개 -> 결과 행 리스트 (작물별 Vision 배치 1회 + 수확일 예측 배치 1회)"""
+    from services import vision_service
+    from services.predict_service import predict_harvest_days_batch, registry_for
+
+    groups = {}
+    for i, item in enumerate(items):
+        groups.setdefault(item["crop_type"], []).append(i)
+
+    visions = [None] * len(items)
+    remaining_by_index = {}
+    versions = {}
+    for crop, indices in groups.items():
+        for i, vision in zip(indices, vision_service.analyze_leaf_area_batch([items[i]["path"] for i in indices], crop)):
+            visions[i] = vision
+
+        # 환경 데이터가 있는 행만 수확일 예측 (서버와 같은 입력 구성)
+        targets = [i for i in indices if has_env(items[i])]
+        remaining = predict_harvest_days_batch([{
+            "days_grown": items[i]["days_grown"],
+            "avg_temp": items[i]["avg_temp"],
+            "total_lux": items[i]["total_lux"],
+            "leaf_area": visions[i].get("leaf_area", 0.0),
+            "avg_hum": items[i]["avg_hum"],
+            "water_ph": items[i]["water_ph"],
+            "leaf_count": visions[i].get("leaf_count", 0.0),
+        } for i in targets], crop)
+        remaining_by_index.update(zip(targets, remaining))
+        versions[crop] = (vision_service.model_version_for(crop), registry_for(crop).version)
+
+    rows = []
+    for i, (item, vision) in enumerate(zip(items, visions)):
+        vision_version, harvest_version = versions[item["crop_type"]]
+        rows.append({
+            "image": item["image"],
+            "module_id": item["module_id"],
+            "crop_type": item["crop_type"],
+            "days_grown": item["days_grown"],
+            "leaf_area": float(vision.get("leaf_area", 0.0)),
+            "leaf_count": int(vision.get("leaf_count", 0)),
+            "avg_hue": float(vision.get("avg_hue", 0.0)),
+            "health_score": int(vision.get("health_score", 0)),
+            "health_msg": vision.get("health_msg"),
+            "remaining_days": remaining_by_index.get(i),
+            "vision_model_version": vision_version,
+            "harvest_model_version": harvest_version,
+        })
+    return rows
+
+
+# =========================================================
+# 결과 기록 + 체크포인트
+# =========================================================
+class CsvSink:
+    """CSV 한 파일에 이어쓰기. 체크포인트에는 묶음 기록 후 파일 크기(offset)를 남김"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def open(self, offset):
+        """offset(마지막 체크포인트 시점 크기) 이후 내용은 미완료 묶음이므로 잘라냄"""
+        exists = os.path.exists(self.path)
+        self._file = open(self.path, "r+" if exists else "w", encoding="utf-8", newline="")
+        self._file.truncate(offset if exists else 0)
+        self._file.seek(0, os.SEEK_END)
+        self._writer = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS)
+        if self._file.tell() == 0:
+            self._writer.writeheader()
+
+    def write(self, chunk_id, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return {"offset": self._file.tell()}
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    """폴더에 묶음마다 part-<번호>.parquet 추가 (임시 파일에 쓰고 rename -> 반쯤 쓰인 파일 없음)"""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            import polars
+        except ImportError:
+            raise SystemExit("Parquet 출력에는 polars가 필요합니다 (pip install polars) - .csv로 저장하거나 설치 후 실행")
+        self._polars = polars
+
+    def open(self, done_parts):
+        """체크포인트에 없는 part 파일(미완료 묶음)은 삭제"""
+        os.makedirs(self.path, exist_ok=True)
+        for name in os.listdir(self.path):
+            if name.startswith("part-") and name not in done_parts:
+                os.remove(os.path.join(self.path, name))
+
+    def write(self, chunk_id, rows):
+        name = f"part-{chunk_id:06d}.parquet"
+        tmp = os.path.join(self.path, name + ".tmp")
+        schema = {field: getattr(self._polars, dtype) for field, dtype in PARQUET_TYPES.items()}
+        frame = self._polars.DataFrame(rows, schema=schema)
+        frame.write_parquet(tmp)
+        os.replace(tmp, os.path.join(self.path, name))
+        return {"part": name}
+
+    def close(self):
+        pass
+
+
+class Checkpoint:
+    """
+    <output>.checkpoint (JSON Lines)
+    - 첫 줄: 모델 버전 (다른 모델로 만든 체크포인트에는 이어 쓰지 않음)
+    - 이후: 완료된 묶음마다 {"chunk", "images", "offset" | "part"}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header = None
+        self.entries = []
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        parsed = []
+        for line in lines:
+            try:
+                parsed.append(json.loads(line))
+            except json.JSONDecodeError:
+                break  # 기록 도중 중단된 마지막 줄
+        if parsed:
+            self.header, self.entries = parsed[0], parsed[1:]
+
+    def reset(self, header):
+        self.header, self.entries = header, []
+        self._write_lines([header], "w")
+
+    def add(self, entry):
+        self.entries.append(entry)
+        self._write_lines([entry], "a")
+
+    def _write_lines(self, objs, mode):
+        with open(self.path, mode, encoding="utf-8") as f:
+            for obj in objs:
+                f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @property
+    def done_images(self):
+        return {image for entry in self.entries for image in entry["images"]}
+
+
+# =========================================================
+# 실행
+# =========================================================
+def _load_models(need_harvest):
+    """부모 프로세스에서 모델 로드 (fork된 워커가 그대로 물려받음)"""
+    from services import vision_service
+    from services.predict_service import harvest_registry
+
+    if not vision_service.load_model():
+        raise SystemExit(f"Vision 모델 로드 실패: {vision_service.load_error}")
+    harvest_version = harvest_registry.load()
+    if need_harvest and harvest_version is None:
+        raise SystemExit("수확 예측 모델(harvest_model.pkl)이 없습니다 - 대체 로직으로 재채점하지 않음")
+    return {"vision_model_version": vision_service.MODEL_VERSION, "vision_backend": vision_service.VISION_BACKEND,
+            "harvest_model_version": harvest_version}
+
+
+class Progress:
+    """처리량 / 남은 시간 출력"""
+
+    def __init__(self, total, already_done):
+        self.total = total
+        self.done = already_done
+        self.start_done = already_done
+        self.start = self.last_print = time.perf_counter()
+        self.errors = 0
+
+    def update(self, rows):
+        from services.vision_service import is_valid_result
+        self.done += len(rows)
+        self.errors += sum(1 for row in rows if not is_valid_result(row))
+        now = time.perf_counter()
+        if now - self.last_print >= PROGRESS_INTERVAL:
+            self.last_print = now
+            print(self.line(now), flush=True)
+
+    def rate(self, now=None):
+        elapsed = (now or time.perf_counter()) - self.start
+        return (self.done - self.start_done) / elapsed if elapsed > 0 else 0.0
+
+    def line(self, now=None):
+        rate = self.rate(now)
+        if rate <= 0:
+            return f"[{self.done}/{self.total}] 측정 중"
+        eta = (self.total - self.done) / rate
+        return f"[{self.done}/{self.total}] {rate:.2f} img/s, 오류 {self.errors}, 남은 시간 {eta / 60:.1f}분"
+
+
+def run(items, output, workers, threads, batch_size, restart=False):
+    """전체 재분석 실행 -> 요약 dict"""
+    fmt = "parquet" if output.lower().endswith(".parquet") else "csv"
+    sink = ParquetSink(output) if fmt == "parquet" else CsvSink(output)
+    checkpoint = Checkpoint(output + ".checkpoint")
+
+    versions = _load_models(need_harvest=any(has_env(item) for item in items))
+    if not restart:
+        checkpoint.load()
+    if checkpoint.header is not None and checkpoint.header != versions:
+        raise SystemExit(f"체크포인트의 모델 버전이 다릅니다 ({checkpoint.header}) - --restart로 처음부터 실행하세요")
+    if checkpoint.header is None:
+        checkpoint.reset(versions)
+
+    if fmt == "parquet":
+        sink.open({entry["part"] for entry in checkpoint.entries})
+    else:
+        sink.open(checkpoint.entries[-1]["offset"] if checkpoint.entries else 0)
+
+    done = checkpoint.done_images
+    pending = [item for item in items if item["image"] not in done]
+    chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    next_chunk = max((entry["chunk"] for entry in checkpoint.entries), default=-1) + 1
+    print(f"대상 {len(items)}장, 완료 {len(items) - len(pending)}장, 남은 묶음 {len(chunks)}개 "
+          f"(workers={workers}, threads={threads}, batch={batch_size}, {fmt}) {versions}", flush=True)
+
+    progress = Progress(len(items), len(items) - len(pending))
+    # fork: 부모가 로드한 모델을 워커가 공유 / 대기 묶음은 워커 수의 2배까지만 (메모리 일정)
+    context = get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(threads,)) as pool:
+            queue = iter(chunks)
+            running = {pool.submit(analyze_chunk, chunk): chunk for chunk in itertools.islice(queue, workers * 2)}
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    chunk = running.pop(future)
+                    rows = future.result()
+                    entry = sink.write(next_chunk, rows)
+                    checkpoint.add({"chunk": next_chunk, "images": [item["image"] for item in chunk], **entry})
+                    next_chunk += 1
+                    progress.update(rows)
+                    following = next(queue, None)
+                    if following is not None:
+                        running[pool.submit(analyze_chunk, following)] = following
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - progress.start
+    summary = {
+        "images": len(items),
+        "processed": progress.done - progress.start_done,
+        "skipped_from_checkpoint": progress.start_done,
+        "errors": progress.errors,
+        "seconds": round(elapsed, 1),
+        "images_per_sec": round(progress.rate(), 2),
+        "output": os.path.abspath(output),
+        **versions,
+    }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python reanalyze.py", description="사진 보관함 일괄 재분석")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--images", help="사진 폴더 (하위 폴더 포함)")
+    source.add_argument("--manifest", help="CSV: image,module_id,days_grown,avg_temp,avg_hum,total_lux,water_ph[,crop_type]")
+    parser.add_argument("--output", required=True, help="결과 경로 (.csv 또는 .parquet)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="워커 프로세스 수")
+    parser.add_argument("--threads", type=int, default=0, help="워커당 스레드 수 (0: 코어 / 워커)")
+    parser.add_argument("--batch-size", type=int, default=8, help="YOLO 배치 추론 1회당 사진 수")
+    parser.add_argument("--restart", action="store_true", help="체크포인트를 무시하고 처음부터")
+    args = parser.parse_args(argv)
+
+    from services.crop_registry import UnknownCropError
+    try:
+        items = load_items(args.images, args.manifest)
+    except UnknownCropError as e:
+        print(e)
+        return 1
+    if not items:
+        print("분석할 사진이 없습니다.")
+        return 1
+    workers = max(1, args.workers)
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+
+    summary = run(items, args.output, workers, threads, max(1, args.batch_size), args.restart)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
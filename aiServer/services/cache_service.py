@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# =========================================================
+# [설정] Vision 결과 캐시 (환경 변수로 조정)
+# =========================================================
+CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))  # 메모리 예산 (기본 16MB)
+CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "86400"))                           # 항목 유효 시간(초, 기본 24시간)
+CACHE_DISK_PATH = os.getenv("AI_CACHE_DISK_PATH", "")                            # 디스크 캐시 경로 (비우면 사용 안 함)
+
+ENTRY_OVERHEAD = 256  # dict/키 등 항목당 대략적인 부가 메모리(바이트)
+
+
+class ResultCache:
+    """
+    이미지 해시 + 모델 버전을 키로 하는 Vision 결과 캐시 (LRU + TTL + 메모리 예산)
+    - 같은 사진이 재전송/재분석되면 YOLO 추론을 건너뛰고 저장된 결과를 재사용
+    - 환경 데이터가 달라도 Vision 결과는 같으므로, LGBM 예측만 다시 수행하면 됨
+    - disk_path를 주면 SQLite 디스크 계층을 추가로 사용 (서버 재시작 후에도 유지)
+    - get/put은 이벤트 루프에서 호출: 메모리 계층은 바로 처리하고, 디스크 계층만 스레드에서 실행
+      (메모리 락을 잡은 채 SQLite를 기다리지 않도록 디스크는 별도 락 사용)
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL, disk_path=CACHE_DISK_PATH):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, created_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+
+        self._disk = None
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+        # 캐시 지표
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(image_bytes, model_version):
+        """이미지 내용 해시 + 모델 버전 (모델이 바뀌면 자동으로 다른 키)"""
+        return f"{hashlib.sha256(image_bytes).hexdigest()}:{model_version}"
+
+    async def get(self, key):
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        if self._disk is not None:
+            value = await asyncio.to_thread(self._get_disk, key)
+            if value is not None:
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._store(key, dict(value), now)
+        if self._disk is not None:
+            await asyncio.to_thread(self._put_disk, key, value, now)
+
+    def _get_memory(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, created_at = entry
+            if now - created_at <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(value)
+            # 만료된 항목 제거
+            del self._entries[key]
+            self._bytes -= size
+            return None
+
+    def _get_disk(self, key):
+        """디스크 계층 조회 후 메모리 계층으로 올림 (워커 스레드에서 실행)"""
+        with self._disk_lock:
+            row = self._disk.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        value = json.loads(row[0])
+        with self._lock:
+            self._store(key, value, row[1])
+            self.disk_hits += 1
+        return dict(value)
+
+    def _put_disk(self, key, value, now):
+        """워커 스레드에서 실행"""
+        data = json.dumps(value, ensure_ascii=False)
+        with self._disk_lock:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?)", (key, data, now)
+            )
+            self._disk.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl,))
+
+    def _store(self, key, value, created_at):
+        """메모리 계층에 저장 후 예산 초과분을 오래된 순(LRU)으로 제거 (락 보유 상태에서 호출)"""
+        size = len(key) + len(json.dumps(value, ensure_ascii=False)) + ENTRY_OVERHEAD
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (value, size, created_at)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_sec": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "disk_enabled": self._disk is not None
+        }
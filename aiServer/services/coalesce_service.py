@@ -0,0 +1,94 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+# =========================================================
+# [설정] 중복 분석 요청 합치기 (환경 변수로 조정)
+# =========================================================
+COALESCE_TTL = float(os.getenv("AI_COALESCE_TTL", "30"))        # 완료 후 같은 요청에 결과를 재사용하는 시간(초)
+COALESCE_MAX_RECENT = int(os.getenv("AI_COALESCE_MAX_RECENT", "1024"))
+
+
+class SingleFlight:
+    """
+    같은 키의 동시 요청을 1회 실행으로 합칩니다. (이벤트 루프 전용, 락 불필요)
+    - 먼저 온 요청(leader)만 fn()을 실행하고, 실행 중 들어온 같은 키 요청은 그 결과를 함께 기다림
+    - 완료된 결과는 ttl 동안 보관해, 응답 직후 도착한 재전송도 다시 실행하지 않음
+    - leader가 실패하면 같은 예외를 그대로 전달하고 (결과는 보관하지 않음),
+      leader가 취소되면(클라이언트 연결 끊김 등) 기다리던 요청 중 하나가 다시 실행
+    """
+
+    def __init__(self, ttl=COALESCE_TTL, max_recent=COALESCE_MAX_RECENT):
+        self.ttl = ttl
+        self.max_recent = max(0, max_recent)
+        self._inflight = {}              # key -> asyncio.Future
+        self._recent = OrderedDict()     # key -> (결과, 만료 시각)
+
+        # 지표
+        self.executions = 0   # 실제 실행 횟수
+        self.joined = 0       # 실행 중인 요청에 합류한 횟수
+        self.recent_hits = 0  # 보관된 결과를 재사용한 횟수
+
+    async def do(self, key, fn):
+        """(결과, 공유 여부) 반환. fn은 인자 없는 코루틴 함수"""
+        while True:
+            self._expire(time.monotonic())
+            recent = self._recent.get(key)
+            if recent is not None:
+                self.recent_hits += 1
+                return recent[0], True
+
+            future = self._inflight.get(key)
+            if future is None:
+                return await self._lead(key, fn), False
+
+            self.joined += 1
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # 이 요청 자체가 취소됨
+                # leader가 취소됨 -> 처음부터 다시 (이 요청이 새 leader가 될 수 있음)
+
+    async def _lead(self, key, fn):
+        future = asyncio.get_running_loop().create_future()
+        # 기다리는 요청이 없을 때 실패해도 "exception was never retrieved" 경고가 나지 않도록 처리
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        self.executions += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            if self.ttl > 0 and self.max_recent > 0:
+                self._recent[key] = (result, time.monotonic() + self.ttl)
+                while len(self._recent) > self.max_recent:
+                    self._recent.popitem(last=False)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def _expire(self, now):
+        """만료된 보관 결과 제거 (삽입 순서 = 만료 순서)"""
+        while self._recent:
+            key, (_, expires) = next(iter(self._recent.items()))
+            if expires > now:
+                break
+            del self._recent[key]
+
+    def stats(self):
+        return {
+            "in_flight": len(self._inflight),
+            "recent": len(self._recent),
+            "ttl_sec": self.ttl,
+            "executions": self.executions,
+            "joined": self.joined,
+            "recent_hits": self.recent_hits,
+        }
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from services.logging_service import get_logger
+
+logger = get_logger("crops")
+
+# =========================================================
+# [설정] 작물별 모델 레지스트리 (환경 변수로 조정)
+# models/crops.json 형식:
+#   {"lettuce": {"vision_model": "lettuce_analyze",      -> models/lettuce_analyze.pt (백엔드별 파일은 engine_service)
+#                "harvest_model": "harvest_model.pkl",   -> models/harvest_model.pkl
+#                "label": "Lettuce",                     -> 수확 모델 LabelEncoder의 작물 이름
+#                "hue": {"healthy_min": 40, "healthy_max": 85, "yellow_min": 25}}, ...}
+# 여러 작물이 같은 모델 파일을 가리키면 한 번만 로드해서 함께 사용합니다.
+# =========================================================
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "../models")
+CROPS_CONFIG = os.getenv("AI_CROPS_CONFIG", os.path.join(MODELS_DIR, "crops.json"))
+DEFAULT_CROP = os.getenv("AI_DEFAULT_CROP", "lettuce")
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("AI_MODEL_MEMORY_BUDGET_MB", "1024"))  # 프로세스당 상주 모델 예산
+
+# 상추 기준 건강 판정 Hue 범위 (crops.json에서 작물별로 덮어씀)
+DEFAULT_HUE = {"healthy_min": 40, "healthy_max": 85, "yellow_min": 25}
+
+# crops.json이 없을 때 사용하는 기본 설정 (기존 상추 전용 동작과 동일)
+BUILTIN_CROPS = {
+    "lettuce": {"vision_model": "lettuce_analyze", "harvest_model": "harvest_model.pkl", "label": "Lettuce"},
+}
+
+
+class UnknownCropError(ValueError):
+    """등록되지 않은 작물 종류 (-> 400)"""
+
+
+def load_crops(path=CROPS_CONFIG):
+    """작물 설정 로드 (이름은 소문자, hue는 기본값 위에 덮어씀)"""
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+    else:
+        raw = BUILTIN_CROPS
+    crops = {}
+    for name, spec in raw.items():
+        crops[name.strip().lower()] = {
+            "vision_model": spec["vision_model"],
+            "harvest_model": spec["harvest_model"],
+            "label": spec.get("label", name.capitalize()),
+            "hue": {**DEFAULT_HUE, **spec.get("hue", {})},
+        }
+    return crops
+
+
+CROPS = load_crops()
+
+
+def get_crop(crop_type=None):
+    """작물 이름(대소문자 무관, None이면 기본 작물) -> (이름, 설정)"""
+    name = (crop_type or DEFAULT_CROP).strip().lower()
+    spec = CROPS.get(name)
+    if spec is None:
+        raise UnknownCropError(f"등록되지 않은 작물: {crop_type} (가능: {', '.join(sorted(CROPS))})")
+    return name, spec
+
+
+def _disk_bytes(path):
+    """모델 파일(또는 OpenVINO 모델 폴더) 크기 - 상주 메모리 예산 계산 기준"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+class ModelCache:
+    """
+    필요할 때 로드하고, 상주 모델 크기 합이 예산을 넘으면 가장 오래 안 쓴 모델부터 내립니다. (LRU)
+    - 크기는 모델 파일 크기로 계산 (가중치가 그대로 메모리에 올라가는 .pt / .onnx / .pkl 기준)
+    - pin()한 모델(기동 시 로드하는 기본 작물)은 내리지 않음
+    - 추론 중인 모델을 내려도 실행 중인 호출이 참조를 들고 있어 끝난 뒤에 해제됨
+    - 프로세스 워커 모드에서는 워커마다 따로 예산을 적용
+    """
+
+    def __init__(self, budget_mb=MODEL_MEMORY_BUDGET_MB):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._entries = OrderedDict()  # key -> (모델 객체, 크기)
+        self._pinned = set()
+        self._lock = threading.Lock()       # 목록 갱신
+        self._load_lock = threading.Lock()  # 로드는 한 번에 하나씩 (같은 모델 중복 로드 방지)
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, key, loader):
+        """key의 모델 반환 (없으면 loader() -> (모델 객체, 모델 파일 경로)로 로드 후 예산에 맞게 정리)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        with self._load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return entry[0]
+            start = time.perf_counter()
+            obj, path = loader()
+            size = _disk_bytes(path)
+            with self._lock:
+                self._entries[key] = (obj, size)
+                self.loads += 1
+                self._evict()
+            logger.info("Model Cached", key=str(key), size_mb=round(size / 1048576, 1),
+                        load_seconds=round(time.perf_counter() - start, 3), resident_mb=round(self.resident_bytes / 1048576, 1))
+            return obj
+
+    def pin(self, key):
+        with self._lock:
+            self._pinned.add(key)
+
+    def _evict(self):
+        """예산 초과분을 오래된 순으로 제거 (방금 로드한 모델 / 고정 모델 제외, 락 보유 상태에서 호출)"""
+        newest = next(reversed(self._entries))
+        for key in list(self._entries):
+            if self.resident_bytes <= self.budget_bytes:
+                break
+            if key == newest or key in self._pinned:
+                continue
+            del self._entries[key]
+            self.evictions += 1
+            logger.info("Model Evicted", key=str(key))
+
+    @property
+    def resident_bytes(self):
+        return sum(size for _, size in self._entries.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "budget_mb": round(self.budget_bytes / 1048576, 1),
+                "resident_mb": round(self.resident_bytes / 1048576, 1),
+                "models": [{"key": "/".join(key), "size_mb": round(size / 1048576, 1), "pinned": key in self._pinned}
+                           for key, (_, size) in self._entries.items()],
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+# 프로세스 전체에서 공유하는 모델 캐시 (Vision 엔진 + 수확 예측 모델)
+model_cache = ModelCache()
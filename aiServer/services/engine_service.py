@@ -0,0 +1,297 @@
+import argparse
+import glob
+import hashlib
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from services.logging_service import get_logger
+
+logger = get_logger("engine")
+
+# =========================================================
+# [설정] 잎 Segmentation 추론 백엔드 (환경 변수로 선택)
+# - torch    : lettuce_analyze.pt 를 PyTorch로 실행 (기본값)
+# - onnx     : lettuce_analyze.onnx 를 ONNX Runtime CPU로 실행   (pip install onnxruntime)
+# - openvino : lettuce_analyze_openvino_model/ 을 OpenVINO로 실행 (pip install openvino)
+# - onnx-int8 / openvino-int8 : 위 두 형식의 INT8 양자화 모델 (소형 CPU / 라즈베리파이급 장비용)
+# ONNX / OpenVINO 모델은 아래 export 명령으로 미리 만들어 두어야 합니다.
+#   python -m services.engine_service export --backend onnx
+#   python -m services.engine_service export --backend onnx-int8 --calib-images <보정용 사진 폴더>
+#   python -m services.engine_service export --backend openvino-int8 --data <데이터셋 yaml>
+#   python -m services.engine_service parity --backend onnx --images <검증용 사진 폴더>
+# INT8 모델의 정확도 손실은 FP32와 나란히 비교해 확인합니다.
+#   python -m benchmark.quantization --images <라벨링된 사진 폴더> --candidates onnx-int8
+# =========================================================
+VISION_BACKEND = os.getenv("AI_VISION_BACKEND", "torch")
+VISION_IMGSZ = int(os.getenv("AI_VISION_IMGSZ", "640"))  # export 입력 크기 (학습 크기와 동일하게)
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "../models")
+MODEL_NAME = "lettuce_analyze"  # 기본 작물(상추) 모델 이름 - 작물별 모델은 crop_registry(models/crops.json)에서 지정
+
+# 백엔드 -> (모델 파일/폴더 이름 형식, ultralytics export format)
+BACKENDS = {
+    "torch": ("{name}.pt", None),
+    "onnx": ("{name}.onnx", "onnx"),
+    "openvino": ("{name}_openvino_model", "openvino"),
+    "onnx-int8": ("{name}_int8.onnx", "onnx"),
+    "openvino-int8": ("{name}_int8_openvino_model", "openvino"),
+}
+
+CALIB_MAX_IMAGES = 100  # ONNX INT8 보정에 사용할 최대 이미지 수
+
+# 파리티 검사 기본 허용치
+PARITY_MIN_IOU = 0.95    # 전체 잎 마스크 IoU 하한
+PARITY_AREA_TOL = 0.02   # 잎 면적 상대 오차 상한 (2%)
+MIN_LEAF_AREA = 50       # vision_service 노이즈 필터와 동일
+
+
+def model_path(backend, name=MODEL_NAME):
+    if backend not in BACKENDS:
+        raise ValueError(f"지원하지 않는 백엔드: {backend} (가능: {', '.join(BACKENDS)})")
+    return os.path.join(MODELS_DIR, BACKENDS[backend][0].format(name=name))
+
+
+def resolve_model(backend=VISION_BACKEND, name=MODEL_NAME, fallback=True):
+    """
+    실제로 로드할 (백엔드, 경로) 결정
+    - fallback=True: export된 모델이 없으면 경고 후 torch 백엔드로 대체
+    """
+    path = model_path(backend, name)
+    if backend != "torch" and not os.path.exists(path):
+        if not fallback:
+            raise FileNotFoundError(f"{backend} 모델이 없습니다: {path} (export 먼저 실행)")
+        logger.warning("Exported model not found - torch 백엔드로 대체", backend=backend, path=path)
+        backend, path = "torch", model_path("torch", name)
+    return backend, path
+
+
+def model_version(path):
+    """
+    모델 파일 내용 해시 (결과 캐시 키에 포함 -> 모델 교체 시 이전 결과 무효화)
+    OpenVINO처럼 폴더로 저장되는 모델은 폴더 안 파일 전체를 이름순으로 해시
+    """
+    files = sorted(glob.glob(os.path.join(path, "*"))) if os.path.isdir(path) else [path]
+    h = hashlib.sha256()
+    for file in files:
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+class VisionEngine:
+    """
+    백엔드와 무관하게 같은 predict() 인터페이스를 제공하는 추론 엔진
+    (ultralytics가 .pt / .onnx / OpenVINO 모델 모두 같은 Results 객체로 반환하므로
+     마스크 후처리 코드는 그대로 사용)
+    - fallback=True: export된 모델이 없으면 경고 후 torch 백엔드로 대체
+    - name: 모델 이름 (작물별 모델, 기본: lettuce_analyze)
+    """
+
+    def __init__(self, backend=VISION_BACKEND, fallback=True, name=MODEL_NAME):
+        backend, path = resolve_model(backend, name, fallback)
+
+        from ultralytics import YOLO  # torch 포함 import 비용이 커서 실제 로드 시점에 import
+
+        self.name = name
+        self.backend = backend
+        self.path = os.path.abspath(path)
+        self.model = YOLO(path, task="segment")
+        self.version = model_version(path)
+
+    def predict(self, source, conf=0.25):
+        return self.model.predict(source, conf=conf)
+
+
+def export_model(backend, imgsz=VISION_IMGSZ, data=None, calib_images=None, name=MODEL_NAME):
+    """
+    <name>.pt (기본 lettuce_analyze.pt) 를 CPU 추론용 형식으로 변환 (models/ 폴더에 저장)
+    dynamic=True: 배치 크기가 가변이어야 일괄 분석 / 마이크로 배칭이 그대로 동작
+    - openvino-int8: ultralytics(NNCF) 후처리 양자화, data(데이터셋 yaml)로 보정
+    - onnx-int8: FP32 ONNX를 만든 뒤 ONNX Runtime 정적 양자화, calib_images 폴더로 보정
+    """
+    fmt = BACKENDS[backend][1]
+    if fmt is None:
+        raise ValueError("torch 백엔드는 export 대상이 아닙니다.")
+    if backend == "onnx-int8":
+        return quantize_onnx(calib_images, imgsz, name)
+
+    options = {"format": fmt, "imgsz": imgsz, "dynamic": True}
+    if fmt == "onnx":
+        options["simplify"] = True
+    if backend == "openvino-int8":
+        if not data:
+            raise ValueError("openvino-int8 export에는 보정용 데이터셋 yaml(--data)이 필요합니다.")
+        options.update(int8=True, data=data)
+    from ultralytics import YOLO
+    exported = YOLO(model_path("torch", name)).export(**options)
+    logger.info("Model Exported", backend=backend, path=str(exported))
+    return exported
+
+
+def _letterbox(img, imgsz):
+    """ultralytics 전처리와 같은 방식: 비율 유지 리사이즈 + 114 회색 패딩 -> 1x3xHxW float32 (0~1)"""
+    h, w = img.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    rgb = canvas[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(rgb, dtype=np.float32)[None] / 255.0
+
+
+def quantize_onnx(calib_images, imgsz=VISION_IMGSZ, name=MODEL_NAME):
+    """
+    FP32 ONNX -> INT8 ONNX (QDQ, 채널별 가중치 양자화)
+    보정 이미지로 활성값 범위를 측정하므로 실제 재배 사진을 넣어야 정확도 손실이 작습니다.
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    if not calib_images:
+        raise ValueError("onnx-int8 export에는 보정용 사진 폴더(--calib-images)가 필요합니다.")
+    paths = sorted(p for p in glob.glob(os.path.join(calib_images, "*"))
+                   if p.lower().endswith((".jpg", ".jpeg", ".png")))[:CALIB_MAX_IMAGES]
+    if not paths:
+        raise ValueError(f"보정용 사진이 없습니다: {calib_images}")
+
+    fp32_path = model_path("onnx", name)
+    if not os.path.exists(fp32_path):
+        export_model("onnx", imgsz, name=name)
+    input_name = onnx.load(fp32_path, load_external_data=False).graph.input[0].name
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._iter = iter(paths)
+
+        def get_next(self):
+            for path in self._iter:
+                img = cv2.imread(path)
+                if img is not None:
+                    return {input_name: _letterbox(img, imgsz)}
+            return None
+
+    int8_path = model_path("onnx-int8", name)
+    quantize_static(
+        fp32_path, int8_path, _Reader(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+
+    # ultralytics가 클래스 이름 / stride / imgsz를 읽는 메타데이터를 FP32 모델에서 복사
+    fp32, int8 = onnx.load(fp32_path), onnx.load(int8_path)
+    del int8.metadata_props[:]
+    int8.metadata_props.extend(fp32.metadata_props)
+    onnx.save(int8, int8_path)
+
+    logger.info("Model Exported", backend="onnx-int8", path=int8_path, calib_images=len(paths))
+    return int8_path
+
+
+# =========================================================
+# 파리티 검사 (torch 결과와 마스크 / 면적 / 잎 개수 비교)
+# =========================================================
+def _leaf_masks(img, result):
+    """Result 1장 -> (잎 면적 배열, 전체 잎 합집합 마스크) - vision_service와 같은 이진화 기준"""
+    h, w = img.shape[:2]
+    union = np.zeros((h, w), dtype=bool)
+    areas = []
+    if result.masks is None:
+        return np.array(areas), union
+    for mask in result.masks.data.cpu().numpy():
+        binary = cv2.resize(mask, (w, h)) > 0.5
+        area = int(np.count_nonzero(binary))
+        if area >= MIN_LEAF_AREA:
+            areas.append(area)
+            union |= binary
+    return np.array(areas), union
+
+
+def compare_results(img, ref, cand):
+    """기준(torch) / 후보 백엔드 결과 1장 비교 -> 지표 dict"""
+    ref_areas, ref_union = _leaf_masks(img, ref)
+    cand_areas, cand_union = _leaf_masks(img, cand)
+    union = np.count_nonzero(ref_union | cand_union)
+    iou = np.count_nonzero(ref_union & cand_union) / union if union else 1.0
+    ref_total, cand_total = int(ref_areas.sum()), int(cand_areas.sum())
+    area_err = abs(cand_total - ref_total) / ref_total if ref_total else float(cand_total > 0)
+    return {
+        "leaf_count": (len(ref_areas), len(cand_areas)),
+        "leaf_area": (ref_total, cand_total),
+        "mask_iou": round(float(iou), 4),
+        "area_rel_err": round(float(area_err), 4),
+    }
+
+
+def _load_parity_images(images_dir, count):
+    if images_dir:
+        paths = sorted(p for p in glob.glob(os.path.join(images_dir, "*"))
+                       if p.lower().endswith((".jpg", ".jpeg", ".png")))
+        return [(os.path.basename(p), cv2.imread(p)) for p in paths[:count]]
+    # 검증용 사진이 없으면 벤치마크 합성 이미지 사용 (감지 결과가 적어 참고용)
+    from benchmark.synthetic import make_lettuce_image
+    return [(f"synthetic_{i}", make_lettuce_image(640, 480, 6, seed=i)) for i in range(count)]
+
+
+def check_parity(backend, images, min_iou=PARITY_MIN_IOU, area_tol=PARITY_AREA_TOL, name=MODEL_NAME):
+    """
+    images: [(이름, BGR ndarray)] -> (통과 여부, 이미지별 지표 리스트)
+    잎 개수는 같아야 하고, 마스크 IoU / 면적 오차가 허용치 안이어야 통과
+    """
+    reference = VisionEngine("torch", name=name)
+    candidate = VisionEngine(backend, fallback=False, name=name)
+    reports = []
+    ok = True
+    for image_name, img in images:
+        stats = compare_results(img, reference.predict(img)[0], candidate.predict(img)[0])
+        passed = (stats["leaf_count"][0] == stats["leaf_count"][1]
+                  and stats["mask_iou"] >= min_iou
+                  and stats["area_rel_err"] <= area_tol)
+        ok &= passed
+        reports.append({"image": image_name, "passed": passed, **stats})
+    return ok, reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m services.engine_service", description="Vision 추론 백엔드 도구")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="PyTorch 모델을 ONNX / OpenVINO로 변환")
+    p_export.add_argument("--backend", choices=[b for b in BACKENDS if b != "torch"], default="onnx")
+    p_export.add_argument("--imgsz", type=int, default=VISION_IMGSZ)
+    p_export.add_argument("--data", help="openvino-int8 보정용 데이터셋 yaml")
+    p_export.add_argument("--calib-images", help="onnx-int8 보정용 사진 폴더")
+    p_export.add_argument("--model", default=MODEL_NAME, help="모델 이름 (models/<model>.pt)")
+
+    p_parity = sub.add_parser("parity", help="torch 결과와 마스크 / 면적 비교")
+    p_parity.add_argument("--backend", choices=[b for b in BACKENDS if b != "torch"], default="onnx")
+    p_parity.add_argument("--images", help="검증용 사진 폴더 (없으면 합성 이미지)")
+    p_parity.add_argument("--count", type=int, default=20)
+    p_parity.add_argument("--min-iou", type=float, default=PARITY_MIN_IOU)
+    p_parity.add_argument("--area-tol", type=float, default=PARITY_AREA_TOL)
+    p_parity.add_argument("--model", default=MODEL_NAME, help="모델 이름 (models/<model>.pt)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        print(f"Exported: {export_model(args.backend, args.imgsz, args.data, args.calib_images, args.model)}")
+        return 0
+
+    ok, reports = check_parity(args.backend, _load_parity_images(args.images, args.count),
+                               args.min_iou, args.area_tol, args.model)
+    for r in reports:
+        mark = "OK  " if r["passed"] else "FAIL"
+        print(f"{mark} {r['image']:<40} leaves {r['leaf_count'][0]}/{r['leaf_count'][1]}  "
+              f"area {r['leaf_area'][0]}/{r['leaf_area'][1]} ({r['area_rel_err']:.2%})  IoU {r['mask_iou']:.4f}")
+    print(f"Parity {'PASSED' if ok else 'FAILED'}: torch vs {args.backend} ({len(reports)} images)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
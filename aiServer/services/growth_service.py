@@ -0,0 +1,236 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from services.logging_service import get_logger
+
+logger = get_logger("growth")
+
+# =========================================================
+# [설정] 모듈별 생육 상태 저장소 (환경 변수로 조정)
+# =========================================================
+GROWTH_PATH = os.getenv("AI_GROWTH_PATH", os.path.join(os.path.dirname(__file__), "../growth.db"))
+GROWTH_EMA_ALPHA = float(os.getenv("AI_GROWTH_EMA_ALPHA", "0.3"))        # EMA 가중치 (클수록 최근 값 반영)
+GROWTH_MIN_INTERVAL_DAYS = float(os.getenv("AI_GROWTH_MIN_INTERVAL_DAYS", "0.25"))  # 성장률 계산 최소 간격(일)
+GROWTH_HISTORY_LIMIT = 500  # /modules/{id}/growth?history=N 최대 행 수
+
+# 상태 컬럼 (module_state 테이블 / 응답 필드 순서)
+STATE_FIELDS = [
+    "module_id", "samples", "cycle_started_at", "updated_at", "image_key",
+    "days_grown", "leaf_area", "leaf_count", "avg_hue", "health_score", "remaining_days",
+    "ema_leaf_area", "ema_leaf_count", "ema_avg_hue",
+    "growth_rate_per_day", "relative_growth_pct", "rate_at", "rate_days_grown", "rate_ema_leaf_area",
+]
+
+
+def _ema(prev, value, alpha=GROWTH_EMA_ALPHA):
+    return value if prev is None else alpha * value + (1 - alpha) * prev
+
+
+def advance_state(state, module_id, days_grown, vision_result, remaining_days, image_key=None, now=None):
+    """
+    이전 상태 + 새 분석 1건 -> (새 상태, 새 표본 여부) (O(1), 이력을 다시 읽지 않음)
+    - 잎 면적 / 개수 / Hue는 EMA로 누적
+    - 성장률(면적/일)은 마지막 성장률 계산 시점 대비 EMA 면적 변화량을 경과 일수로 나눈 값의 EMA
+      (경과가 GROWTH_MIN_INTERVAL_DAYS 미만이면 쌓아 두었다가 다음 분석에서 계산)
+    - 재배 일수가 줄면 새 재배 주기로 보고 상태를 초기화
+    - 같은 사진(image_key)이 다시 들어오면 예측 남은 일수만 갱신
+    """
+    now = time.time() if now is None else now
+    leaf_area = float(vision_result.get("leaf_area", 0.0))
+    leaf_count = int(vision_result.get("leaf_count", 0))
+    avg_hue = float(vision_result.get("avg_hue", 0.0))
+    health_score = int(vision_result.get("health_score", 0))
+
+    if state is not None and days_grown < state["days_grown"]:
+        logger.info("New Growth Cycle", module_id=module_id, days_grown=days_grown)
+        state = None
+
+    if state is None:
+        return {
+            "module_id": module_id, "samples": 1, "cycle_started_at": now, "updated_at": now,
+            "image_key": image_key, "days_grown": days_grown, "leaf_area": leaf_area,
+            "leaf_count": leaf_count, "avg_hue": avg_hue, "health_score": health_score,
+            "remaining_days": remaining_days,
+            "ema_leaf_area": leaf_area, "ema_leaf_count": float(leaf_count), "ema_avg_hue": avg_hue,
+            "growth_rate_per_day": None, "relative_growth_pct": None,
+            "rate_at": now, "rate_days_grown": days_grown, "rate_ema_leaf_area": leaf_area,
+        }, True
+
+    new = dict(state, updated_at=now, days_grown=days_grown, remaining_days=remaining_days)
+    if image_key is not None and image_key == state["image_key"]:
+        return new, False
+
+    new.update(
+        samples=state["samples"] + 1, image_key=image_key,
+        leaf_area=leaf_area, leaf_count=leaf_count, avg_hue=avg_hue, health_score=health_score,
+        ema_leaf_area=_ema(state["ema_leaf_area"], leaf_area),
+        ema_leaf_count=_ema(state["ema_leaf_count"], leaf_count),
+        ema_avg_hue=_ema(state["ema_avg_hue"], avg_hue),
+    )
+
+    # 경과 일수: 재배 일수 차이 (같은 날 여러 번 분석하면 실제 경과 시간으로 대체)
+    elapsed = days_grown - state["rate_days_grown"]
+    if elapsed <= 0:
+        elapsed = (now - state["rate_at"]) / 86400
+    if elapsed >= GROWTH_MIN_INTERVAL_DAYS:
+        rate = (new["ema_leaf_area"] - state["rate_ema_leaf_area"]) / elapsed
+        new["growth_rate_per_day"] = _ema(state["growth_rate_per_day"], rate)
+        base = state["rate_ema_leaf_area"]
+        new["relative_growth_pct"] = round(new["growth_rate_per_day"] / base * 100, 2) if base > 0 else None
+        new["rate_at"] = now
+        new["rate_days_grown"] = days_grown
+        new["rate_ema_leaf_area"] = new["ema_leaf_area"]
+    return new, True
+
+
+class GrowthStore:
+    """
+    모듈별 분석 이력(append-only)과 누적 생육 상태를 SQLite에 저장합니다.
+    - 분석 1건마다 이력 1행 추가 + 상태 1행 갱신 (한 트랜잭션)
+    - 상태는 메모리에도 들고 있어 /modules/{id}/growth 조회는 DB를 읽지 않음
+    - 서버 재시작 시 상태 테이블만 읽어 복구 (이력은 다시 계산하지 않음)
+    """
+
+    def __init__(self, path=GROWTH_PATH):
+        self.path = os.path.abspath(path)
+        self._db = None
+        self._lock = threading.Lock()
+        self._states = {}  # module_id -> 상태 dict
+
+    def _open(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS growth_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                module_id INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                days_grown INTEGER NOT NULL,
+                leaf_area REAL NOT NULL,
+                leaf_count INTEGER NOT NULL,
+                avg_hue REAL NOT NULL,
+                health_score INTEGER NOT NULL,
+                remaining_days INTEGER
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS idx_growth_events_module ON growth_events (module_id, id)")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS module_state (
+                module_id INTEGER PRIMARY KEY,
+                samples INTEGER NOT NULL,
+                cycle_started_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                image_key TEXT,
+                days_grown INTEGER NOT NULL,
+                leaf_area REAL NOT NULL,
+                leaf_count INTEGER NOT NULL,
+                avg_hue REAL NOT NULL,
+                health_score INTEGER NOT NULL,
+                remaining_days INTEGER,
+                ema_leaf_area REAL NOT NULL,
+                ema_leaf_count REAL NOT NULL,
+                ema_avg_hue REAL NOT NULL,
+                growth_rate_per_day REAL,
+                relative_growth_pct REAL,
+                rate_at REAL NOT NULL,
+                rate_days_grown INTEGER NOT NULL,
+                rate_ema_leaf_area REAL NOT NULL
+            )
+        """)
+        return db
+
+    def start(self):
+        if self._db is not None:
+            return
+        self._db = self._open()
+        rows = self._db.execute(f"SELECT {', '.join(STATE_FIELDS)} FROM module_state").fetchall()
+        self._states = {row[0]: dict(zip(STATE_FIELDS, row)) for row in rows}
+        logger.info("Growth Store Started", path=self.path, modules=len(self._states))
+
+    def stop(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def record_many(self, items):
+        """[(module_id, days_grown, vision_result, remaining_days, image_key), ...] 를 한 트랜잭션으로 반영"""
+        if self._db is None:
+            self.start()
+        now = time.time()
+        with self._lock:
+            states, staged = [], {}
+            self._db.execute("BEGIN")
+            try:
+                for module_id, days_grown, vision_result, remaining_days, image_key in items:
+                    prev = staged.get(module_id, self._states.get(module_id))
+                    state, appended = advance_state(prev, module_id, days_grown,
+                                                    vision_result, remaining_days, image_key, now)
+                    if appended:
+                        self._db.execute(
+                            "INSERT INTO growth_events (module_id, created_at, days_grown, leaf_area, leaf_count,"
+                            " avg_hue, health_score, remaining_days) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (module_id, now, days_grown, state["leaf_area"], state["leaf_count"],
+                             state["avg_hue"], state["health_score"], remaining_days)
+                        )
+                    self._db.execute(
+                        f"INSERT OR REPLACE INTO module_state ({', '.join(STATE_FIELDS)})"
+                        f" VALUES ({', '.join('?' * len(STATE_FIELDS))})",
+                        [state[f] for f in STATE_FIELDS]
+                    )
+                    staged[module_id] = state
+                    states.append(state)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            # 커밋 성공 후에만 메모리 상태 교체
+            self._states.update(staged)
+        return states
+
+    def get(self, module_id):
+        """현재 누적 상태 (메모리, O(1)). 기록이 없으면 None"""
+        return self._states.get(module_id)
+
+    def summary(self, module_id):
+        """/modules/{id}/growth 응답용 요약 (내부 계산 필드 제외). 기록이 없으면 None"""
+        state = self._states.get(module_id)
+        if state is None:
+            return None
+        rate = state["growth_rate_per_day"]
+        return {
+            "module_id": module_id,
+            "samples": state["samples"],
+            "cycle_started_at": datetime.fromtimestamp(state["cycle_started_at"]).isoformat(timespec="seconds"),
+            "updated_at": datetime.fromtimestamp(state["updated_at"]).isoformat(timespec="seconds"),
+            "latest": {k: state[k] for k in ("days_grown", "leaf_area", "leaf_count", "avg_hue",
+                                             "health_score", "remaining_days")},
+            "ema": {
+                "leaf_area": round(state["ema_leaf_area"], 1),
+                "leaf_count": round(state["ema_leaf_count"], 2),
+                "avg_hue": round(state["ema_avg_hue"], 2),
+            },
+            "growth_rate_per_day": round(rate, 1) if rate is not None else None,
+            "relative_growth_pct": state["relative_growth_pct"],
+        }
+
+    def history(self, module_id, limit):
+        """최근 분석 이력 limit건 (오래된 순)"""
+        if self._db is None or limit <= 0:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT created_at, days_grown, leaf_area, leaf_count, avg_hue, health_score, remaining_days"
+                " FROM growth_events WHERE module_id = ? ORDER BY id DESC LIMIT ?",
+                (module_id, min(limit, GROWTH_HISTORY_LIMIT))
+            ).fetchall()
+        keys = ["created_at", "days_grown", "leaf_area", "leaf_count", "avg_hue", "health_score", "remaining_days"]
+        return [dict(zip(keys, row)) for row in reversed(rows)]
+
+    @property
+    def modules(self):
+        return len(self._states)
@@ -0,0 +1,298 @@
+import asyncio
+import contextvars
+import gc
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import get_context, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from services.logging_service import get_logger
+
+logger = get_logger("inference")
+
+# =========================================================
+# [설정] 추론 워커 풀 (환경 변수로 조정)
+# =========================================================
+EXECUTOR_MODE = os.getenv("AI_EXECUTOR_MODE", "thread")          # thread | process
+EXECUTOR_WORKERS = os.getenv("AI_EXECUTOR_WORKERS", "2")          # 동시에 추론하는 워커 수 (auto: CPU 코어 수)
+EXECUTOR_MAX_QUEUE = int(os.getenv("AI_EXECUTOR_MAX_QUEUE", "8")) # 워커가 모두 바쁠 때 대기 가능한 요청 수
+REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "30"))    # 요청당 기본 마감 시간(초)
+WORKER_THREADS = int(os.getenv("AI_WORKER_THREADS", "0"))         # [process] 워커당 네이티브 스레드 수 (0: 코어 / 워커)
+SHM_MIN_BYTES = int(os.getenv("AI_SHM_MIN_BYTES", "65536"))       # [process] 이 크기 이상의 이미지는 공유 메모리로 전달
+
+
+# 워커에서 실행 중인 요청의 마감 시각 (워커 안에서 다시 기다리는 코드가 남은 시간을 알 수 있도록)
+_deadline = contextvars.ContextVar("inference_deadline", default=None)
+
+
+def remaining_seconds():
+    """현재 워커 작업의 마감까지 남은 시간(초). 워커 풀 밖에서 호출하면 None"""
+    deadline = _deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+class QueueFullError(Exception):
+    """대기열이 가득 차서 요청을 받을 수 없음 (-> 503)"""
+
+
+class DeadlineExceededError(Exception):
+    """요청 마감 시간 초과 (-> 504)"""
+
+
+def _run_before_deadline(deadline, fn, args):
+    """
+    워커에서 실행되는 래퍼: 대기열에서 기다리는 동안 마감이 지났으면
+    무거운 추론을 시작하지 않고 바로 포기합니다.
+    """
+    if time.monotonic() > deadline:
+        raise DeadlineExceededError("queued past deadline")
+    _deadline.set(deadline)
+    return fn(*args)
+
+
+# =========================================================
+# [process 모드] 공유 메모리 이미지 전달 + 워커 초기화
+# =========================================================
+class SharedBytes:
+    """공유 메모리에 올린 업로드 바이트 참조 (워커로는 이름과 길이만 pickle)"""
+
+    __slots__ = ("name", "size")
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+
+def _share(value, segments):
+    """[부모] 큰 bytes(또는 bytes 리스트)를 공유 메모리에 복사하고 참조로 바꿈"""
+    if isinstance(value, (bytes, bytearray)) and len(value) >= SHM_MIN_BYTES:
+        shm = SharedMemory(create=True, size=len(value))
+        segments.append(shm)
+        shm.buf[:len(value)] = value
+        return SharedBytes(shm.name, len(value))
+    if isinstance(value, list):
+        return [_share(v, segments) for v in value]
+    return value
+
+
+def _release_segments(segments):
+    """[부모] 워커가 끝난 뒤 공유 메모리 해제"""
+    for shm in segments:
+        try:
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _attach(value, attached):
+    """[워커] 참조를 공유 메모리 memoryview로 바꿈 (복사 없음, vision_service가 그대로 디코딩)"""
+    if isinstance(value, SharedBytes):
+        shm = SharedMemory(name=value.name)
+        view = shm.buf[:value.size]
+        attached.append((shm, view))
+        return view
+    if isinstance(value, list):
+        return [_attach(v, attached) for v in value]
+    return value
+
+
+def _run_in_worker(deadline, fn, args):
+    """[워커] 공유 메모리 참조를 풀어서 실행하고, 끝나면 바로 detach"""
+    if time.monotonic() > deadline:
+        raise DeadlineExceededError("queued past deadline")
+    _deadline.set(deadline)
+    attached = []
+    try:
+        return fn(*[_attach(a, attached) for a in args])
+    finally:
+        for shm, view in attached:
+            try:
+                view.release()
+                shm.close()
+            except BufferError:
+                pass  # 결과가 버퍼를 참조 중이면 GC 시점에 해제
+
+
+_startup_barrier = None
+
+
+def _init_worker(threads, barrier=None):
+    """[워커] 코어를 워커끼리 나눠 쓰도록 네이티브 스레드 수 제한"""
+    global _startup_barrier
+    _startup_barrier = barrier
+    import cv2
+    cv2.setNumThreads(threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def _report_pid():
+    """[워커] 기동 확인용: 모든 워커가 하나씩 받을 때까지 barrier에서 기다린 뒤 PID 반환 (워커마다 1번씩)"""
+    if _startup_barrier is not None:
+        _startup_barrier.wait(timeout=60)
+    return os.getpid()
+
+
+def _memory_kb(pid):
+    """/proc/<pid>/smaps_rollup의 Rss / Pss / 공유 / 전용 메모리(KB) (Linux 외에는 빈 dict)"""
+    fields = {"Rss": "rss_kb", "Pss": "pss_kb", "Shared_Clean": "shared_kb", "Shared_Dirty": "shared_kb",
+              "Private_Clean": "private_kb", "Private_Dirty": "private_kb"}
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    usage[fields[key]] = usage.get(fields[key], 0) + int(rest.split()[0])
+    except (OSError, ValueError):
+        pass
+    return usage
+
+
+class InferenceExecutor:
+    """
+    블로킹 추론(YOLO / LGBM)을 이벤트 루프 밖의 워커 풀에서 실행합니다.
+    - 실행 중 + 대기 중 요청 수를 (workers + max_queue)로 제한하고, 초과 시 즉시 거절
+    - 요청마다 마감 시간을 두고, 초과 시 기다리지 않고 DeadlineExceededError 발생
+    이벤트 루프(단일 스레드)에서만 호출되므로 카운터에 별도 락이 필요 없습니다.
+
+    process 모드: 부모 프로세스가 모델을 로드한 뒤 start()를 호출하면 워커를 fork로 띄움
+    - 모델 가중치는 fork 시점 메모리를 copy-on-write로 공유 (워커마다 따로 로드하지 않음)
+    - 큰 이미지 바이트는 pickle 대신 공유 메모리로 전달
+    """
+
+    def __init__(self, mode=EXECUTOR_MODE, workers=EXECUTOR_WORKERS,
+                 max_queue=EXECUTOR_MAX_QUEUE, timeout=REQUEST_TIMEOUT, worker_threads=WORKER_THREADS):
+        self.mode = mode
+        cpus = os.cpu_count() or 1
+        self.workers = cpus if workers == "auto" else max(1, int(workers))
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.worker_threads = worker_threads or max(1, cpus // self.workers)
+        self._pool = None
+        self._worker_pids = []
+        if self.mode == "process":
+            # 부모는 워밍업까지 단일 스레드로 실행 (OpenMP 스레드 풀이 생긴 뒤 fork하면 워커가 멈출 수 있음)
+            # torch import 전에 설정해야 적용되므로 생성자에서 지정, 워커는 _init_worker에서 다시 늘림
+            os.environ.setdefault("OMP_NUM_THREADS", "1")
+        self.in_flight = 0   # 실행 중 + 대기 중 요청 수
+        self.rejected = 0    # 대기열 초과로 거절된 요청 수
+        self.timed_out = 0   # 마감 시간 초과 요청 수
+
+    def start(self):
+        if self._pool is not None:
+            return
+        if self.mode == "process":
+            self._start_processes()
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        logger.info("Inference Executor Started", mode=self.mode, workers=self.workers, max_queue=self.max_queue)
+
+    def _start_processes(self):
+        """
+        모델이 로드된 부모에서 워커를 fork (모델 로드 후 호출해야 메모리를 공유함)
+        - gc.freeze(): 부모의 기존 객체를 GC 추적에서 빼서, 워커의 GC가 객체 헤더를 건드려
+          공유 페이지가 복사되는 것을 막음
+        - 공유 메모리 추적 프로세스를 fork 전에 띄워 부모/워커가 같이 사용
+        - 다른 스레드가 없을 때 호출해야 함: fork 시점에 다른 스레드가 잡고 있던 락(logging, malloc 등)은
+          워커에서 영원히 풀리지 않음 -> 서버는 전송/저장 스레드를 시작하기 전에 메인 스레드에서 호출
+        """
+        if threading.active_count() > 1:
+            logger.warning("Forking With Active Threads", threads=[t.name for t in threading.enumerate()])
+        resource_tracker.ensure_running()
+        gc.collect()
+        gc.freeze()
+        ctx = get_context("fork")
+        barrier = ctx.Barrier(self.workers)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx,
+                                         initializer=_init_worker, initargs=(self.worker_threads, barrier))
+        # fork 방식은 첫 submit 때 워커를 전부 띄움 -> 기동 시점에 미리 띄워서 첫 요청 지연 제거
+        # 워커 수만큼 PID 확인 작업을 보내 워커가 직접 알려준 PID를 기록 (메모리 지표용)
+        futures = [self._pool.submit(_report_pid) for _ in range(self.workers)]
+        self._worker_pids = sorted(f.result() for f in futures)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._worker_pids = []
+
+    def memory_stats(self):
+        """부모 / 워커 프로세스별 메모리 (Pss: 공유 페이지를 프로세스 수로 나눈 실제 부담분)"""
+        stats = {"parent": _memory_kb(os.getpid())}
+        for i, pid in enumerate(self._worker_pids):
+            stats[f"worker-{i}"] = _memory_kb(pid)
+        return stats
+
+    def stats(self):
+        """워커 풀 설정 및 상태"""
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "worker_threads": self.worker_threads if self.mode == "process" else None,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "memory_kb": self.memory_stats(),
+        }
+
+    @property
+    def queue_depth(self):
+        """워커를 기다리는 요청 수"""
+        return max(0, self.in_flight - self.workers)
+
+    async def run(self, fn, *args, timeout=None):
+        """
+        fn(*args)를 워커 풀에서 실행하고 결과를 반환
+        - 대기열 초과: QueueFullError
+        - 마감 초과: DeadlineExceededError (이미 실행 중인 작업은 끝까지 돌지만 결과는 버림)
+        """
+        if self._pool is None:
+            self.start()
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"inference queue full ({self.in_flight} in flight)")
+
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        loop = asyncio.get_running_loop()
+
+        # 슬롯 반환은 워커가 실제로 끝났을 때 수행
+        # (마감 초과로 응답을 먼저 돌려줘도, 돌고 있는 추론이 끝날 때까지 자리를 차지함)
+        self.in_flight += 1
+        if self.mode == "process":
+            segments = []
+            try:
+                shared_args = [_share(a, segments) for a in args]
+                future = self._pool.submit(_run_in_worker, deadline, fn, shared_args)
+            except BaseException:
+                self.in_flight -= 1
+                _release_segments(segments)
+                raise
+            future.add_done_callback(lambda _: _release_segments(segments))
+        else:
+            # 스레드 모드: 요청 ID 등 contextvar를 워커 스레드로 전달
+            ctx = contextvars.copy_context()
+            future = self._pool.submit(ctx.run, _run_before_deadline, deadline, fn, args)
+        future.add_done_callback(lambda _: self._release_from_worker(loop))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.TimeoutError, DeadlineExceededError):
+            self.timed_out += 1
+            raise DeadlineExceededError(f"inference exceeded {timeout:.1f}s deadline")
+
+    def _release_from_worker(self, loop):
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # 서버 종료로 이벤트 루프가 이미 닫힘
+
+    def _release(self):
+        self.in_flight -= 1
@@ -0,0 +1,64 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+
+# =========================================================
+# [설정] 구조화 로그 (JSON 한 줄 = 로그 1건)
+# =========================================================
+LOG_LEVEL = os.getenv("AI_LOG_LEVEL", "INFO").upper()
+
+# 현재 요청 ID (미들웨어에서 설정 -> 같은 요청의 모든 로그에 자동 포함)
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+
+class JsonFormatter(logging.Formatter):
+    """로그 레코드를 {"ts", "level", "logger", "request_id", "msg", ...필드} JSON으로 변환"""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": request_id_var.get(),
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """
+    logger.info("메시지", module_id=3, days=12) 처럼 키워드 인자를 그대로 로그 필드로 기록
+    """
+
+    def process(self, msg, kwargs):
+        std = {k: kwargs.pop(k) for k in ("exc_info", "stack_info", "stacklevel") if k in kwargs}
+        std["extra"] = {"fields": kwargs}
+        return msg, std
+
+
+_configured = False
+
+def setup_logging():
+    """루트 로거에 JSON 핸들러를 1회 등록"""
+    global _configured
+    if _configured:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    root = logging.getLogger("codeponics")
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    _configured = True
+
+def get_logger(name):
+    setup_logging()
+    return StructuredLogger(logging.getLogger(f"codeponics.{name}"), {})
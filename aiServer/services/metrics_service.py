@@ -0,0 +1,144 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# =========================================================
+# Prometheus 텍스트 포맷 지표 (외부 라이브러리 없이 최소 구현)
+# 주의: 프로세스 워커 모드에서는 워커 프로세스 안에서 기록된 값이 집계되지 않습니다.
+# =========================================================
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _label_str(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _fmt(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class _ValueMetric(_Metric):
+    """라벨별 값 1개 (직접 기록하거나, 수집 시점에 호출할 함수(callback)를 지정)"""
+
+    def __init__(self, name, help_text, labelnames=(), callback=None):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+        self.callback = callback  # () -> 숫자 또는 {라벨값 튜플: 숫자}
+
+    def _samples(self):
+        if self.callback is not None:
+            value = self.callback()
+            items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {_fmt(v)}" for k, v in items if v is not None]
+
+
+class Counter(_ValueMetric):
+    """증가만 하는 값 (이름은 _total로 끝냄). callback은 서비스 객체가 이미 세고 있는 누적 횟수를 노출할 때 사용"""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_ValueMetric):
+    """현재 상태 값 (늘었다 줄었다 함)"""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """with STAGE_SECONDS.time(stage="yolo"): ... 블록 실행 시간을 기록"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = []
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, [('le', _fmt(bound))])} {count}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {_fmt(series[-2])}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+def render_metrics():
+    """등록된 전체 지표를 Prometheus 텍스트 포맷으로 출력"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# =========================================================
+# 공통 지표 (서비스 모듈에서 import 하여 기록)
+# =========================================================
+# stage: upload / decode / yolo / postprocess / lightgbm / backend_post
+STAGE_SECONDS = Histogram("ai_stage_seconds", "Latency of each analysis stage in seconds", ["stage"])
+REQUESTS_TOTAL = Counter("ai_requests_total", "HTTP requests handled", ["path", "status"])
+# 마이크로 배치: 배치 1회에 묶인 요청 수 / 요청이 배치 실행까지 대기열에서 기다린 시간
+MICROBATCH_SIZE = Histogram("ai_microbatch_size", "Requests merged into one micro-batch inference call",
+                            buckets=(1, 2, 4, 8, 16, 32))
+MICROBATCH_WAIT_SECONDS = Histogram("ai_microbatch_wait_seconds", "Time a request waited in the micro-batch queue",
+                                    buckets=(0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0))
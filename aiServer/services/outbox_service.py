@@ -0,0 +1,230 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from services.logging_service import get_logger
+from services.metrics_service import STAGE_SECONDS
+
+logger = get_logger("outbox")
+
+# =========================================================
+# [설정] 백엔드 전송 Outbox (환경 변수로 조정)
+# =========================================================
+OUTBOX_PATH = os.getenv("AI_OUTBOX_PATH", os.path.join(os.path.dirname(__file__), "../outbox.db"))
+OUTBOX_BATCH_SIZE = int(os.getenv("AI_OUTBOX_BATCH_SIZE", "20"))      # 한 번에 묶어 보낼 최대 건수
+OUTBOX_TIMEOUT = float(os.getenv("AI_OUTBOX_TIMEOUT", "15"))          # 건당 백엔드 요청 타임아웃(초, BATCH는 건수만큼 늘어남)
+OUTBOX_BACKOFF_BASE = float(os.getenv("AI_OUTBOX_BACKOFF_BASE", "1")) # 재시도 대기 시작값(초)
+OUTBOX_BACKOFF_MAX = float(os.getenv("AI_OUTBOX_BACKOFF_MAX", "300")) # 재시도 대기 최대값(초)
+OUTBOX_BATCH_REPROBE = float(os.getenv("AI_OUTBOX_BATCH_REPROBE", "600")) # 건별 전송 전환 후 BATCH를 다시 시도하기까지(초)
+
+
+class Outbox:
+    """
+    분석 결과를 SQLite 스풀에 먼저 저장(enqueue)하고, 백그라운드 스레드가
+    keep-alive 세션으로 Express(/api/ai/save-analysis)에 전송합니다.
+    - 백엔드가 꺼져 있어도 결과는 디스크에 남고, 지수 백오프로 재시도
+    - 밀린 결과는 { type: 'BATCH', items: [...] } 로 묶어서 전송
+      (응답에 results 배열이 없거나 5xx면 BATCH를 모르는 백엔드로 보고 건별 전송으로 전환,
+       OUTBOX_BATCH_REPROBE초 뒤 다시 BATCH 시도)
+    - 결과마다 enqueue 시점에 idempotency_key를 붙여 저장 -> 타임아웃 후 재전송해도 같은 키로 보내므로
+      백엔드가 이미 저장한 결과는 다시 저장하지 않음 (LLM 리포트도 한 번만 생성)
+    """
+
+    def __init__(self, url, path=OUTBOX_PATH, batch_size=OUTBOX_BATCH_SIZE, timeout=OUTBOX_TIMEOUT):
+        self.url = url
+        self.path = os.path.abspath(path)
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.batch_supported = self.batch_size > 1
+        self._batch_reprobe_at = None
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._session = None
+
+        # 전송 지표
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed_attempts = 0
+        self.last_error = None
+        self.last_latency = 0.0
+
+    # -----------------------------------------------------
+    # 스풀 (SQLite)
+    # -----------------------------------------------------
+    def _open(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_error TEXT
+            )
+        """)
+        return db
+
+    def _execute(self, sql, params=()):
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def enqueue(self, payload):
+        """결과를 스풀에 저장하고 전송 스레드를 깨움 (즉시 반환)"""
+        if self._db is None:
+            self.start()
+        payload = {**payload, "idempotency_key": payload.get("idempotency_key") or uuid.uuid4().hex}
+        now = time.time()
+        with self._db_lock:
+            cur = self._db.execute(
+                "INSERT INTO outbox (payload, next_attempt, created_at) VALUES (?, ?, ?)",
+                (json.dumps(payload, ensure_ascii=False), now, now)
+            )
+            outbox_id = cur.lastrowid
+        self.enqueued += 1
+        self._wakeup.set()
+        return outbox_id
+
+    @property
+    def pending(self):
+        if self._db is None:
+            return 0
+        return self._execute("SELECT COUNT(*) FROM outbox")[0][0]
+
+    # -----------------------------------------------------
+    # 전송 스레드
+    # -----------------------------------------------------
+    def start(self):
+        if self._thread is not None:
+            return
+        import requests  # 전송 스레드 시작 시점에 import (서버 import 시간 단축)
+        from requests.adapters import HTTPAdapter
+
+        self._db = self._open()
+        self._session = requests.Session()
+        # keep-alive 커넥션 재사용 (요청마다 TCP 연결을 새로 맺지 않음)
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+        self._thread.start()
+        pending = self.pending
+        logger.info("Outbox Started", path=self.path, pending=pending)
+
+    def stop(self, timeout=5.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._session.close()
+        with self._db_lock:
+            self._db.close()
+            self._db = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self._batch_reprobe_at is not None and time.time() >= self._batch_reprobe_at:
+                    self._batch_reprobe_at = None
+                    self.batch_supported = True
+                rows = self._execute(
+                    "SELECT id, payload, attempts FROM outbox WHERE next_attempt <= ? ORDER BY id LIMIT ?",
+                    (time.time(), self.batch_size if self.batch_supported else 1)
+                )
+                if rows:
+                    self._deliver(rows)
+                    continue
+                # 보낼 것이 없으면 다음 재시도 시각 또는 새 enqueue까지 대기
+                nxt = self._execute("SELECT MIN(next_attempt) FROM outbox")[0][0]
+                wait = 1.0 if nxt is None else min(1.0, max(0.0, nxt - time.time()))
+                self._wakeup.wait(wait)
+                self._wakeup.clear()
+            except Exception as e:
+                logger.error("Outbox Error", error=str(e))
+                self._stop.wait(1.0)
+
+    def _post(self, body, items=1):
+        start = time.perf_counter()
+        try:
+            # 백엔드는 건마다 DB 저장 + LLM 리포트를 순서대로 처리 -> 타임아웃도 건수만큼
+            return self._session.post(self.url, json=body, timeout=self.timeout * items)
+        finally:
+            self.last_latency = time.perf_counter() - start
+            STAGE_SECONDS.observe(self.last_latency, stage="backend_post")
+
+    def _deliver(self, rows):
+        ids = [r[0] for r in rows]
+        payloads = [json.loads(r[1]) for r in rows]
+        try:
+            if len(rows) == 1:
+                res = self._post(payloads[0])
+                ok = [res.status_code == 200]
+                error = None if ok[0] else f"HTTP {res.status_code}"
+            else:
+                res = self._post({"type": "BATCH", "items": payloads}, items=len(payloads))
+                results = res.json().get("results") if res.status_code == 200 else None
+                if res.status_code >= 500 or (res.status_code == 200 and not isinstance(results, list)):
+                    # 구버전 백엔드: BATCH를 모르므로 무시(200)하거나 오류(5xx) -> 건별 전송으로 전환
+                    # (이미 저장된 건이 있어도 idempotency_key로 중복 저장되지 않음)
+                    logger.warning("Backend does not support batch save - 건별 전송으로 전환",
+                                   status=res.status_code, reprobe_sec=OUTBOX_BATCH_REPROBE)
+                    self.batch_supported = False
+                    self._batch_reprobe_at = time.time() + OUTBOX_BATCH_REPROBE
+                    return
+                # 결과가 rows보다 짧으면 빠진 건은 실패로 보고 재시도 대기 (바로 다시 보내지 않도록)
+                ok = [bool(r.get("success")) for r in results or []][:len(rows)]
+                ok += [False] * (len(rows) - len(ok))
+                error = None if all(ok) else f"HTTP {res.status_code}"
+        except Exception as e:
+            ok = [False] * len(rows)
+            error = str(e)
+
+        done = [i for i, success in zip(ids, ok) if success]
+        failed = [(i, a) for (i, _, a), success in zip(rows, ok) if not success]
+
+        with self._db_lock:
+            if done:
+                self._db.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in done])
+            for outbox_id, attempts in failed:
+                # 지수 백오프 + 지터 (백엔드 복구 시 재시도가 한꺼번에 몰리지 않도록)
+                delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * (2 ** attempts))
+                delay *= random.uniform(0.8, 1.2)
+                self._db.execute(
+                    "UPDATE outbox SET attempts = attempts + 1, next_attempt = ?, last_error = ? WHERE id = ?",
+                    (time.time() + delay, error, outbox_id)
+                )
+
+        self.delivered += len(done)
+        if failed:
+            self.failed_attempts += len(failed)
+            self.last_error = error
+            logger.warning("Backend 전송 실패 (재시도 예정)", failed=len(failed), error=error)
+
+    def stats(self):
+        """전송 지표"""
+        oldest = None
+        if self._db is not None:
+            created = self._execute("SELECT MIN(created_at) FROM outbox")[0][0]
+            oldest = round(time.time() - created, 1) if created else None
+        return {
+            "pending": self.pending,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "failed_attempts": self.failed_attempts,
+            "oldest_pending_sec": oldest,
+            "last_latency_sec": round(self.last_latency, 3),
+            "last_error": self.last_error,
+            "batch_supported": self.batch_supported
+        }
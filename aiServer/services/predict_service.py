@@ -1,66 +1,254 @@
-import joblib
-import pandas as pd
 import numpy as np
 import os
+import hashlib
+import threading
+import time
+
+from services.crop_registry import MODELS_DIR, get_crop, model_cache
+from services.logging_service import get_logger
+from services.metrics_service import STAGE_SECONDS
+
+logger = get_logger("predict")
 
 # 모델 경로 설정
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "../models/harvest_model.pkl")
 
-def predict_harvest_days(days_grown, avg_temp, total_lux, leaf_area, avg_hum, water_ph, leaf_count):
+# 학습 Feature 순서 (pkl에 'features'가 저장되어 있지 않을 때 사용)
+DEFAULT_FEATURES = ['crop_type_encoded', 'days_elapsed', 'avg_temp', 'avg_humidity',
+                    'cumulative_lux', 'leaf_area', 'leaf_count', 'water_ph']
+
+# 학습 Feature -> 요청 행(row)에서 값을 꺼내는 방법 (학습 코드 Visualize_result.py와 같은 의미)
+FEATURE_SOURCES = {
+    'crop_type_encoded': lambda r: r['crop_type_encoded'],  # 학습 시 LabelEncoder 값 (작물 label -> 번호, 상추 = 0)
+    'days_elapsed': lambda r: r['days_grown'],       # 재배 일수
+    'avg_temp': lambda r: r['avg_temp'],             # 평균 기온
+    'avg_humidity': lambda r: r['avg_hum'],          # 평균 습도
+    'cumulative_lux': lambda r: r['total_lux'],      # 누적 조도 (변수명 매핑: total_lux -> cumulative_lux)
+    'leaf_area': lambda r: r['leaf_area'],           # 잎 면적
+    'leaf_count': lambda r: r['leaf_count'],         # 잎 개수
+    'water_ph': lambda r: r['water_ph'],             # 물 pH
+}
+
+
+class FeatureOrderError(ValueError):
+    """모델의 학습 Feature 순서 / 이름이 코드에서 만들 수 있는 입력과 맞지 않음"""
+
+
+def _make_predictor(model, features):
     """
-    LGBM 모델을 사용하여 수확까지 남은 일수 예측
-    학습된 모델의 Feature Name과 순서를 정확히 맞춰 DataFrame으로 입력합니다.
+    로드 시 1회 Feature 순서를 확인하고, 학습 순서의 ndarray를 바로 받는 예측 함수를 반환
+    - LightGBM: booster.predict(ndarray) -> DataFrame 생성 / sklearn 검증 없이 같은 값(비트 단위 동일)
+    - 그 외 모델: model.predict(ndarray)
     """
-    print(days_grown)
-    # 1. 모델 파일 확인
-    if not os.path.exists(MODEL_PATH):
-        print(f"⚠️ Prediction Model Not Found: {MODEL_PATH}")
-        # 모델 부재 시 단순 로직 (면적이 크면 수확 임박)
-        if leaf_area > 80000: return 2
-        return max(0, 30 - days_grown)
+    unknown = [f for f in features if f not in FEATURE_SOURCES]
+    if unknown:
+        raise FeatureOrderError(f"입력으로 만들 수 없는 Feature: {unknown}")
+    booster = getattr(model, 'booster_', None)
+    if booster is None:
+        return model.predict
+    if booster.feature_name() != list(features):
+        raise FeatureOrderError(f"feature order mismatch: model={booster.feature_name()} expected={list(features)}")
+    return booster.predict
+
+# =========================================================
+# [모델 레지스트리] 수확 예측 모델을 한 번만 로드하여 메모리에 상주
+# =========================================================
+class ModelRegistry:
+    """
+    harvest_model.pkl을 서버 시작 시 1회 로드하고 더미 예측으로 워밍업합니다.
+    파일의 mtime이 바뀌면 해시를 비교하여, 내용이 달라졌을 때만 새 모델을
+    완전히 준비한 뒤 참조를 한 번에 교체(Hot-swap)합니다.
+    """
+
+    def __init__(self, path, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval  # mtime 확인 최소 간격(초)
+        self._lock = threading.Lock()
+        self._entry = None        # (predictor, features, version, mtime, digest, crop_classes) 튜플 - 통째로 교체
+        self._last_check = 0.0
+        self.load_seconds = 0.0
+
+    @staticmethod
+    def _file_hash(path):
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _build(self, mtime, digest):
+        """모델 로드 + 워밍업 (교체 전에 완전히 준비)"""
+        import joblib  # 모델 로드 시점에만 필요 (서버 import 시간 단축)
+
+        start = time.perf_counter()
+        loaded_obj = joblib.load(self.path)
 
-    try:
-        # 2. 모델 로드
-        loaded_obj = joblib.load(MODEL_PATH)
-        
         # 저장 방식에 따라 모델 객체 추출 (dict 형태로 저장되었을 경우 처리)
+        features = DEFAULT_FEATURES
+        classes = []  # LabelEncoder에 학습된 작물 이름 (없으면 단일 작물 모델)
         if isinstance(loaded_obj, dict):
             # 'model' 키가 없으면 'best_estimator'나 객체 자체 사용
             model = loaded_obj.get('model') or loaded_obj.get('best_estimator') or loaded_obj
+            features = list(loaded_obj.get('features') or DEFAULT_FEATURES)
+            classes = [str(c) for c in getattr(loaded_obj.get('label_encoder'), 'classes_', [])]
         else:
             model = loaded_obj
+        predictor = _make_predictor(model, features)
+
+        # 워밍업: 더미 예측 1회 (첫 요청의 지연 제거)
+        predictor(np.zeros((1, len(features))))
+
+        self.load_seconds = time.perf_counter() - start
+        version = f"{digest[:12]}@{int(mtime)}"
+        logger.info("Harvest Model Loaded", version=version, load_seconds=round(self.load_seconds, 3))
+        return (predictor, features, version, mtime, digest, classes)
+
+    def load(self):
+        """시작 시 호출: 모델을 로드하고 버전을 반환 (파일이 없으면 None)"""
+        with self._lock:
+            if not os.path.exists(self.path):
+                logger.warning("Prediction Model Not Found", path=self.path)
+                self._entry = None
+                return None
+            mtime = os.path.getmtime(self.path)
+            self._entry = self._build(mtime, self._file_hash(self.path))
+            self._last_check = time.monotonic()
+            return self._entry[2]
+
+    def _maybe_reload(self):
+        """파일 변경 감지 시 새 모델로 교체 (실패하면 기존 모델 유지)"""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return  # 파일이 잠시 사라져도 기존 모델 유지
+            current = self._entry
+            if current is not None and mtime == current[3]:
+                return
+            try:
+                digest = self._file_hash(self.path)
+                if current is not None and digest == current[4]:
+                    self._entry = current[:3] + (mtime, digest) + current[5:]
+                    return
+                self._entry = self._build(mtime, digest)
+            except Exception as e:
+                logger.error("Harvest Model Reload Failed (기존 모델 유지)", error=str(e))
+
+    def get(self):
+        """(predictor, features, version) 반환. 모델이 없으면 None"""
+        self._maybe_reload()
+        entry = self._entry
+        return entry[:3] if entry else None
+
+    @property
+    def version(self):
+        entry = self._entry
+        return entry[2] if entry else None
 
-        # 3. 데이터 프레임 생성 (학습 코드 Visualize_result.py와 동일한 컬럼명 사용)
+    def encode_crop(self, label):
+        """
+        작물 이름 -> 학습 시 LabelEncoder 번호 (학습 데이터에 없는 작물이면 None)
+        LabelEncoder 없이 저장된 모델은 단일 작물 모델로 보고 0
+        """
+        entry = self._entry
+        classes = entry[5] if entry else []
+        if not classes:
+            return 0
+        return classes.index(label) if label in classes else None
+
+
+harvest_registry = ModelRegistry(MODEL_PATH)
+
+def registry_for(crop_type=None):
+    """
+    작물의 수확 예측 모델 레지스트리
+    - 기본 모델(harvest_model.pkl)은 기동 시 로드한 harvest_registry
+    - 그 외 모델은 처음 필요할 때 로드 (crop_registry.model_cache 메모리 예산 안에서 LRU)
+    """
+    path = os.path.join(MODELS_DIR, get_crop(crop_type)[1]["harvest_model"])
+    if os.path.abspath(path) == os.path.abspath(MODEL_PATH):
+        return harvest_registry
+
+    def _load():
+        registry = ModelRegistry(path)
+        if registry.load() is None:
+            raise FileNotFoundError(f"수확 예측 모델이 없습니다: {path}")
+        return registry, path
+    return model_cache.get(("harvest", os.path.basename(path)), _load)
+
+def _fallback_days(days_grown, leaf_area):
+    """모델 부재 시 단순 로직 (면적이 크면 수확 임박)"""
+    if leaf_area > 80000: return 2
+    return max(0, 30 - days_grown)
+
+def predict_harvest_days(days_grown, avg_temp, total_lux, leaf_area, avg_hum, water_ph, leaf_count, crop_type=None):
+    """
+    LGBM 모델을 사용하여 수확까지 남은 일수 예측
+    학습된 모델의 Feature 순서를 정확히 맞춘 입력 벡터로 예측합니다.
+    crop_type: 작물 종류 (None이면 기본 작물)
+    """
+    row = {
+        'days_grown': days_grown, 'avg_temp': avg_temp, 'total_lux': total_lux,
+        'leaf_area': leaf_area, 'avg_hum': avg_hum, 'water_ph': water_ph, 'leaf_count': leaf_count
+    }
+    remaining_days = predict_harvest_days_batch([row], crop_type)[0]
+    logger.debug("harvest prediction", days_grown=days_grown, remaining_days=remaining_days)
+    return remaining_days
+
+def predict_harvest_days_batch(rows, crop_type=None):
+    """
+    여러 모듈의 환경 데이터를 한 번의 predict 호출로 예측 (학습 Feature 순서의 다중 행 ndarray)
+    rows: [{'days_grown', 'avg_temp', 'total_lux', 'leaf_area', 'avg_hum', 'water_ph', 'leaf_count'}, ...]
+    crop_type: 모든 행의 작물 종류 (None이면 기본 작물)
+    반환: 입력 순서와 동일한 남은 일수(int) 리스트
+    """
+    if not rows:
+        return []
+
+    # 1. 상주 모델 조회 (레지스트리가 로드/교체 담당)
+    _, spec = get_crop(crop_type)
+    try:
+        registry = registry_for(crop_type)
+        entry = registry.get()
+    except Exception as e:
+        logger.warning("Prediction Model Load Failed", crop=spec["label"], error=str(e))
+        entry = None
+    if entry is None:
+        logger.warning("Prediction Model Not Found", crop=spec["label"])
+        return [_fallback_days(r['days_grown'], r['leaf_area']) for r in rows]
+
+    crop_code = registry.encode_crop(spec["label"])
+    if crop_code is None:
+        logger.warning("Crop Not In Harvest Model", crop=spec["label"], version=registry.version)
+        return [_fallback_days(r['days_grown'], r['leaf_area']) for r in rows]
+
+    try:
+        predictor, features, _ = entry
+
+        # 2. 입력 행렬 생성 (열 순서 = 학습 Feature 순서, 로드 시 확인됨)
         # 학습 Feature 순서: 
         # ['crop_type_encoded', 'days_elapsed', 'avg_temp', 'avg_humidity', 
         #  'cumulative_lux', 'leaf_area', 'leaf_count', 'water_ph']
-        
-        input_data = {
-            'crop_type_encoded': [0],      # 상추(Lettuce) = 0 으로 고정 (학습 시 LabelEncoder 값)
-            'days_elapsed': [days_grown],  # 재배 일수
-            'avg_temp': [avg_temp],        # 평균 기온
-            'avg_humidity': [avg_hum],     # 평균 습도
-            'cumulative_lux': [total_lux], # 누적 조도 (변수명 매핑: total_lux -> cumulative_lux)
-            'leaf_area': [leaf_area],      # 잎 면적
-            'leaf_count': [leaf_count],    # 잎 개수
-            'water_ph': [water_ph]         # 물 pH
-        }
-
-        # DataFrame으로 변환 (LGBM은 컬럼명을 매우 중요하게 여김)
-        df = pd.DataFrame(input_data)
-
-        # 4. 예측 수행
-        prediction = model.predict(df)[0]
+        rows = [dict(r, crop_type_encoded=crop_code) for r in rows]
+        X = np.array([[FEATURE_SOURCES[f](r) for f in features] for r in rows], dtype=np.float64)
+
+        # 3. 예측 수행 (전체 행을 한 번에)
+        with STAGE_SECONDS.time(stage="lightgbm"):
+            predictions = predictor(X)
         
         # 남은 일수는 음수가 될 수 없으므로 0 이상으로 보정
-        remaining_days = int(max(0, round(prediction)))
-        print(remaining_days)
-        return remaining_days
+        return [int(max(0, round(p))) for p in predictions]
 
     except Exception as e:
-        print(f"❌ Prediction Error: {e}")
+        logger.error("Prediction Error", error=str(e))
         # 에러 발생 시 안전하게 기본값 반환
-        return max(0, 35 - days_grown)
+        return [max(0, 35 - r['days_grown']) for r in rows]
 
 def evaluate_growth_status(days_grown, leaf_area, remaining_days, health_score):
     """
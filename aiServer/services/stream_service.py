@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+import uuid
+from collections import deque
+
+from starlette.exceptions import HTTPException
+from starlette.websockets import WebSocketDisconnect
+
+from services.logging_service import get_logger, request_id_var
+
+logger = get_logger("stream")
+
+# =========================================================
+# [설정] 스트리밍 분석 연결 (환경 변수로 조정)
+# =========================================================
+STREAM_MAX_IN_FLIGHT = int(os.getenv("AI_STREAM_MAX_IN_FLIGHT", "4"))  # 연결당 동시에 분석하는 프레임 수
+
+
+class FrameStreamServer:
+    """
+    WebSocket 한 연결로 사진을 계속 받아 분석하고, 결과를 같은 연결로 돌려줍니다.
+    - 프레임 1개 = 텍스트 메시지(JSON 헤더) + 바이너리 메시지(이미지)
+    - 결과는 받은 순서 그대로 전송 (분석은 겹쳐서 진행되어도 응답 순서는 보장)
+    - 연결당 분석 중인 프레임이 max_in_flight개면 다음 프레임을 읽지 않음
+      -> 소켓 수신 버퍼가 차서 보내는 쪽이 자연스럽게 느려짐 (백프레셔)
+    - 프레임 하나가 실패해도 연결은 유지하고 해당 seq에 에러 결과를 보냄
+    - 연결이 끊겨도 이미 받은 프레임은 끝까지 분석 (백엔드 전송 포함), 결과 전송만 생략
+    이벤트 루프(단일 스레드)에서만 사용되므로 카운터에 별도 락이 필요 없습니다.
+    """
+
+    def __init__(self, max_in_flight=STREAM_MAX_IN_FLIGHT):
+        self.max_in_flight = max(1, max_in_flight)
+        self.connections = 0  # 현재 연결 수
+        self.frames = 0       # 처리한 프레임 수
+        self.errors = 0       # 에러 결과를 보낸 프레임 수
+
+    async def serve(self, websocket, handler):
+        """연결 1개 처리. handler(header dict, 이미지 bytes) -> 결과 dict (코루틴)"""
+        await websocket.accept()
+        conn_id = uuid.uuid4().hex[:8]
+        slots = asyncio.Semaphore(self.max_in_flight)
+        pending = deque()              # (seq, task, 슬롯 보유 여부) - 받은 순서
+        ready = asyncio.Event()        # pending에 새 항목이 들어왔거나 수신이 끝남
+        state = {"reading": True, "open": True}
+        writer = asyncio.create_task(self._write(websocket, pending, ready, slots, state))
+
+        self.connections += 1
+        logger.info("Stream Connected", conn_id=conn_id)
+        try:
+            frame_no = 0
+            header = None
+            while True:
+                # 분석 중인 프레임이 가득 차면 슬롯이 빌 때까지 다음 메시지를 읽지 않음
+                await slots.acquire()
+                message = await self._receive(websocket)
+                if message is None:
+                    slots.release()
+                    break
+
+                if message.get("bytes") is None:
+                    slots.release()
+                    if header is not None:
+                        self._reject(pending, ready, header["seq"], "이미지 없이 다음 헤더 수신")
+                    frame_no += 1
+                    header, error = self._parse_header(message.get("text"), frame_no)
+                    if error:
+                        self._reject(pending, ready, frame_no, error)
+                    continue
+
+                if header is None:
+                    slots.release()
+                    frame_no += 1
+                    self._reject(pending, ready, frame_no, "헤더 없이 이미지 수신")
+                    continue
+
+                # 프레임 완성 -> 분석 시작 (슬롯은 결과를 보낸 뒤 반환)
+                request_id_var.set(f"{conn_id}-{header['seq']}")
+                task = asyncio.create_task(self._run(handler, header, message["bytes"]))
+                pending.append((header["seq"], task, True))
+                ready.set()
+                header = None
+        finally:
+            state["reading"] = False
+            ready.set()
+            await writer
+            self.connections -= 1
+            logger.info("Stream Closed", conn_id=conn_id)
+
+    @staticmethod
+    async def _receive(websocket):
+        """다음 메시지 (연결 종료 시 None)"""
+        try:
+            message = await websocket.receive()
+        except (WebSocketDisconnect, RuntimeError):
+            return None
+        if message["type"] == "websocket.disconnect":
+            return None
+        return message
+
+    @staticmethod
+    def _parse_header(text, frame_no):
+        """JSON 헤더 -> (헤더 dict, 에러 메시지). seq가 없으면 연결 내 프레임 순번을 사용"""
+        try:
+            header = json.loads(text)
+        except (TypeError, ValueError) as e:
+            return None, f"헤더 파싱 실패: {e}"
+        if not isinstance(header, dict):
+            return None, "헤더는 JSON 객체여야 합니다."
+        header.setdefault("seq", frame_no)
+        return header, None
+
+    @staticmethod
+    def _reject(pending, ready, seq, detail):
+        """분석 없이 400 결과가 정해진 프레임 (순서 유지를 위해 같은 대기열 사용, 슬롯 미사용)"""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result({"status": "error", "code": 400, "detail": detail})
+        pending.append((seq, future, False))
+        ready.set()
+
+    async def _run(self, handler, header, data):
+        """프레임 분석. 예외는 에러 결과로 변환 (HTTP 엔드포인트와 같은 상태 코드)"""
+        try:
+            return await handler(header, data)
+        except HTTPException as e:
+            return {"status": "error", "code": e.status_code, "detail": e.detail}
+        except Exception as e:
+            logger.error("스트림 프레임 분석 오류", error=str(e))
+            return {"status": "error", "code": 500, "detail": str(e)}
+
+    async def _write(self, websocket, pending, ready, slots, state):
+        """받은 순서대로 결과를 기다렸다가 전송"""
+        while True:
+            if not pending:
+                if not state["reading"]:
+                    break
+                ready.clear()
+                await ready.wait()
+                continue
+            seq, task, holds_slot = pending.popleft()
+            try:
+                result = await task
+            finally:
+                if holds_slot:
+                    slots.release()
+            self.frames += 1
+            if result.get("status") == "error":
+                self.errors += 1
+            if state["open"]:
+                try:
+                    await websocket.send_json({"seq": seq, **result})
+                except Exception:
+                    state["open"] = False  # 연결 끊김 -> 남은 프레임은 분석만 마침
+
+    def stats(self):
+        return {
+            "connections": self.connections,
+            "max_in_flight": self.max_in_flight,
+            "frames": self.frames,
+            "errors": self.errors,
+        }
@@ -1,120 +1,365 @@
-from ultralytics import YOLO
 import cv2
 import os
+import threading
+import time
 import numpy as np
 
-# [설정] 학습된 모델 파일명으로 변경 (lettuce_analyze.pt -> best.pt 가정)
-# 만약 파일명이 다르다면 여기서 수정하세요.
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "../models/lettuce_analyze.pt")
+from services.batching_service import MicroBatcher
+from services.crop_registry import DEFAULT_HUE, get_crop, model_cache
+from services.engine_service import VISION_BACKEND as CONFIGURED_BACKEND, VisionEngine, model_version, resolve_model
+from services.inference_pool import EXECUTOR_MODE, DeadlineExceededError, remaining_seconds
+from services.logging_service import get_logger
+from services.metrics_service import STAGE_SECONDS
 
-try:
-    model = YOLO(MODEL_PATH)
-    print(f"✅ YOLOv8 Custom Model Loaded: {MODEL_PATH}")
-except Exception as e:
-    print(f"⚠️ Model Load Failed: {e}")
-    model = None
+logger = get_logger("vision")
 
-def analyze_leaf_area(image_path):
+# [설정] 추론 백엔드는 AI_VISION_BACKEND(torch | onnx | openvino)로 선택 (engine_service 참고)
+# 작물별 모델 이름 / 건강 판정 Hue 범위는 crop_registry(models/crops.json)에서 지정
+# 모델은 import 시점이 아니라 load_model()에서 로드합니다.
+# - 서버: lifespan에서 명시적으로 호출 (/readyz로 완료 여부 확인)
+# - 프로세스 워커 등 호출하지 않은 곳: 첫 분석 요청 때 자동으로 1회 로드
+# - 기본 작물 외 모델은 해당 작물 요청이 처음 올 때 로드 (crop_registry.model_cache의 메모리 예산 안에서 LRU)
+# 아래 전역 변수는 기본 작물(AI_DEFAULT_CROP) 모델 기준입니다.
+model = None
+MODEL_PATH = None
+MODEL_VERSION = None   # 모델 파일 내용 해시 (결과 캐시 키에 포함 -> 모델/백엔드 교체 시 이전 결과 무효화)
+VISION_BACKEND = None
+load_error = None      # 로드 실패 사유 (/readyz에 표시)
+load_seconds = 0.0
+warmup_seconds = 0.0
+
+_load_lock = threading.Lock()
+_load_attempted = False
+
+# [설정] 동시 요청 마이크로 배칭 (1이면 사용 안 함 - 요청마다 단건 추론)
+# 배치가 실제로 모이려면 추론 워커 수(AI_EXECUTOR_WORKERS)가 배치 크기 이상이어야 합니다.
+# thread 모드(AI_EXECUTOR_MODE=thread)에서만 동작 - process 모드 워커는 요청을 1건씩 실행하므로 사용하지 않음
+MICROBATCH_MAX_SIZE = int(os.getenv("AI_MICROBATCH_MAX_SIZE", "1"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("AI_MICROBATCH_MAX_WAIT_MS", "20"))
+
+micro_batcher = None
+
+def _predict(engine, source):
+    """YOLO 추론 (Conf 0.25 이상만 감지) + 소요 시간 기록"""
+    with STAGE_SECONDS.time(stage="yolo"):
+        return engine.predict(source, conf=0.25)
+
+def _build_engine(name, warmup=True, timings=None):
+    """
+    Vision 엔진 생성 + 워밍업 -> ((엔진, 마이크로 배처), 모델 경로)  (model_cache 로더 형식)
+    timings: dict를 주면 load / warmup 소요 시간(초)을 기록
+    """
+    start = time.perf_counter()
+    engine = VisionEngine(name=name)
+    loaded = time.perf_counter()
+
+    # 워밍업: 빈 이미지 1장 추론 (첫 요청의 지연 초기화 비용 제거)
+    if warmup:
+        engine.predict(np.zeros((320, 320, 3), dtype=np.uint8), conf=0.25)
+    if timings is not None:
+        timings.update(load=loaded - start, warmup=time.perf_counter() - loaded)
+
+    batcher = None
+    if MICROBATCH_MAX_SIZE > 1 and EXECUTOR_MODE == "process":
+        logger.warning("Micro-batching Disabled", model=name, reason="process 모드 워커는 요청을 1건씩 실행")
+    elif MICROBATCH_MAX_SIZE > 1:
+        # 여러 요청의 이미지를 모아 model.predict([...]) 1회로 추론 (모델마다 따로)
+        batcher = MicroBatcher(
+            lambda imgs: _predict(engine, imgs),
+            max_batch_size=MICROBATCH_MAX_SIZE,
+            max_wait_ms=MICROBATCH_MAX_WAIT_MS
+        )
+        logger.info("Micro-batching Enabled", model=name, max_batch_size=MICROBATCH_MAX_SIZE,
+                    max_wait_ms=MICROBATCH_MAX_WAIT_MS)
+    return (engine, batcher), engine.path
+
+def load_model(warmup=True):
+    """
+    기본 작물 Vision 모델 로드 + 워밍업 (프로세스당 1회만 실제로 수행, 캐시에서 내리지 않음)
+    반환: 로드 성공 여부
+    """
+    global model, MODEL_PATH, MODEL_VERSION, VISION_BACKEND, micro_batcher
+    global load_error, load_seconds, warmup_seconds, _load_attempted
+    with _load_lock:
+        if _load_attempted:
+            return model is not None
+        _load_attempted = True
+
+        name = get_crop()[1]["vision_model"]
+        timings = {}
+        try:
+            engine, batcher = model_cache.get(("vision", name), lambda: _build_engine(name, warmup, timings))
+        except Exception as e:
+            load_error = str(e)
+            logger.warning("Model Load Failed", error=load_error)
+            return False
+        model_cache.pin(("vision", name))
+
+        load_seconds = timings.get("load", 0.0)
+        warmup_seconds = timings.get("warmup", 0.0)
+        MODEL_PATH = engine.path
+        MODEL_VERSION = engine.version
+        VISION_BACKEND = engine.backend
+        micro_batcher = batcher
+        model = engine
+        logger.info("YOLOv8 Custom Model Loaded", backend=engine.backend, path=MODEL_PATH,
+                    load_seconds=round(load_seconds, 3), warmup_seconds=round(warmup_seconds, 3))
+        return True
+
+def _ensure_model():
+    """아직 로드를 시도하지 않았으면 로드 후 모델 반환 (실패 시 None)"""
+    if not _load_attempted:
+        load_model()
+    return model
+
+def _engine_for(crop_type):
+    """
+    작물 -> (Hue 범위, 엔진, 마이크로 배처). 모델을 로드할 수 없으면 엔진은 None
+    기본 작물 모델은 전역 모델, 그 외는 model_cache에서 필요할 때 로드
+    """
+    _, spec = get_crop(crop_type)
+    name = spec["vision_model"]
+    if name == get_crop()[1]["vision_model"]:
+        engine = _ensure_model()
+        return spec["hue"], engine, micro_batcher
+    try:
+        engine, batcher = model_cache.get(("vision", name), lambda: _build_engine(name))
+        return spec["hue"], engine, batcher
+    except Exception as e:
+        logger.warning("Model Load Failed", model=name, error=str(e))
+        return spec["hue"], None, None
+
+_file_versions = {}  # 모델 이름 -> (경로, mtime, 버전)
+
+def model_version_for(crop_type=None):
+    """
+    작물의 Vision 모델 버전 (결과 캐시 키용)
+    모델을 로드하지 않고 파일 해시로 계산하며, 파일이 바뀌지 않았으면 이전 값을 재사용
+    """
+    _, spec = get_crop(crop_type)
+    name = spec["vision_model"]
+    if name == get_crop()[1]["vision_model"] and MODEL_VERSION is not None:
+        return MODEL_VERSION
+    memo = _file_versions.get(name)
+    try:
+        if memo is not None and os.path.getmtime(memo[0]) == memo[1]:
+            return memo[2]
+        _, path = resolve_model(CONFIGURED_BACKEND, name)
+        mtime = os.path.getmtime(path)
+        _file_versions[name] = (path, mtime, model_version(path))
+        return _file_versions[name][2]
+    except OSError:
+        return None  # 모델 파일 없음 -> 분석 결과가 에러이므로 캐시되지 않음
+
+ERROR_RESULT = {"leaf_area": 0.0, "leaf_count": 0, "health_score": 0, "health_msg": "Analysis Error"}
+SYSTEM_ERROR_RESULT = {"leaf_area": 0.0, "leaf_count": 0, "health_score": 0, "health_msg": "System Error"}
+
+def is_valid_result(result):
+    """정상 분석 결과인지 확인 (에러 결과는 캐시하지 않음)"""
+    return result.get("health_msg") not in (ERROR_RESULT["health_msg"], SYSTEM_ERROR_RESULT["health_msg"])
+
+def decode_image(data):
+    """
+    요청 바이트(bytes / bytearray / memoryview)를 디스크를 거치지 않고 BGR ndarray로 디코딩
+    디코딩 실패 시 None 반환
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size == 0:
+        return None
+    # IMREAD_COLOR는 EXIF Orientation을 적용함 (라즈베리파이가 회전 대신 태그만 기록한 사진도 방향이 맞음)
+    return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+
+def _load_image(source):
+    """
+    입력 형태에 따라 이미지 로드
+    - np.ndarray: 이미 디코딩된 BGR 이미지 그대로 사용
+    - bytes 계열: 메모리에서 바로 디코딩
+    - str / PathLike: 파일 경로 (디버그용 임시 파일 경로)
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    with STAGE_SECONDS.time(stage="decode"):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return decode_image(source)
+        return cv2.imread(os.fspath(source))
+
+def _mask_stats(masks, img):
+    """
+    전체 마스크의 면적(픽셀 수)과 Hue 합계를 계산
+    - HSV 변환은 이미지당 1회만 수행 (기존: 마스크마다 전체 이미지 변환)
+    - 마스크별 작업은 OpenCV SIMD 연산(resize / compare / countNonZero / sumElems)만 사용하고
+      불리언 인덱싱(hsv_img[mask])으로 픽셀을 복사하지 않음
+    - 리사이즈는 기존과 동일한 마스크별 cv2.resize 사용
+      (다채널로 쌓아서 리사이즈하면 OpenCV 내부 경로가 달라 경계 픽셀 값이 미세하게 바뀜
+       -> 잎 개수/면적/Hue 결과를 기존과 똑같이 유지하기 위함)
+    """
+    h, w = img.shape[:2]
+    hue = np.ascontiguousarray(cv2.cvtColor(img, cv2.COLOR_BGR2HSV)[:, :, 0])
+
+    areas = np.zeros(len(masks), dtype=np.int64)
+    hue_sums = np.zeros(len(masks), dtype=np.float64)
+
+    for i, mask in enumerate(masks):
+        # 마스크 크기 보정 후 이진화 (확률 0.5 이상을 잎으로 간주, 0/255 uint8 마스크)
+        mask_binary = cv2.compare(cv2.resize(mask, (w, h)), 0.5, cv2.CMP_GT)
+
+        # 면적 계산 (픽셀 수)
+        areas[i] = cv2.countNonZero(mask_binary)
+        # 마스크 영역 Hue 합계 (0~179 정수 합이라 double 합계가 정확함 -> np.mean과 같은 값)
+        hue_sums[i] = cv2.sumElems(cv2.bitwise_and(hue, hue, mask=mask_binary))[0]
+
+    return areas, hue_sums
+
+def _summarize_result(img, result):
+    """
+    YOLO 추론 결과 1장을 잎 면적 / 잎 개수 / 평균 Hue 목록으로 변환
+    """
+    total_area = 0.0
+    leaf_count = 0
+    hue_values = []
+
+    # [CASE A] 마스크(Segmentation) 데이터가 있는 경우 (정상)
+    if result.masks is not None:
+        # 마스크 데이터 (GPU -> CPU -> Numpy)
+        masks = result.masks.data.cpu().numpy()
+        
+        # [핵심] 감지된 마스크의 개수가 곧 잎의 개수입니다.
+        # 너무 작은 노이즈는 면적을 확인한 뒤 카운트에서 제외합니다.
+        areas, hue_sums = _mask_stats(masks, img)
+
+        # [노이즈 필터] 너무 작은 점(예: 50픽셀 미만)은 무시
+        keep = areas >= 50
+        leaf_count = int(np.count_nonzero(keep))
+        total_area += float(areas[keep].sum())
+
+        # --- [HSV 색상 분석] ---
+        # 해당 마스크 영역 픽셀의 평균 Hue (정수 합 / 픽셀 수)
+        hue_values = list(hue_sums[keep] / areas[keep])
+
+    # [CASE B] 박스(Detection) 데이터만 있는 경우 (Fallback)
+    elif result.boxes is not None:
+        leaf_count = len(result.boxes)
+        for box in result.boxes.xywh:
+            # w * h
+            total_area += (box[2] * box[3])
+
+    return total_area, leaf_count, hue_values
+
+def _evaluate_health(total_area, leaf_count, hue_values, hue=DEFAULT_HUE):
+    """
+    HSV 평균 Hue 기반 건강 상태 평가 후 최종 결과 dict 생성
+    hue: 작물별 판정 범위 (기본: 상추 - 건강 40 ~ 85, 황변 25 ~ 40, 그 아래 갈변)
+    """
+    health_score = 100
+    health_msg = "아주 건강함"
+    
+    if hue_values:
+        avg_hue_total = np.mean(hue_values)
+        
+        if hue["healthy_min"] <= avg_hue_total <= hue["healthy_max"]:
+            health_score = 95
+            health_msg = "건강한 녹색"
+        elif hue["yellow_min"] <= avg_hue_total < hue["healthy_min"]:
+            health_score = 60
+            health_msg = "잎이 노랗게 변함(영양 부족 주의)"
+        elif avg_hue_total < hue["yellow_min"]:
+            health_score = 30
+            health_msg = "갈변 현상 심각(질병 의심)"
+        else:
+            # 85 이상 (너무 푸르거나 다른 색)
+            health_score = 80
+            health_msg = "색상 양호"
+    else:
+        if leaf_count == 0:
+            health_score = 0
+            health_msg = "감지된 작물 없음"
+
+    return {
+        "leaf_area": float(total_area), # 총 픽셀 면적
+        "leaf_count": int(leaf_count),  # 감지된 잎 개수
+        "health_score": int(health_score),
+        "health_msg": health_msg,
+        "avg_hue": float(np.mean(hue_values)) if hue_values else 0.0
+    }
+
+def analyze_leaf_area(image, crop_type=None):
     """
     YOLOv8 Seg를 이용해 1) 잎 면적, 2) 잎 개수, 3) 건강 상태(HSV) 분석
+    image: 디코딩된 ndarray, 이미지 바이트, 또는 파일 경로
+    crop_type: 작물 종류 (None이면 기본 작물)
     """
-    if model is None:
-        return {"leaf_area": 0.0, "leaf_count": 0, "health_score": 0, "health_msg": "System Error"}
+    hue, engine, batcher = _engine_for(crop_type)
+    if engine is None:
+        return dict(SYSTEM_ERROR_RESULT)
 
     try:
         # 이미지 로드
-        img = cv2.imread(image_path)
+        img = _load_image(image)
         if img is None:
             raise ValueError("Image not found")
 
         # 추론 (Conf 0.25 이상만 감지)
-        results = model.predict(img, conf=0.25)
+        # 마이크로 배칭 사용 시: 동시에 들어온 다른 요청과 묶여서 한 번에 추론됨
+        if batcher is not None:
+            results = [batcher.submit(img, timeout=remaining_seconds())]
+        else:
+            results = _predict(engine, img)
         
         total_area = 0.0
         leaf_count = 0
         hue_values = [] 
         
-        # 1. Segmentation 결과 분석
-        for result in results:
-            # [CASE A] 마스크(Segmentation) 데이터가 있는 경우 (정상)
-            if result.masks is not None:
-                # 마스크 데이터 (GPU -> CPU -> Numpy)
-                masks = result.masks.data.cpu().numpy()
-                
-                # [핵심] 감지된 마스크의 개수가 곧 잎의 개수입니다.
-                # 단, 너무 작은 노이즈를 거르기 위해 아래 루프에서 실제 면적을 확인 후 카운트할 수도 있습니다.
-                # 여기서는 일단 전체 감지 개수로 잡고, 면적 계산 시 필터링을 고려합니다.
-                temp_leaf_count = 0 
-                
-                for i, mask in enumerate(masks):
-                    # 마스크 크기 보정 (이미지 원본 크기 640x480 등으로 리사이즈)
-                    mask_resized = cv2.resize(mask, (img.shape[1], img.shape[0]))
-                    
-                    # 이진화 (확률 0.5 이상을 잎으로 간주)
-                    mask_binary = mask_resized > 0.5
-                    
-                    # 면적 계산 (픽셀 수)
-                    area = np.sum(mask_binary)
-                    
-                    # [노이즈 필터] 너무 작은 점(예: 50픽셀 미만)은 무시
-                    if area < 50:
-                        continue
-                        
-                    temp_leaf_count += 1
-                    total_area += area
-                    
-                    # --- [HSV 색상 분석] ---
-                    # 해당 마스크 영역의 픽셀만 추출하여 평균 색상 계산
-                    hsv_img = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-                    leaf_pixels = hsv_img[mask_binary]
-                    
-                    if len(leaf_pixels) > 0:
-                        avg_h = np.mean(leaf_pixels[:, 0]) # Hue 채널
-                        hue_values.append(avg_h)
-                
-                leaf_count = temp_leaf_count
-
-            # [CASE B] 박스(Detection) 데이터만 있는 경우 (Fallback)
-            elif result.boxes is not None:
-                leaf_count = len(result.boxes)
-                for box in result.boxes.xywh:
-                    # w * h
-                    total_area += (box[2] * box[3])
-
-        # 2. 건강 상태 평가 (HSV 기반)
-        # 상추 녹색 범위 (Hue: 35 ~ 85)
-        health_score = 100
-        health_msg = "아주 건강함"
-        
-        if hue_values:
-            avg_hue_total = np.mean(hue_values)
-            
-            if 40 <= avg_hue_total <= 85:
-                health_score = 95
-                health_msg = "건강한 녹색"
-            elif 25 <= avg_hue_total < 40:
-                health_score = 60
-                health_msg = "잎이 노랗게 변함(영양 부족 주의)"
-            elif avg_hue_total < 25:
-                health_score = 30
-                health_msg = "갈변 현상 심각(질병 의심)"
-            else:
-                # 85 이상 (너무 푸르거나 다른 색)
-                health_score = 80
-                health_msg = "색상 양호"
-        else:
-            if leaf_count == 0:
-                health_score = 0
-                health_msg = "감지된 작물 없음"
-
-        return {
-            "leaf_area": float(total_area), # 총 픽셀 면적
-            "leaf_count": int(leaf_count),  # 감지된 잎 개수
-            "health_score": int(health_score),
-            "health_msg": health_msg,
-            "avg_hue": float(np.mean(hue_values)) if hue_values else 0.0
-        }
+        with STAGE_SECONDS.time(stage="postprocess"):
+            # 1. Segmentation 결과 분석
+            for result in results:
+                area, leaf_count, hues = _summarize_result(img, result)
+                total_area += area
+                hue_values.extend(hues)
+
+            # 2. 건강 상태 평가 (HSV 기반)
+            return _evaluate_health(total_area, leaf_count, hue_values, hue)
+
+    except DeadlineExceededError:
+        raise  # 마감 초과는 분석 실패가 아니라 504
+    except Exception as e:
+        logger.error("Vision Analysis Error", error=str(e))
+        return dict(ERROR_RESULT)
+
+def analyze_leaf_area_batch(images, crop_type=None):
+    """
+    여러 장의 이미지를 한 번의 model.predict([...]) 호출로 분석
+    images: ndarray / 이미지 바이트 / 파일 경로의 리스트 (모두 같은 작물)
+    반환: 입력 순서와 동일한 결과 dict 리스트 (읽기 실패한 이미지는 에러 결과)
+    """
+    hue, engine, _ = _engine_for(crop_type)
+    if engine is None:
+        return [dict(SYSTEM_ERROR_RESULT) for _ in images]
+
+    outputs = [dict(ERROR_RESULT) for _ in images]
+
+    # 1. 이미지 로드 (읽기 실패한 이미지는 배치에서 제외)
+    imgs, indices = [], []
+    for i, source in enumerate(images):
+        img = _load_image(source)
+        if img is None:
+            logger.error("Vision Analysis Error: Image not found", index=i)
+            continue
+        imgs.append(img)
+        indices.append(i)
+
+    if not imgs:
+        return outputs
+
+    try:
+        # 2. 배치 추론 (이미지 1장당 Result 1개가 같은 순서로 반환됨)
+        results = _predict(engine, imgs)
+
+        for idx, img, result in zip(indices, imgs, results):
+            with STAGE_SECONDS.time(stage="postprocess"):
+                total_area, leaf_count, hue_values = _summarize_result(img, result)
+                outputs[idx] = _evaluate_health(total_area, leaf_count, hue_values, hue)
 
     except Exception as e:
-        print(f"❌ Vision Analysis Error: {e}")
-        return {"leaf_area": 0.0, "leaf_count": 0, "health_score": 0, "health_msg": "Analysis Error"}
\ No newline at end of file
+        logger.error("Vision Batch Analysis Error", error=str(e))
+
+    return outputs
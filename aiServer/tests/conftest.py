@@ -0,0 +1,5 @@
+import os
+import sys
+
+# aiServer/ 기준 import (services.*)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,63 @@
+import importlib.util
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+SERVER_FILE = os.path.join(os.path.dirname(__file__), "..", "ai-server.py")
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("server")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("AI_OUTBOX_PATH", str(tmp / "outbox.db"))
+        mp.setenv("AI_GROWTH_PATH", str(tmp / "growth.db"))
+        spec = importlib.util.spec_from_file_location("ai_server", SERVER_FILE)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    module.startup_state["done"] = True  # 모델 로드 없이 요청 검증만 확인
+    return module
+
+
+@pytest.fixture
+def client(server, monkeypatch):
+    async def no_inference(*args, **kwargs):
+        raise AssertionError("잘못된 rows는 추론 전에 거절되어야 함")
+
+    monkeypatch.setattr(server, "run_inference", no_inference)
+    return TestClient(server.app)  # lifespan 미실행 (워커 풀 / outbox 시작 안 함)
+
+
+VALID_ROW = {"module_id": 1, "days_grown": 12, "avg_temp": 22.5, "avg_hum": 60, "total_lux": 5000, "water_ph": 6.8}
+
+
+def _post(client, rows):
+    files = [("images", (f"{i}.jpg", b"\xff\xd8", "image/jpeg")) for i in range(len(rows))]
+    return client.post("/analyze/crop/batch", files=files, data={"rows": json.dumps(rows)})
+
+
+def test_non_dict_row_is_rejected(client):
+    res = _post(client, [VALID_ROW, 5])
+    assert res.status_code == 400
+    assert "rows[1]" in res.json()["detail"]
+
+
+@pytest.mark.parametrize("field, value", [("days_grown", "abc"), ("module_id", "x"), ("water_ph", None)])
+def test_non_numeric_value_is_rejected(client, field, value):
+    res = _post(client, [VALID_ROW, {**VALID_ROW, field: value}])
+    assert res.status_code == 400
+    assert res.json()["detail"].startswith("rows[1] 값 오류")
+
+
+def test_missing_field_is_rejected(client):
+    row = {k: v for k, v in VALID_ROW.items() if k != "avg_hum"}
+    res = _post(client, [row])
+    assert res.status_code == 400
+    assert "rows[0] 필드 누락" in res.json()["detail"]
+
+
+def test_parse_crop_row_converts_types(server):
+    row = server.parse_crop_row({**VALID_ROW, "module_id": "3", "avg_temp": "21"}, "rows[0]")
+    assert row["module_id"] == 3 and row["avg_temp"] == 21.0 and row["crop_type"] is None
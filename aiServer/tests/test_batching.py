@@ -0,0 +1,61 @@
+import os
+import threading
+
+import pytest
+
+from services import batching_service
+from services.batching_service import MicroBatcher
+from services.metrics_service import render_metrics
+
+
+def _sample(name):
+    for line in render_metrics().splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[1])
+    return 0.0
+
+
+def test_batch_size_and_wait_exported_on_metrics():
+    """배치 크기 / 대기 시간 히스토그램이 /metrics 출력에 포함됨"""
+    batcher = MicroBatcher(lambda items: [x * 2 for x in items], max_batch_size=4, max_wait_ms=50)
+    before_batches = _sample("ai_microbatch_size_count")
+    before_items = _sample("ai_microbatch_size_sum")
+    before_waits = _sample("ai_microbatch_wait_seconds_count")
+
+    results = [None] * 4
+    barrier = threading.Barrier(4)
+
+    def call(i):
+        barrier.wait()
+        results[i] = batcher.submit(i, timeout=5)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [0, 2, 4, 6]
+    assert _sample("ai_microbatch_size_sum") - before_items == 4
+    assert _sample("ai_microbatch_wait_seconds_count") - before_waits == 4
+    assert 1 <= _sample("ai_microbatch_size_count") - before_batches <= 4
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork 미지원 플랫폼")
+def test_fork_resets_every_live_batcher():
+    """fork hook은 모듈에 1번만 등록되고, 살아 있는 배치기 전체의 스레드 / 대기열을 자식에서 초기화"""
+    batchers = [MicroBatcher(lambda items: items) for _ in range(2)]
+    for b in batchers:
+        assert b.submit("x", timeout=5) == "x"
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        ok = all(b._thread is None and b._queue.qsize() == 0 for b in batchers)
+        os.write(write_fd, b"1" if ok else b"0")
+        os._exit(0)
+    os.close(write_fd)
+    assert os.read(read_fd, 1) == b"1"
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    assert set(batchers) <= set(batching_service._batchers)
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services import outbox_service
+from services.outbox_service import Outbox
+
+
+class _DedupBackend(BaseHTTPRequestHandler):
+    """save-analysis처럼 idempotency_key로 중복 저장을 거르는 백엔드 (첫 응답은 타임아웃보다 늦게)"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        items = body["items"] if body.get("type") == "BATCH" else [body]
+        server = self.server
+        with server.lock:
+            server.deliveries.append([item["idempotency_key"] for item in items])
+            for item in items:
+                if item["idempotency_key"] not in server.saved:
+                    server.saved[item["idempotency_key"]] = item
+                    server.inserts += 1
+            delay = server.delays.pop(0) if server.delays else 0
+        time.sleep(delay)  # 저장은 끝났지만 응답이 늦음 -> 클라이언트는 실패로 보고 재전송
+        out = {"success": True}
+        if body.get("type") == "BATCH":
+            out["results"] = [{"success": True}] * len(items)
+        data = json.dumps(out).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except OSError:
+            pass  # 클라이언트가 이미 타임아웃으로 연결을 끊음
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def backend():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DedupBackend)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.deliveries, server.saved, server.inserts, server.delays = [], {}, 0, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _drain(outbox, timeout=10.0):
+    deadline = time.time() + timeout
+    while outbox.pending and time.time() < deadline:
+        time.sleep(0.05)
+
+
+@pytest.mark.parametrize("count", [1, 3])
+def test_retried_delivery_does_not_insert_twice(backend, tmp_path, monkeypatch, count):
+    monkeypatch.setattr(outbox_service, "OUTBOX_BACKOFF_BASE", 0.05)
+    backend.delays = [1.0]  # 첫 전송만 응답 지연
+    host, port = backend.server_address[:2]
+    outbox = Outbox(f"http://{host}:{port}/api/ai/save-analysis", path=str(tmp_path / "outbox.db"), timeout=0.2)
+    outbox.start()
+    try:
+        for module_id in range(count):
+            outbox.enqueue({"type": "CROP", "module_id": module_id, "data": {}, "health_score": 90})
+        _drain(outbox)
+    finally:
+        outbox.stop()
+
+    assert outbox.pending == 0
+    assert outbox.failed_attempts >= 1            # 첫 전송은 타임아웃으로 실패 처리
+    sent = [key for keys in backend.deliveries for key in keys]
+    assert len(sent) > count                      # 같은 결과가 재전송됨
+    assert len(set(sent)) == count                # 재전송은 같은 키
+    assert backend.inserts == count               # 저장은 결과당 1번
+
+
+
+class _ShortResultsBackend(BaseHTTPRequestHandler):
+    """BATCH 응답의 results가 보낸 건수보다 짧은 백엔드 (첫 건만 성공)"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.posts += 1
+        data = json.dumps({"success": True, "results": [{"success": True}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_rows_missing_from_batch_results_back_off(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ShortResultsBackend)
+    server.daemon_threads = True
+    server.posts = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    outbox = Outbox(f"http://{host}:{port}/api/ai/save-analysis", path=str(tmp_path / "outbox.db"))
+    try:
+        outbox.start()
+        outbox._stop.set()  # 전송 스레드 없이 _deliver를 직접 호출
+        outbox._thread.join()
+        for module_id in range(3):
+            outbox.enqueue({"type": "CROP", "module_id": module_id})
+        rows = outbox._execute("SELECT id, payload, attempts FROM outbox ORDER BY id")
+        outbox._deliver(rows)
+        left = outbox._execute("SELECT attempts, next_attempt FROM outbox ORDER BY id")
+    finally:
+        outbox.stop()
+        server.shutdown()
+        server.server_close()
+
+    assert server.posts == 1
+    assert len(left) == 2                                   # 첫 건만 삭제
+    assert all(attempts == 1 for attempts, _ in left)       # 빠진 건은 실패로 기록
+    assert all(nxt > time.time() for _, nxt in left)        # 백오프 후 재시도
@@ -21,4 +21,6 @@ pool.connect((err, client, release) => {
 
 module.exports = {
   query: (text, params) => pool.query(text, params),
+  // 트랜잭션용 전용 커넥션 (사용 후 client.release() 필수)
+  connect: () => pool.connect(),
 };
\ No newline at end of file
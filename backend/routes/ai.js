@@ -11,11 +11,15 @@ const {
     generateWeeklyReport, 
     generateGrowthJournal 
 } = require('../services/aiService');
+const { createIdempotencyStore } = require('../services/idempotencyService');
 
 // [핵심] 파일 시스템 대신 메모리 버퍼 사용 (BLOB 저장을 위해)
 const storage = multer.memoryStorage();
 const upload = multer({ storage: storage });
 
+// AI 서버 outbox 재전송 중복 저장 방지 (idempotency_key)
+const saveKeys = createIdempotencyStore(db);
+
 
 /**
  * [기능 1] 라즈베리파이 사진 수신 (/pi-photo)
@@ -130,62 +134,74 @@ router.post('/pi-photo', upload.single('image'), async (req, res) => {
 });
 
 /**
- * [기능 2] AI 분석 결과 수신 및 저장 (/save-analysis)
- * - Trigger: AI Server (FastAPI)가 분석 완료 후 호출
- * - 역할: 
- * 1. AI 작물 분석 결과 DB 저장
- * 2. LLM 호출하여 한줄평/일일리포트 생성 및 저장
- * 3. Modules 테이블 상태 업데이트 (대시보드용)
+ * AI 작물 분석 결과 1건 저장 (LLM 리포트 생성 + DB 저장 + 모듈 상태 갱신)
+ * - idempotency_key가 같은 재전송은 한 번만 저장 (이미 저장됐으면 false 반환, 성공으로 응답)
  */
-router.post('/save-analysis', async (req, res) => {
-    const { type, module_id, data, health_score } = req.body; // type='CROP'
-    const io = req.app.get('io');
+function saveCropAnalysis(io, item) {
+    return saveKeys.once(item.idempotency_key, () => saveCropAnalysisOnce(io, item));
+}
 
-    try {
-        if (type === 'CROP') {
-            const { growth_rate_pct, leaf_health_status, estimated_size_cm, expected_harvest_date } = data;
-            const statsRes = await db.query(`
-                SELECT 
-                    AVG(CAST(sensor_data->>'water_temp' AS NUMERIC)) as avg_t, 
-                    AVG(CAST(sensor_data->>'humidity' AS NUMERIC)) as avg_h,
-                    AVG(CAST(sensor_data->>'lux_value' AS NUMERIC)) as avg_l,
-                    AVG(CAST(sensor_data->>'ph_value' AS NUMERIC)) as avg_p,
-                    AVG(CAST(sensor_data->>'ec_value' AS NUMERIC)) as avg_ec,
-                    AVG(CAST(sensor_data->>'do_value' AS NUMERIC)) as avg_do
-                FROM sensor_logs 
-                WHERE module_id = $1 AND recorded_at > NOW() - INTERVAL '24 hours'
-            `, [module_id]);
-
-            // 1. LLM 생성을 위한 문맥 데이터 수집
-            const sensorStats = {
-                temp: parseFloat(statsRes.rows[0]?.avg_t || 0).toFixed(1),
-                hum: parseFloat(statsRes.rows[0]?.avg_h || 0).toFixed(1),
-                lux: parseFloat(statsRes.rows[0]?.avg_l || 0).toFixed(0),
-                ph: parseFloat(statsRes.rows[0]?.avg_p || 0).toFixed(2),
-                ec: parseFloat(statsRes.rows[0]?.avg_ec || 0).toFixed(1),
-                do: parseFloat(statsRes.rows[0]?.avg_do || 0).toFixed(1)
-            };
-            const moduleInfo = (await db.query('SELECT module_name, crop_type, serial_number FROM modules WHERE module_id = $1', [module_id])).rows[0];            
-            const waterAnalysis = (await db.query('SELECT water_score, predicted_risk_level FROM ai_results_water WHERE module_id = $1 ORDER BY analyzed_at DESC LIMIT 1', [module_id])).rows[0] || { water_score: 0, predicted_risk_level: 'Unknown' };
+async function saveCropAnalysisOnce(io, item) {
+    const { type, module_id, data, health_score, idempotency_key } = item; // type='CROP'
 
-            // 2. [LLM] 일일 분석 (한줄평 + 상세리포트)
-            let oneLiner = "데이터 분석 중...";
-            let dailyReport = "리포트를 생성할 수 없습니다.";
+    if (type === 'CROP') {
+        // 재전송: 이미 저장된 결과면 LLM 호출 없이 종료
+        if (idempotency_key && await saveKeys.isSaved(idempotency_key)) return false;
 
-            try {
-                const llmResult = await generateDailyAnalysis(moduleInfo, sensorStats, data, waterAnalysis);
-                if (llmResult) {
-                    oneLiner = llmResult.one_line_review;
-                    dailyReport = llmResult.daily_report;
-                }
-                io.to(moduleInfo.serial_number).emit('daily_report_updated', {
-                    oneLiner: oneLiner,
-                    dailyReport: dailyReport
-                });
-            } catch (e) { console.error("LLM Error:", e.message); }
+        const { growth_rate_pct, leaf_health_status, estimated_size_cm, expected_harvest_date } = data;
+        const statsRes = await db.query(`
+            SELECT 
+                AVG(CAST(sensor_data->>'water_temp' AS NUMERIC)) as avg_t, 
+                AVG(CAST(sensor_data->>'humidity' AS NUMERIC)) as avg_h,
+                AVG(CAST(sensor_data->>'lux_value' AS NUMERIC)) as avg_l,
+                AVG(CAST(sensor_data->>'ph_value' AS NUMERIC)) as avg_p,
+                AVG(CAST(sensor_data->>'ec_value' AS NUMERIC)) as avg_ec,
+                AVG(CAST(sensor_data->>'do_value' AS NUMERIC)) as avg_do
+            FROM sensor_logs 
+            WHERE module_id = $1 AND recorded_at > NOW() - INTERVAL '24 hours'
+        `, [module_id]);
+
+        // 1. LLM 생성을 위한 문맥 데이터 수집
+        const sensorStats = {
+            temp: parseFloat(statsRes.rows[0]?.avg_t || 0).toFixed(1),
+            hum: parseFloat(statsRes.rows[0]?.avg_h || 0).toFixed(1),
+            lux: parseFloat(statsRes.rows[0]?.avg_l || 0).toFixed(0),
+            ph: parseFloat(statsRes.rows[0]?.avg_p || 0).toFixed(2),
+            ec: parseFloat(statsRes.rows[0]?.avg_ec || 0).toFixed(1),
+            do: parseFloat(statsRes.rows[0]?.avg_do || 0).toFixed(1)
+        };
+        const moduleInfo = (await db.query('SELECT module_name, crop_type, serial_number FROM modules WHERE module_id = $1', [module_id])).rows[0];            
+        const waterAnalysis = (await db.query('SELECT water_score, predicted_risk_level FROM ai_results_water WHERE module_id = $1 ORDER BY analyzed_at DESC LIMIT 1', [module_id])).rows[0] || { water_score: 0, predicted_risk_level: 'Unknown' };
+
+        // 2. [LLM] 일일 분석 (한줄평 + 상세리포트)
+        let oneLiner = "데이터 분석 중...";
+        let dailyReport = "리포트를 생성할 수 없습니다.";
+
+        try {
+            const llmResult = await generateDailyAnalysis(moduleInfo, sensorStats, data, waterAnalysis);
+            if (llmResult) {
+                oneLiner = llmResult.one_line_review;
+                dailyReport = llmResult.daily_report;
+            }
+            io.to(moduleInfo.serial_number).emit('daily_report_updated', {
+                oneLiner: oneLiner,
+                dailyReport: dailyReport
+            });
+        } catch (e) { console.error("LLM Error:", e.message); }
+
+        // 3~4. DB 저장 + 모듈 상태 갱신 (idempotency_key 기록과 같은 트랜잭션)
+        const riskScore = health_score ? Math.max(0, 100 - health_score) : 0;
+        const client = await db.connect();
+        try {
+            await client.query('BEGIN');
+            if (idempotency_key && !(await saveKeys.claim(client, idempotency_key))) {
+                // 다른 요청이 먼저 저장함 (동시 재전송)
+                await client.query('ROLLBACK');
+                return false;
+            }
 
             // 3. DB 저장
-            await db.query(
+            await client.query(
                 `INSERT INTO ai_results_crops 
                 (module_id, growth_rate_pct, leaf_health_status, estimated_size_cm, expected_harvest_date, 
                  avg_env_data, one_liner, daily_report) 
@@ -199,21 +215,60 @@ router.post('/save-analysis', async (req, res) => {
             );
 
             // 4. 모듈 테이블 상태 업데이트 (한줄평 등)
-            
-            const riskScore = health_score ? Math.max(0, 100 - health_score) : 0;
-            // console.log(oneLiner);            
-            await db.query(
+            await client.query(
                 `UPDATE modules 
                  SET one_line_review = $1, growth_level = $2, risk_score = $3, expected_harvest_date = $4
                  WHERE module_id = $5`,
                 [oneLiner, growth_rate_pct, riskScore, expected_harvest_date, module_id]
             );
+            await client.query('COMMIT');
+        } catch (error) {
+            await client.query('ROLLBACK').catch(() => {});
+            throw error;
+        } finally {
+            client.release();
+        }
+
+        // 5. 프론트엔드 알림
+        if (moduleInfo.serial_number) {
+            io.to(moduleInfo.serial_number).emit('daily_report_updated', { oneLiner, growth_rate: growth_rate_pct });
+        }
+        return true;
+    }
+    return false;
+}
+
+/**
+ * [기능 2] AI 분석 결과 수신 및 저장 (/save-analysis)
+ * - Trigger: AI Server (FastAPI)가 분석 완료 후 호출
+ * - 역할: 
+ * 1. AI 작물 분석 결과 DB 저장
+ * 2. LLM 호출하여 한줄평/일일리포트 생성 및 저장
+ * 3. Modules 테이블 상태 업데이트 (대시보드용)
+ * - 일괄 전송: { type: 'BATCH', items: [...] } 형태로 여러 건을 한 번에 받으면
+ *   건별로 저장하고 results 배열로 건별 성공 여부를 돌려줌 (AI 서버 outbox 재시도용)
+ * - 재전송: idempotency_key가 이미 저장된 건은 다시 저장하지 않고 성공(duplicate: true)으로 응답
+ */
+router.post('/save-analysis', async (req, res) => {
+    const io = req.app.get('io');
 
-            // 5. 프론트엔드 알림
-            if (moduleInfo.serial_number) {
-                io.to(moduleInfo.serial_number).emit('daily_report_updated', { oneLiner, growth_rate: growth_rate_pct });
+    if (req.body.type === 'BATCH') {
+        const items = Array.isArray(req.body.items) ? req.body.items : [];
+        const results = [];
+        for (const item of items) {
+            try {
+                const saved = await saveCropAnalysis(io, item);
+                results.push({ success: true, duplicate: !saved });
+            } catch (error) {
+                console.error("Save Analysis Error:", error);
+                results.push({ success: false, error: "Save Failed" });
             }
         }
+        return res.json({ success: results.every(r => r.success), results });
+    }
+
+    try {
+        await saveCropAnalysis(io, req.body);
         res.json({ success: true });
     } catch (error) {
         console.error("Save Analysis Error:", error);
@@ -0,0 +1,75 @@
+// backend/services/idempotencyService.js
+
+/**
+ * AI 분석 결과 중복 저장 방지
+ * - AI 서버 outbox는 결과마다 idempotency_key를 붙이고, 응답을 못 받으면(타임아웃 등) 같은 키로 다시 보냄
+ * - 같은 키가 처리 중이면 진행 중인 저장을 같이 기다림 (LLM 리포트 중복 생성 방지)
+ * - 저장이 끝난 키는 ai_save_keys 테이블에 남겨 재전송을 걸러냄
+ *   (키 기록은 결과 INSERT와 같은 트랜잭션 -> 저장 실패 시 키도 남지 않아 재시도 가능)
+ */
+const KEY_RETENTION = '7 days';          // 재전송은 길어야 몇 분 안에 오므로 넉넉하게 보관
+const PRUNE_INTERVAL_MS = 60 * 60 * 1000; // 오래된 키 정리 주기
+
+function createIdempotencyStore(db) {
+    const inFlight = new Map(); // key -> 진행 중인 저장 Promise
+    let ready = null;
+    let lastPrune = 0;
+
+    function ensureTable() {
+        if (!ready) {
+            ready = db.query(`
+                CREATE TABLE IF NOT EXISTS ai_save_keys (
+                    idempotency_key TEXT PRIMARY KEY,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+            `).catch((err) => { ready = null; throw err; });
+        }
+        return ready;
+    }
+
+    function prune() {
+        const now = Date.now();
+        if (now - lastPrune < PRUNE_INTERVAL_MS) return;
+        lastPrune = now;
+        db.query(`DELETE FROM ai_save_keys WHERE created_at < NOW() - INTERVAL '${KEY_RETENTION}'`)
+            .catch((err) => console.error("ai_save_keys 정리 실패:", err.message));
+    }
+
+    /**
+     * 이미 저장된 키인지 (저장 전에 확인해서 재전송이면 LLM 호출까지 생략)
+     */
+    async function isSaved(key) {
+        await ensureTable();
+        prune();
+        const res = await db.query('SELECT 1 FROM ai_save_keys WHERE idempotency_key = $1', [key]);
+        return res.rows.length > 0;
+    }
+
+    /**
+     * 트랜잭션 안에서 키 선점 -> false면 다른 요청이 먼저 저장함 (호출한 쪽에서 ROLLBACK)
+     * 같은 키가 동시에 들어와도 PRIMARY KEY 충돌로 한쪽만 성공
+     */
+    async function claim(client, key) {
+        await ensureTable();
+        const res = await client.query(
+            'INSERT INTO ai_save_keys (idempotency_key) VALUES ($1) ON CONFLICT DO NOTHING RETURNING idempotency_key',
+            [key]
+        );
+        return res.rows.length > 0;
+    }
+
+    /**
+     * 같은 키의 저장이 진행 중이면 새로 시작하지 않고 그 결과를 같이 기다림 (키가 없으면 그냥 실행)
+     */
+    function once(key, fn) {
+        if (!key) return fn();
+        if (inFlight.has(key)) return inFlight.get(key);
+        const promise = fn().finally(() => inFlight.delete(key));
+        inFlight.set(key, promise);
+        return promise;
+    }
+
+    return { isSaved, claim, once };
+}
+
+module.exports = { createIdempotencyStore };
@@ -0,0 +1,100 @@
+// backend/test/idempotency.test.js
+const test = require('node:test');
+const assert = require('node:assert');
+const { createIdempotencyStore } = require('../services/idempotencyService');
+
+/**
+ * pg 대신 쓰는 메모리 DB (ai_save_keys PRIMARY KEY + 트랜잭션 커밋/롤백만 흉내)
+ */
+function createFakeDb() {
+    const committed = new Set();
+    const claimed = new Set(); // 커밋 전 키도 포함 (PRIMARY KEY 충돌은 커밋 여부와 무관)
+    const db = {
+        inserts: 0,
+        async query(sql, params) {
+            if (sql.includes('SELECT 1 FROM ai_save_keys')) {
+                return { rows: committed.has(params[0]) ? [{}] : [] };
+            }
+            return { rows: [] }; // CREATE TABLE / 정리
+        },
+        async connect() {
+            const pending = new Set();
+            return {
+                async query(sql, params) {
+                    if (sql.startsWith('INSERT INTO ai_save_keys')) {
+                        if (claimed.has(params[0])) return { rows: [] };
+                        claimed.add(params[0]);
+                        pending.add(params[0]);
+                        return { rows: [{ idempotency_key: params[0] }] };
+                    }
+                    if (sql === 'COMMIT') pending.forEach((key) => committed.add(key));
+                    if (sql === 'ROLLBACK') pending.forEach((key) => claimed.delete(key));
+                    if (sql === 'COMMIT' || sql === 'ROLLBACK') pending.clear();
+                    return { rows: [] };
+                },
+                release() {}
+            };
+        }
+    };
+    return db;
+}
+
+/**
+ * routes/ai.js saveCropAnalysis와 같은 순서: once -> isSaved -> (LLM) -> BEGIN/claim/INSERT/COMMIT
+ */
+function createSaver(db, llmDelayMs = 0) {
+    const saveKeys = createIdempotencyStore(db);
+    const stats = { llmCalls: 0 };
+    const save = (item) => saveKeys.once(item.idempotency_key, async () => {
+        if (await saveKeys.isSaved(item.idempotency_key)) return false;
+        stats.llmCalls += 1;
+        await new Promise((resolve) => setTimeout(resolve, llmDelayMs));
+        const client = await db.connect();
+        try {
+            await client.query('BEGIN');
+            if (!(await saveKeys.claim(client, item.idempotency_key))) {
+                await client.query('ROLLBACK');
+                return false;
+            }
+            db.inserts += 1;
+            await client.query('COMMIT');
+            return true;
+        } finally {
+            client.release();
+        }
+    });
+    return { save, stats };
+}
+
+test('재전송(타임아웃 후 같은 키)은 한 번만 저장', async () => {
+    const db = createFakeDb();
+    const { save, stats } = createSaver(db);
+    const item = { type: 'CROP', module_id: 1, idempotency_key: 'a1' };
+
+    assert.strictEqual(await save(item), true);
+    assert.strictEqual(await save(item), false);
+    assert.strictEqual(db.inserts, 1);
+    assert.strictEqual(stats.llmCalls, 1);
+});
+
+test('첫 저장이 끝나기 전에 도착한 재전송도 한 번만 저장', async () => {
+    const db = createFakeDb();
+    const { save, stats } = createSaver(db, 20);
+    const item = { type: 'CROP', module_id: 1, idempotency_key: 'b2' };
+
+    const results = await Promise.all([save(item), save(item)]);
+    assert.deepStrictEqual(results, [true, true]); // 같은 저장 결과를 같이 받음
+    assert.strictEqual(db.inserts, 1);
+    assert.strictEqual(stats.llmCalls, 1);
+});
+
+test('다른 프로세스가 먼저 커밋한 키는 트랜잭션에서 걸러냄', async () => {
+    const db = createFakeDb();
+    const first = createSaver(db, 20);
+    const second = createSaver(db, 20); // 메모리 상태를 공유하지 않는 별도 인스턴스
+    const item = { type: 'CROP', module_id: 1, idempotency_key: 'c3' };
+
+    const results = await Promise.all([first.save(item), second.save(item)]);
+    assert.deepStrictEqual(results.sort(), [false, true]);
+    assert.strictEqual(db.inserts, 1);
+});
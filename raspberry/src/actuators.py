@@ -1,4 +1,7 @@
 import RPi.GPIO as GPIO
+import atexit
+import queue
+import threading
 import time
 import json
 import os
@@ -25,6 +28,96 @@ last_dosing_time = 0
 led_pwm = None 
 current_led_duty = 0.0 # [NEW] 현재 LED 밝기 상태 저장 (플리커링 방지용)
 
+class TimedOutput:
+    """
+    [시간 제어 출력] 핀을 duration초 동안 켰다가 전용 스레드가 자동으로 끔 (호출은 즉시 반환)
+    - 겹치는 명령은 순서대로 하나씩 실행 (동시에 두 번 켜지지 않음)
+    - 어떤 경우에도 꺼지도록 보장: 실행 중 예외 / off() / 프로그램 종료(atexit)
+    """
+    def __init__(self, pin, name):
+        self.pin = pin
+        self.name = name
+        self._commands = queue.Queue()
+        self._cancel = threading.Event()
+        self._active = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._generation = 0  # off()마다 증가 -> 그 전에 예약된 명령은 실행하지 않음
+        self._closed = False
+
+    def pulse(self, duration):
+        """duration초 동안 켜기 예약 (앞선 명령이 끝난 뒤 실행, shutdown() 이후에는 RuntimeError)"""
+        with self._lock:
+            # 종료된 뒤에는 스레드를 다시 띄우지 않음 (GPIO 해제 후 핀을 켜는 것 방지)
+            if self._closed:
+                raise RuntimeError(f"{self.name} 종료됨")
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"timed-{self.name}", daemon=True)
+                self._thread.start()
+            self._commands.put((self._generation, duration))
+
+    @property
+    def busy(self):
+        """켜져 있거나 대기 중인 명령이 있음"""
+        return self._active.is_set() or not self._commands.empty()
+
+    def off(self):
+        """대기 중인 명령을 버리고 즉시 끔"""
+        with self._lock:
+            self._generation += 1
+            self._cancel.set()
+            while True:
+                try:
+                    self._commands.get_nowait()
+                except queue.Empty:
+                    break
+        self._write_low()
+
+    def shutdown(self, timeout=1.0):
+        """
+        off() 후 전용 스레드 종료 (프로그램 종료 시, 한 번만 수행)
+        cleanup()에서 GPIO.cleanup() 전에 먼저 호출되므로, 뒤이어 실행되는 atexit 호출은 건너뜀
+        (이미 해제된 핀에 쓰려다 OFF 실패 로그가 남지 않도록)
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self.off()
+        self._commands.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _write_low(self):
+        try:
+            GPIO.output(self.pin, GPIO.LOW)
+        except Exception as e:
+            print(f">>> [Actuator] {self.name} OFF 실패: {e}")
+
+    def _run(self):
+        while True:
+            command = self._commands.get()
+            if command is None:
+                return
+            generation, duration = command
+            with self._lock:
+                if generation != self._generation:
+                    continue  # off() 이전에 예약된 명령
+                self._cancel.clear()
+                self._active.set()
+            try:
+                GPIO.output(self.pin, GPIO.HIGH)
+                # 정해진 시간만큼 대기 (off() 호출 시 즉시 깨어남)
+                self._cancel.wait(duration)
+            except Exception as e:
+                print(f">>> [Actuator] {self.name} 작동 에러: {e}")
+            finally:
+                self._write_low()
+                self._active.clear()
+
+ph_pump = TimedOutput(PUMP_PIN, "ph_pump")
+atexit.register(ph_pump.shutdown)
+
 def setup():
     """GPIO 초기화 (펌프 + LED)"""
     global led_pwm
@@ -48,6 +141,7 @@ def setup():
 
 def cleanup():
     global led_pwm
+    ph_pump.shutdown()
     if led_pwm:
         led_pwm.stop()
     GPIO.cleanup()
@@ -93,10 +187,12 @@ def control_ph(current_ph, predicted_ph=None):
     # 펌프 실행 (조건 만족 시)
     # -------------------------------------------------------
     if action_reason:
+        if ph_pump.busy:
+            return False, "펌프 작동 중", None
         try:
-            GPIO.output(PUMP_PIN, GPIO.HIGH)
-            time.sleep(PUMP_DURATION)
-            GPIO.output(PUMP_PIN, GPIO.LOW)
+            # 켜고 바로 반환 -> 끄는 것은 ph_pump 전용 스레드가 PUMP_DURATION초 뒤에 수행
+            # (투입 중에도 센서 수집 / LED 제어 주기가 멈추지 않음)
+            ph_pump.pulse(PUMP_DURATION)
             
             last_dosing_time = current_time
             
@@ -109,7 +205,7 @@ def control_ph(current_ph, predicted_ph=None):
             }
             return True, f"펌프 작동 [{action_reason}]", log_payload
         except Exception as e:
-            GPIO.output(PUMP_PIN, GPIO.LOW)
+            ph_pump.off()
             return False, f"펌프 에러: {e}", None
 
     return False, "pH 정상 범위 유지 중", None
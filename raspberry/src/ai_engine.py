@@ -1,23 +1,78 @@
-import joblib
-import pandas as pd
 import numpy as np
 import os
 import math
+import hashlib
+
+from tree_predictor import TreeEnsemble, FeatureOrderError, probe_matrix, verify_bit_exact
 
 # =========================================================
 # 1. 설정 및 모델 로드
 # =========================================================
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MODEL_PATH = os.path.join(BASE_DIR, 'models', 'model_1h_integrated.pkl')
+# pkl을 NumPy 트리 배열로 변환해 둔 파일 (있으면 pandas / lightgbm 없이 예측)
+COMPILED_PATH = os.path.join(BASE_DIR, 'models', 'model_1h_integrated.npz')
+
+# 모델 입력 Feature 순서 (학습 순서와 반드시 같아야 함 - 로드 시 확인)
+FEATURES = ['pH', 'EC', 'Water_Temp', 'DO']
+
+model = None  # 출력(pH, EC, Temp, DO)별 TreeEnsemble 리스트
+
+def _file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _load_compiled(digest):
+    """변환 파일이 현재 pkl에서 만들어진 것이면 로드 (아니면 None)"""
+    if not os.path.exists(COMPILED_PATH):
+        return None
+    with np.load(COMPILED_PATH) as arrays:
+        if str(arrays['source_sha256']) != digest:
+            return None
+        ensembles = [TreeEnsemble.from_arrays(arrays, f"out{i}_") for i in range(int(arrays['n_outputs']))]
+    for e in ensembles:
+        if e.feature_names != FEATURES:
+            raise FeatureOrderError(f"feature order mismatch: model={e.feature_names} expected={FEATURES}")
+    return ensembles
 
-model = None
+def _compile_model(digest):
+    """
+    pkl(MultiOutputRegressor[LGBMRegressor]) -> TreeEnsemble 리스트로 변환하고 .npz로 저장
+    변환 결과가 LightGBM 예측과 비트 단위로 같은지 확인한 뒤에만 사용
+    (이 경로에서만 joblib / scikit-learn / lightgbm이 필요)
+    """
+    import joblib
+    loaded = joblib.load(MODEL_PATH)
+    estimators = getattr(loaded, 'estimators_', [loaded])
+    ensembles = [TreeEnsemble.from_booster(est.booster_, FEATURES) for est in estimators]
+
+    X = probe_matrix(ensembles)
+    if not all(verify_bit_exact(e, est.booster_, X) for e, est in zip(ensembles, estimators)):
+        raise ValueError("NumPy 예측 결과가 LightGBM과 다름")
+
+    arrays = {'source_sha256': np.array(digest), 'n_outputs': np.array(len(ensembles))}
+    for i, e in enumerate(ensembles):
+        arrays.update(e.to_arrays(f"out{i}_"))
+    try:
+        np.savez_compressed(COMPILED_PATH, **arrays)
+    except OSError as e:
+        print(f">>> [AI Engine] 변환 모델 저장 실패 (다음 시작 때 다시 변환): {e}")
+    return ensembles
 
 if os.path.exists(MODEL_PATH):
     try:
-        model = joblib.load(MODEL_PATH)
-        print(f">>> [AI Engine] 통합 모델 로드 완료: {MODEL_PATH}")
+        digest = _file_hash(MODEL_PATH)
+        model = _load_compiled(digest)
+        if model is None:
+            model = _compile_model(digest)
+            print(f">>> [AI Engine] 통합 모델 변환 완료: {MODEL_PATH} -> {COMPILED_PATH}")
+        print(f">>> [AI Engine] 통합 모델 로드 완료: {COMPILED_PATH} (출력 {len(model)}개)")
     except Exception as e:
         print(f">>> [AI Engine] 모델 로드 실패: {e}")
+        model = None
 else:
     print(f">>> [AI Engine] 경고: 모델 파일 없음 ({MODEL_PATH})")
 
@@ -137,11 +192,11 @@ def analyze_water_quality(sensor_data):
     # 4) AI 예측 (1시간 뒤)
     if model:
         try:
-            # DataFrame 생성 (Feature 순서 중요: pH, EC, Water_Temp, DO)
-            input_df = pd.DataFrame([current_input], columns=['pH', 'EC', 'Water_Temp', 'DO'])
+            # 입력 벡터 생성 (Feature 순서 중요: pH, EC, Water_Temp, DO)
+            input_vec = np.array([[float(current_input[f]) for f in FEATURES]])
             
-            # 예측 (결과가 2차원 배열로 나옴)
-            pred_1h = model.predict(input_df) 
+            # 예측 (출력별 트리 앙상블 -> [1, 4] 2차원 배열)
+            pred_1h = np.column_stack([e.predict(input_vec) for e in model])
             
             # 예측 결과 포맷팅 (리스트 형태)
             # 모델이 [pH, EC, Temp, DO] 4개를 예측한다고 가정
@@ -0,0 +1,117 @@
+"""
+촬영 사진 방향 보정 방식 비교 (카메라 없이 실행 가능)
+
+    python bench_rotation.py                       # 설정 해상도의 가짜 프레임
+    python bench_rotation.py --image sample.jpg --repeat 50 --rotation 90
+
+- isp      : 인코딩 전 프레임 회전 + 1회 인코딩 (90/270도 기준, 180도는 실제 ISP에서 비용 0)
+- jpegtran : 완성된 JPEG 무손실 회전
+- exif     : Orientation 태그만 기록
+- reencode : 기존 방식 (디코딩 -> 회전 -> 재인코딩)
+기준(no-rotate)은 회전 없이 JPEG 인코딩만 하는 비용 (촬영 시 어차피 드는 비용)
+shot ms = 촬영 1회에 드는 인코딩 + 회전 비용 (isp는 인코딩 포함, 나머지는 기준 + 회전)
+화질(PSNR)은 회전한 원본 프레임 대비, 결과를 EXIF 방향까지 반영해 디코딩한 이미지로 계산
+"""
+import argparse
+import io
+import os
+import resource
+import shutil
+import time
+
+os.environ.setdefault("CAMERA_BACKEND", "fake")
+
+import numpy as np
+from PIL import Image, ImageOps
+
+import camera
+
+
+def _cpu_seconds():
+    """현재 프로세스 + 자식 프로세스(jpegtran) CPU 시간"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def psnr(a, b):
+    if a.shape != b.shape:
+        return float("nan")  # 방향이 틀림
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def decode_oriented(jpeg):
+    """EXIF Orientation까지 반영해 디코딩 (AI 서버 cv2.imdecode / 브라우저와 같은 결과)"""
+    return np.asarray(ImageOps.exif_transpose(Image.open(io.BytesIO(jpeg))).convert("RGB"))
+
+
+def measure(name, fn, repeat):
+    fn()  # 워밍업
+    cpu_start, start = _cpu_seconds(), time.perf_counter()
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t)
+    wall = time.perf_counter() - start
+    cpu = _cpu_seconds() - cpu_start
+    times.sort()
+    return {
+        "method": name,
+        "mean_ms": wall / repeat * 1000,
+        "p95_ms": times[min(len(times) - 1, int(len(times) * 0.95))] * 1000,
+        "cpu_ms": cpu / repeat * 1000,
+        "bytes": len(out),
+        "out": out,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="촬영 사진 방향 보정 방식 비교")
+    parser.add_argument("--image", help="원본 사진 (없으면 설정 해상도의 가짜 프레임)")
+    parser.add_argument("--rotation", type=int, default=camera.ROTATION, help="반시계 회전 각도")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+    rotation = args.rotation % 360
+    if rotation == 0:
+        parser.error("회전 각도가 0이면 비교할 것이 없습니다.")
+
+    if args.image:
+        frame = np.asarray(Image.open(args.image).convert("RGB"))
+    else:
+        frame = camera.FakeCameraBackend().capture_array()
+    jpeg = camera.encode_jpeg(frame)
+    reference = np.rot90(frame, k=rotation // 90)
+
+    cases = [
+        ("no-rotate", lambda: camera.encode_jpeg(frame)),
+        ("isp", lambda: camera.encode_jpeg(np.rot90(frame, k=rotation // 90))),
+        ("exif", lambda: camera.rotate_exif(jpeg, rotation)) if camera.piexif is not None else None,
+        ("jpegtran", lambda: camera.rotate_jpegtran(jpeg, rotation)) if shutil.which("jpegtran") else None,
+        ("reencode", lambda: camera.rotate_reencode(jpeg, rotation)),
+    ]
+    skipped = [name for name, case in zip(["exif", "jpegtran"], cases[2:4]) if case is None]
+
+    h, w = frame.shape[:2]
+    print(f"{w}x{h}, 회전 {rotation}도, quality {camera.QUALITY}, 반복 {args.repeat}회, "
+          f"인코더 {'simplejpeg' if camera.simplejpeg is not None else 'PIL'}")
+    print(f"{'method':<10} {'mean ms':>8} {'p95 ms':>8} {'cpu ms':>8} {'shot ms':>8} {'bytes':>8} {'PSNR dB':>8}")
+    base_ms = 0.0
+    for case in cases:
+        if case is None:
+            continue
+        r = measure(*case, args.repeat)
+        if r["method"] == "no-rotate":
+            base_ms, shot_ms, quality = r["mean_ms"], r["mean_ms"], "-"
+        else:
+            shot_ms = r["mean_ms"] if r["method"] == "isp" else base_ms + r["mean_ms"]
+            quality = f"{psnr(decode_oriented(r['out']), reference):.2f}"
+        print(f"{r['method']:<10} {r['mean_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['cpu_ms']:>8.2f} "
+              f"{shot_ms:>8.2f} {r['bytes']:>8} {quality:>8}")
+    if skipped:
+        print(f"건너뜀 (도구 없음): {', '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,11 @@ import json
 import time
 import io
 import sys
+import atexit
+import shutil
+import subprocess
+import threading
+import numpy as np
 import transmitter  # 전송 모듈 임포트
 from PIL import Image
 
@@ -14,6 +19,21 @@ try:
 except ImportError:
     Picamera2 = None
 
+try:
+    from libcamera import Transform
+except ImportError:
+    Transform = None
+
+try:
+    import piexif
+except ImportError:
+    piexif = None
+
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
 # 설정 로드
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CONFIG_PATH = os.path.join(BASE_DIR, 'config', 'settings.json')
@@ -27,61 +47,245 @@ except:
 RES_W = config.get('camera', {}).get('resolution', [640, 480])[0]
 RES_H = config.get('camera', {}).get('resolution', [640, 480])[1]
 QUALITY = config.get('camera', {}).get('quality', 70)
+# picamera2 / fake (카메라 없는 PC에서 테스트용 가짜 이미지), 환경 변수 CAMERA_BACKEND로 덮어쓰기 가능
+BACKEND = os.getenv('CAMERA_BACKEND', config.get('camera', {}).get('backend', 'picamera2'))
+WARMUP_SEC = config.get('camera', {}).get('warmup_sec', 1.0)
 
-def capture_and_send_live(is_db_log=False):
-    """
-    [FIXED] 촬영 즉시 백엔드 ai.js로 전송 (메모리 방식)
-    - Picamera2 버전 호환성 문제(quality 인자) 해결
-    """
-    if Picamera2 is None:
-        print("Picamera2 라이브러리가 없습니다.")
-        return False
+# 설치 방향 보정: 반시계 방향 회전 각도 (0 / 90 / 180 / 270)
+ROTATION = config.get('camera', {}).get('rotation', 90) % 360
+# 회전 방식 (JPEG를 디코딩 -> 회전 -> 재인코딩하지 않는 방식 우선)
+# - isp      : 180도는 센서/ISP 변환(libcamera Transform), 90/270도는 인코딩 전 원본 프레임을 회전 후 1회만 인코딩
+# - jpegtran : 완성된 JPEG를 DCT 영역에서 무손실 회전 (jpegtran 실행 파일 필요, 없으면 exif)
+# - exif     : 픽셀은 그대로 두고 EXIF Orientation 태그만 기록 (AI 서버 cv2.imdecode / 브라우저가 반영, piexif 필요)
+# - reencode : 기존 방식 (PIL 디코딩 -> 회전 -> 재인코딩, 화질 손실 2회)
+ROTATE_METHOD = config.get('camera', {}).get('rotate_method', 'exif')
+
+# ---------------------------------------------------------
+# 회전 (JPEG bytes -> 방향이 맞는 JPEG bytes)
+# ---------------------------------------------------------
+EXIF_ORIENTATION = {0: 1, 90: 8, 180: 3, 270: 6}   # 반시계 회전 각도 -> 표시할 때 적용할 Orientation 값
+JPEGTRAN_ROTATE = {90: "270", 180: "180", 270: "90"}  # jpegtran은 시계 방향 각도
+
+def encode_jpeg(rgb):
+    """RGB ndarray -> JPEG bytes (simplejpeg가 있으면 사용, 없으면 PIL)"""
+    if simplejpeg is not None:
+        return simplejpeg.encode_jpeg(np.ascontiguousarray(rgb), quality=QUALITY, colorspace='RGB')
+    image_stream = io.BytesIO()
+    Image.fromarray(rgb).save(image_stream, format="JPEG", quality=QUALITY)
+    return image_stream.getvalue()
 
-    picam2 = None
+def rotate_reencode(jpeg, rotation):
+    """[기존 방식] PIL 디코딩 -> 반시계 회전 -> 재인코딩"""
+    image = Image.open(io.BytesIO(jpeg))
+    image = image.rotate(rotation, expand=True)
+    rotated_stream = io.BytesIO()
+    image.save(rotated_stream, format="JPEG", quality=QUALITY)
+    return rotated_stream.getvalue()
+
+def rotate_jpegtran(jpeg, rotation):
+    """DCT 계수 재배치로 무손실 회전 (-perfect: 가장자리 MCU가 잘려야 하는 해상도면 실패 처리)"""
+    result = subprocess.run(
+        ["jpegtran", "-rotate", JPEGTRAN_ROTATE[rotation], "-perfect", "-copy", "all"],
+        input=jpeg, capture_output=True, check=True, timeout=5
+    )
+    return result.stdout
+
+def rotate_exif(jpeg, rotation):
+    """EXIF Orientation 태그만 기록 (기존 EXIF가 있으면 값만 교체, 픽셀 데이터는 그대로)"""
     try:
-        # 1. 카메라 설정 및 시작
-        picam2 = Picamera2()
-        still_config = picam2.create_still_configuration(main={"size": (RES_W, RES_H)})
-        picam2.configure(still_config)
-        picam2.start()
-        
-        time.sleep(1) # 웜업
-        
-        # 2. 메모리 스트림에 직접 촬영
+        exif = piexif.load(jpeg)
+    except Exception:
+        exif = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+    exif["0th"][piexif.ImageIFD.Orientation] = EXIF_ORIENTATION[rotation]
+    out = io.BytesIO()
+    piexif.insert(piexif.dump(exif), jpeg, out)
+    return out.getvalue()
+
+ROTATORS = {"reencode": rotate_reencode, "jpegtran": rotate_jpegtran, "exif": rotate_exif}
+
+def resolve_rotate_method(method):
+    """필요한 도구가 없으면 가능한 방식으로 대체"""
+    if method not in ("isp", *ROTATORS):
+        raise ValueError(f"알 수 없는 회전 방식: {method}")
+    if method == "jpegtran" and shutil.which("jpegtran") is None:
+        print(">>> [Camera] jpegtran이 없어 exif 방식으로 대체합니다. (apt install libjpeg-turbo-progs)")
+        method = "exif"
+    if method == "exif" and piexif is None:
+        print(">>> [Camera] piexif가 없어 reencode 방식으로 대체합니다.")
+        method = "reencode"
+    return method
+
+# ---------------------------------------------------------
+# 카메라 백엔드 (open -> capture 반복 -> close)
+# ---------------------------------------------------------
+class Picamera2Backend:
+    """Picamera2: 한 번 설정 / 시작한 뒤 계속 켜 두고 요청 시 현재 프레임을 JPEG로 저장"""
+    name = "picamera2"
+
+    def __init__(self):
+        self.picam2 = None
+
+    def open(self, rotation=0):
+        """카메라 시작 -> 센서/ISP가 처리하지 못해 남은 회전 각도 반환 (ISP는 좌우/상하 반전 = 180도만 가능)"""
+        if Picamera2 is None:
+            raise RuntimeError("Picamera2 라이브러리가 없습니다.")
+        self.picam2 = Picamera2()
+        options = {"main": {"size": (RES_W, RES_H)}}
+        remaining = rotation
+        if rotation == 180 and Transform is not None:
+            options["transform"] = Transform(hflip=1, vflip=1)
+            remaining = 0
+        still_config = self.picam2.create_still_configuration(**options)
+        self.picam2.configure(still_config)
+        # JPEG 품질: 지원하는 버전은 options로 한 번만 지정
+        if hasattr(self.picam2, "options"):
+            self.picam2.options["quality"] = QUALITY
+        self.picam2.start()
+        time.sleep(WARMUP_SEC)  # 웜업 (AE/AWB 안정화) - 열 때 한 번만
+        return remaining
+
+    def capture_array(self):
+        """인코딩 전 프레임 (still 기본 포맷 BGR888은 numpy에서 [R, G, B] 순서)"""
+        return self.picam2.capture_array("main")
+
+    def capture(self):
         image_stream = io.BytesIO()
-        
-        # --- 수정 포인트: quality 인자 호환성 처리 ---
+        if hasattr(self.picam2, "options"):
+            self.picam2.capture_file(image_stream, format="jpeg")
+            return image_stream.getvalue()
+
+        # --- quality 인자 호환성 처리 (options가 없는 구버전) ---
         try:
             # 일부 버전에서는 quality를 직접 인자로 받음
-            picam2.capture_file(image_stream, format="jpeg", quality=QUALITY)
+            self.picam2.capture_file(image_stream, format="jpeg", quality=QUALITY)
         except TypeError:
             try:
                 # 다른 버전에서는 extra_properties나 options 형태를 사용함
-                picam2.capture_file(image_stream, format="jpeg", extra_properties={"quality": QUALITY})
+                self.picam2.capture_file(image_stream, format="jpeg", extra_properties={"quality": QUALITY})
             except TypeError:
                 # 모두 안 되면 기본값으로 촬영
-                picam2.capture_file(image_stream, format="jpeg")
-        # ------------------------------------------
-        
-        # 3. 카메라 종료 (전송 전 리소스 해제)
-        picam2.stop()
-        picam2.close()
-        picam2 = None
-        
-        # 4. 스트림 위치를 처음으로 되돌려 전송 준비
-        image_stream.seek(0)
-        # 🔄 [추가] 이미지 반시계 90도 회전
-        image = Image.open(image_stream)
-        image = image.rotate(90, expand=True)  # 반시계 90도
+                self.picam2.capture_file(image_stream, format="jpeg")
+        return image_stream.getvalue()
 
-        # 새 스트림에 다시 저장
-        rotated_stream = io.BytesIO()
-        image.save(rotated_stream, format="JPEG", quality=QUALITY)
-        rotated_stream.seek(0)
+    def close(self):
+        if self.picam2:
+            try:
+                self.picam2.stop()
+                self.picam2.close()
+            except Exception:
+                pass
+            self.picam2 = None
+
+
+class FakeCameraBackend:
+    """[테스트용] 카메라 없이 촬영 시각이 바뀌는 그라데이션 JPEG 생성"""
+    name = "fake"
+
+    def __init__(self):
+        self.frame = 0
+
+    def open(self, rotation=0):
+        self.frame = 0
+        return rotation
+
+    def capture_array(self):
+        self.frame += 1
+        shade = (self.frame * 37) % 256
+        image = Image.new("RGB", (RES_W, RES_H), (40, 120 + shade // 2, shade))
+        image.paste((200, 200, 200), (0, 0, RES_W // 4, RES_H // 8))  # 방향 확인용 표시 (좌상단)
+        return np.asarray(image)
+
+    def capture(self):
+        return encode_jpeg(self.capture_array())
+
+    def close(self):
+        pass
+
+
+BACKENDS = {"picamera2": Picamera2Backend, "fake": FakeCameraBackend}
+
+
+class CameraService:
+    """
+    카메라를 한 번 열어 계속 켜 둔 채로 모니터링 / 분석 촬영에 함께 사용
+    - 촬영마다 Picamera2 생성 / 설정 / 웜업(1초) / 종료를 반복하지 않음
+    - 촬영은 한 번에 하나씩 (lock)
+    - 촬영 중 오류가 나면 카메라를 닫고 다음 촬영 때 다시 열어 복구
+    - 설치 방향 보정(ROTATION)까지 끝난 JPEG를 반환 (ROTATE_METHOD)
+    """
+    def __init__(self, backend=BACKEND, rotation=ROTATION, method=ROTATE_METHOD):
+        self.backend = BACKENDS[backend]()
+        self.rotation = rotation % 360
+        self.method = resolve_rotate_method(method) if self.rotation else "isp"
+        self._pending_rotation = self.rotation  # [isp] 센서/ISP 변환 후 남은 회전
+        self._opened = False
+        self._lock = threading.Lock()
+        self.captures = 0
+        self.reopens = 0
+        self.last_capture_sec = 0.0
+
+    def open(self):
+        """카메라 시작 (이미 열려 있으면 그대로). 실패 시 예외"""
+        with self._lock:
+            self._open()
+
+    def _open(self):
+        if not self._opened:
+            self._pending_rotation = self.backend.open(self.rotation if self.method == "isp" else 0)
+            self._opened = True
+            print(f">>> [Camera] {self.backend.name} 카메라 시작 ({RES_W}x{RES_H}, 회전 {self.rotation}도 {self.method})")
+
+    def capture_jpeg(self):
+        """현재 프레임 JPEG bytes"""
+        with self._lock:
+            if self.captures and not self._opened:
+                self.reopens += 1
+            self._open()
+            start = time.monotonic()
+            try:
+                data = self._capture_oriented()
+            except Exception:
+                self._close()
+                raise
+            self.captures += 1
+            self.last_capture_sec = time.monotonic() - start
+            return data
+
+    def _capture_oriented(self):
+        """방향 보정까지 끝난 JPEG"""
+        if self.method == "isp":
+            if not self._pending_rotation:
+                return self.backend.capture()
+            # 인코딩 전 프레임을 회전 (반시계, 배열 뷰만 바뀌고 인코딩은 1회)
+            return encode_jpeg(np.rot90(self.backend.capture_array(), k=self._pending_rotation // 90))
+        return ROTATORS[self.method](self.backend.capture(), self.rotation)
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._opened:
+            self.backend.close()
+            self._opened = False
+
+
+camera_service = CameraService()
+atexit.register(camera_service.close)
+
+def capture_and_send_live(is_db_log=False):
+    """
+    촬영 즉시 백엔드 ai.js로 전송 (메모리 방식)
+    - 켜 둔 카메라에서 바로 촬영 (웜업 대기 없음)
+    - 설치 방향 회전은 camera_service가 ROTATE_METHOD로 처리 (JPEG 재인코딩 없음)
+    """
+    try:
+        # 1~4. 켜져 있는 카메라에서 방향이 맞는 JPEG를 메모리로 바로 받음
+        image_stream = io.BytesIO(camera_service.capture_jpeg())
 
         # 5. transmitter를 통해 멀티파트 전송
         success, result = transmitter.send_camera_image(
-            rotated_stream,
+            image_stream,
             is_db_log=is_db_log
         )
         
@@ -95,12 +299,6 @@ def capture_and_send_live(is_db_log=False):
     except Exception as e:
         print(f"카메라 처리 중 오류: {e}")
         return False
-    finally:
-        if picam2:
-            try:
-                picam2.stop()
-                picam2.close()
-            except: pass
 
 if __name__ == "__main__":
     # 테스트용
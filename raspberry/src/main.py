@@ -3,6 +3,8 @@ import json
 import os
 import sys
 import io
+import queue
+import threading
 from datetime import datetime
 
 # 모듈 임포트
@@ -11,6 +13,7 @@ import ai_engine
 import transmitter
 import actuators
 import camera 
+from scheduler import Scheduler
 
 # UTF-8 강제 설정
 sys.stdout = io.TextIOWrapper(sys.stdout.detach(), encoding='utf-8', line_buffering=True)
@@ -33,10 +36,11 @@ INTERVAL_MONITOR  = config['interval'].get('monitor_cam_min', 5) * 60 # 5분
 # INTERVAL_ANALYSIS = config['interval'].get('analysis_cam_hour', 24) * 3600 # 24시간
 INTERVAL_ANALYSIS = config['interval'].get('monitor_cam_min', 5) * 720 # 테스트용 1시간
 
-# 타이머 초기화 (마지막 실행 시간)
-last_db_log_time = 0
-last_monitor_cam_time = 0
-last_analysis_cam_time = 0
+# 작업별 1회 실행 제한 시간 (넘기면 기다리지 않고 다음 주기로)
+SCHEDULER_CONFIG = config.get('scheduler', {})
+TIMEOUT_CONTROL = SCHEDULER_CONFIG.get('control_timeout_sec', INTERVAL_REALTIME)
+TIMEOUT_NETWORK = SCHEDULER_CONFIG.get('network_timeout_sec', config['server'].get('timeout', 3) + 2)
+TIMEOUT_CAMERA  = SCHEDULER_CONFIG.get('camera_timeout_sec', 25)  # 웜업 1초 + 업로드 최대 15초 + 여유
 
 # ---------------------------------------------------------
 # 2. 콘솔 색상 클래스
@@ -49,7 +53,7 @@ class C:
     BOLD = '\033[1m'      
     RESET = '\033[0m'     
 
-def print_status(data, analysis, act_msg, cam_msg, send_msg):
+def print_status(data, analysis, act_msg, cam_msg, send_msg, net_msg, sched_msg):
     # os.system('clear' if os.name == 'posix' else 'cls')
     print(f"{C.GREEN}=== CODEPONICS SMART FARM RPI ==={C.RESET}")
     print(f"🕒 현재 시간: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -58,105 +62,149 @@ def print_status(data, analysis, act_msg, cam_msg, send_msg):
     print(f"⚙️  액추에이터 : {act_msg}")
     print(f"📷 카 메 라   : {cam_msg}")
     print(f"📡 네트워크   : {send_msg}")
+    print(f"📶 전송 통계  : {net_msg}")
+    print(f"⏱️  스케줄러   : {sched_msg}")
     print("====================================")
 
 # ---------------------------------------------------------
-# 3. 메인 루프
+# 3. 주기 작업 (작업마다 독립 실행 -> 네트워크 / 카메라가 느려도 센서·제어 주기는 유지)
+# ---------------------------------------------------------
+scheduler = Scheduler()
+
+# 최신 센서 데이터 + 분석 결과 (제어 작업이 갱신, 전송 작업이 읽음)
+state_lock = threading.Lock()
+latest = {"sensor_data": None, "analysis_result": None}
+status = {"cam": "-", "realtime": "-", "db": "-"}
+
+# 펌프 작동 로그 (제어 작업은 넣기만 하고, 전송은 telemetry 작업이 담당)
+actuator_logs = queue.Queue()
+
+# 분석용 / 모니터링용 촬영이 동시에 카메라를 열지 않도록
+camera_lock = threading.Lock()
+
+def snapshot():
+    with state_lock:
+        return latest["sensor_data"], latest["analysis_result"]
+
+def control_task():
+    """[5초] 센서 수집 -> 로컬 AI 수질 분석 -> 액추에이터 제어 -> 대시보드 출력"""
+    # --- [Step 1] 데이터 수집 ---
+    sensor_data = sensors.read_all()
+
+    # --- [Step 2] 로컬 AI 수질 분석 (LGBM 등 활용) ---
+    # 위험도 산출: score가 낮거나 status가 DANGER면 즉시 보고 대상
+    analysis_result = ai_engine.analyze_water_quality(sensor_data)
+    with state_lock:
+        latest["sensor_data"] = sensor_data
+        latest["analysis_result"] = analysis_result
+
+    # --- [Step 3] 액추에이터 제어 ---
+    # 1. pH 펌프 제어
+    # 보통 [pH, EC, Temp, DO] 순서라고 가정했을 때:
+    predicted_ph = None
+    if analysis_result.get('prediction_1h'):
+        # prediction_1h가 [pH, EC, Temp, DO] 리스트라면
+        predicted_ph = round(analysis_result['prediction_1h'][0], 2)
+
+    # 예측값까지 넘겨서 제어
+    is_pump_active, pump_msg, pump_log = actuators.control_ph(
+        current_ph=sensor_data.get('ph', 7.0),
+        predicted_ph=predicted_ph
+    )
+    # 2. LED 제어
+    is_led_active, led_msg = actuators.control_led(sensor_data.get('light_percent', 0))
+
+    act_msg = f"{pump_msg} / {led_msg}"
+
+    # [중요] 액추에이터가 작동했다면 로그 전송 요청 (전송은 telemetry 작업에서, 제어는 기다리지 않음)
+    if is_pump_active and pump_log:
+        actuator_logs.put(pump_log)
+        scheduler.tasks["telemetry"].trigger()
+
+    # 이상치 발생('DANGER' / 'WARNING') 시 15분을 기다리지 않고 DB 저장
+    if analysis_result.get('status') in ['DANGER', 'WARNING']:
+        scheduler.tasks["db_log"].trigger()
+
+    # --- 대시보드 출력 ---
+    print_status(sensor_data, analysis_result, act_msg, status["cam"],
+                 f"{status['realtime']} / {status['db']}", transmitter.transport.summary(), scheduler.summary())
+
+def telemetry_task():
+    """[5초] 실시간 데이터 전송 (DB 저장 없이 프론트엔드로 소켓 브로드캐스팅) + 펌프 작동 로그 전송"""
+    while not actuator_logs.empty():
+        pump_log = actuator_logs.get_nowait()
+        log_success, _ = transmitter.send_actuator_log(pump_log)
+        if log_success:
+            print(f"{C.YELLOW}🚀 펌프 작동 로그 전송 완료{C.RESET}")
+        else:
+            print(f"{C.RED}펌프 작동 로그 전송 실패{C.RESET}")
+
+    sensor_data, analysis_result = snapshot()
+    if sensor_data is None:
+        return True  # 아직 첫 센서 값이 없음
+    rt_success, rt_res = transmitter.send_realtime_data(sensor_data, analysis_result)
+    status["realtime"] = "Realtime OK" if rt_success else "Realtime Fail"
+    return rt_success
+
+def db_log_task():
+    """[15분 / 이상 감지 시 즉시] DB 저장용 데이터 전송 (실패 시 다음 제어 주기에 재시도)"""
+    sensor_data, analysis_result = snapshot()
+    if sensor_data is None:
+        return False
+    is_emergency = analysis_result.get('status') in ['DANGER', 'WARNING']
+    reason = f"이상감지({analysis_result.get('status')})" if is_emergency else "정기보고"
+
+    db_success, db_res = transmitter.send_db_log_data(sensor_data, analysis_result)
+    status["db"] = f"DB Save OK ({reason})" if db_success else f"DB Fail ({reason})"
+    return db_success
+
+def analysis_cam_task():
+    """정밀 분석용 촬영 -> DB 저장 O, AI 분석 O (모니터링 주기도 같이 리셋)"""
+    with camera_lock:
+        status["cam"] = "분석용 촬영 중..."
+        ok = camera.capture_and_send_live(is_db_log=True)
+    status["cam"] = "분석 사진 전송 완료" if ok else "분석 촬영 실패"
+    if ok:
+        scheduler.tasks["monitor_cam"].reschedule()
+    return ok
+
+def monitor_cam_task():
+    """모니터링용 촬영 -> DB 저장 X (Blob만 업데이트), 실시간 뷰 (분석용 촬영 중이면 건너뜀)"""
+    if not camera_lock.acquire(blocking=False):
+        return True
+    try:
+        status["cam"] = "모니터링 촬영 중..."
+        ok = camera.capture_and_send_live(is_db_log=False)
+    finally:
+        camera_lock.release()
+    status["cam"] = "모니터링 전송 완료" if ok else "모니터링 실패"
+    return ok
+
+# 제어 작업이 먼저 한 번 돈 뒤 전송 작업이 최신 값을 읽도록 약간 늦게 시작
+scheduler.add("control", INTERVAL_REALTIME, control_task, timeout=TIMEOUT_CONTROL)
+scheduler.add("telemetry", INTERVAL_REALTIME, telemetry_task, timeout=TIMEOUT_NETWORK, initial_delay=1)
+scheduler.add("db_log", INTERVAL_DB_LOG, db_log_task, timeout=TIMEOUT_NETWORK,
+              retry_after=INTERVAL_REALTIME, initial_delay=1)
+scheduler.add("analysis_cam", INTERVAL_ANALYSIS, analysis_cam_task, timeout=TIMEOUT_CAMERA,
+              retry_after=INTERVAL_REALTIME, initial_delay=2)
+scheduler.add("monitor_cam", INTERVAL_MONITOR, monitor_cam_task, timeout=TIMEOUT_CAMERA,
+              retry_after=INTERVAL_REALTIME, initial_delay=INTERVAL_MONITOR)
+
+# ---------------------------------------------------------
+# 4. 메인
 # ---------------------------------------------------------
 def main():
-    global last_db_log_time, last_monitor_cam_time, last_analysis_cam_time
-    
     # 하드웨어 초기화
     actuators.setup()
+    # 카메라는 미리 켜 두고 계속 사용 (실패해도 첫 촬영 때 다시 시도)
+    try:
+        camera.camera_service.open()
+    except Exception as e:
+        print(f">>> [Camera] 시작 실패 (촬영 시 다시 시도): {e}")
     print("시스템 시작 중...")
     time.sleep(2)
 
-    while True:
-        loop_start = time.time()
-        
-        # --- [Step 1] 데이터 수집 (5초 주기) ---
-        sensor_data = sensors.read_all()
-        
-        # --- [Step 2] 로컬 AI 수질 분석 (LGBM 등 활용) ---
-        # 위험도 산출: score가 낮거나 status가 DANGER면 즉시 보고 대상
-        analysis_result = ai_engine.analyze_water_quality(sensor_data)
-        
-        # --- [Step 3] 액추에이터 제어 & 로그 전송 ---
-        act_msg = "대기 중"
-        # 1. pH 펌프 제어
-        # 보통 [pH, EC, Temp, DO] 순서라고 가정했을 때:
-        predicted_ph = None
-        if analysis_result.get('prediction_1h'):
-            # prediction_1h가 [pH, EC, Temp, DO] 리스트라면
-            predicted_ph = round(analysis_result['prediction_1h'][0], 2)
-
-        # 예측값까지 넘겨서 제어 (수정된 부분)
-        is_pump_active, pump_msg, pump_log = actuators.control_ph(
-            current_ph=sensor_data.get('ph', 7.0),
-            predicted_ph=predicted_ph
-        )
-        # 2. LED 제어
-        is_led_active, led_msg = actuators.control_led(sensor_data.get('light_percent', 0))
-        
-        act_msg = f"{pump_msg} / {led_msg}"
-
-        # [중요] 액추에이터가 작동했다면 즉시 로그 전송
-        if is_pump_active and pump_log:
-            transmitter.send_actuator_log(pump_log)
-            print(f"{C.YELLOW}🚀 펌프 작동 로그 전송 완료{C.RESET}")
-
-        # --- [Step 4] 카메라 전송 (우선순위: 분석 > 모니터링) ---
-        current_time = time.time()
-        cam_msg = "-"
-        
-        # 1. 정밀 분석용 (24시간 주기) -> DB 저장 O, AI 분석 O
-        if current_time - last_analysis_cam_time >= INTERVAL_ANALYSIS:
-            cam_msg = "분석용 촬영 중..."
-            if camera.capture_and_send_live(is_db_log=True):
-                cam_msg = "분석 사진 전송 완료"
-                last_analysis_cam_time = current_time
-                last_monitor_cam_time = current_time # 모니터링 주기도 같이 리셋
-            else:
-                cam_msg = "분석 촬영 실패"
-        
-        # 2. 모니터링용 (5분 주기) -> DB 저장 X (Blob만 업데이트), 실시간 뷰
-        elif current_time - last_monitor_cam_time >= INTERVAL_MONITOR:
-            cam_msg = "모니터링 촬영 중..."
-            if camera.capture_and_send_live(is_db_log=False):
-                cam_msg = "모니터링 전송 완료"
-                last_monitor_cam_time = current_time
-            else:
-                cam_msg = "모니터링 실패"
-
-        # --- [Step 5] 실시간 데이터 전송 (5초 주기) ---
-        # DB 저장 없이 프론트엔드로 소켓 브로드캐스팅만 함
-        rt_success, rt_res = transmitter.send_realtime_data(sensor_data, analysis_result)
-        send_msg = "Realtime OK" if rt_success else "Realtime Fail"
-
-        # --- [Step 6] DB 저장용 데이터 전송 (조건부) ---
-        # 조건 1: 15분이 지났거나
-        # 조건 2: 수질 상태가 'DANGER'(위험) 또는 'WARNING'(주의) 일 때 (이상치 발생)
-        is_emergency = analysis_result.get('status') in ['DANGER', 'WARNING']
-        is_time_up = (current_time - last_db_log_time >= INTERVAL_DB_LOG)
-
-        if is_time_up or is_emergency:
-            reason = "정기보고" if is_time_up else f"이상감지({analysis_result.get('status')})"
-            
-            db_success, db_res = transmitter.send_db_log_data(sensor_data, analysis_result)
-            
-            if db_success:
-                last_db_log_time = current_time
-                send_msg += f" / DB Save OK ({reason})"
-            else:
-                send_msg += f" / DB Fail ({reason})"
-
-        # --- 대시보드 출력 ---
-        print_status(sensor_data, analysis_result, act_msg, cam_msg, send_msg)
-
-        # 5초 주기 유지를 위한 Sleep
-        elapsed = time.time() - loop_start
-        sleep_time = max(0, INTERVAL_REALTIME - elapsed)
-        time.sleep(sleep_time)
+    scheduler.run_forever()
 
 if __name__ == "__main__":
     try:
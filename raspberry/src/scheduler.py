@@ -0,0 +1,158 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# ---------------------------------------------------------
+# 주기 작업 스케줄러 (작업마다 독립된 스레드 + 주기 + 제한 시간)
+# - 느린 작업(카메라 업로드 등)이 다른 작업(센서/제어)의 주기를 밀지 않음
+# - 주기는 시작 시각 기준 (drift 없음), 실행이 주기를 넘기면 밀린 회차는 건너뛰고 초과 횟수 집계
+# - 제한 시간을 넘긴 실행은 기다리지 않고 다음 주기로 넘어감
+#   (파이썬 스레드는 강제 종료할 수 없으므로, 끝날 때까지 그 작업의 다음 실행만 건너뜀)
+# ---------------------------------------------------------
+
+class PeriodicTask:
+    def __init__(self, name, interval, fn, timeout=None, retry_after=None, initial_delay=0.0):
+        """
+        fn: 인자 없는 함수. False를 반환하면 실패로 보고 retry_after초 뒤 다시 실행 (None이면 다음 주기)
+        timeout: 1회 실행 제한 시간(초, None이면 interval)
+        """
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.timeout = timeout or interval
+        self.retry_after = retry_after
+        self.initial_delay = initial_delay
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"task-{name}")
+        self._future = None
+        self._wake = threading.Event()
+        self._next_run = None
+        self._lock = threading.Lock()
+
+        # 지표
+        self.runs = 0          # 실행 횟수
+        self.failures = 0      # False 반환 / 예외
+        self.timeouts = 0      # 제한 시간 초과
+        self.overruns = 0      # 실행이 주기를 넘겨 다음 회차가 밀린 횟수
+        self.skipped = 0       # 건너뛴 회차 수 (주기 초과 + 이전 실행이 아직 안 끝남)
+        self.last_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def trigger(self):
+        """다음 주기를 기다리지 않고 바로 실행 (예: 이상 감지 시 즉시 DB 저장)"""
+        with self._lock:
+            self._next_run = time.monotonic()
+        self._wake.set()
+
+    def reschedule(self, delay=None):
+        """다음 실행을 지금부터 delay초 뒤로 미룸 (None이면 한 주기)"""
+        with self._lock:
+            self._next_run = time.monotonic() + (self.interval if delay is None else delay)
+        self._wake.set()
+
+    def _run_once(self):
+        """1회 실행 -> 성공 여부"""
+        if self._future is not None and not self._future.done():
+            # 제한 시간을 넘긴 이전 실행이 아직 돌고 있음 -> 겹쳐 실행하지 않음
+            self.skipped += 1
+            return False
+
+        start = time.monotonic()
+        self._future = self._executor.submit(self.fn)
+        try:
+            ok = self._future.result(timeout=self.timeout) is not False
+        except FutureTimeout:
+            self.timeouts += 1
+            print(f">>> [Scheduler] {self.name} 제한 시간 초과 ({self.timeout}초)")
+            ok = False
+        except Exception as e:
+            print(f">>> [Scheduler] {self.name} 오류: {e}")
+            ok = False
+
+        self.runs += 1
+        self.last_seconds = time.monotonic() - start
+        self.max_seconds = max(self.max_seconds, self.last_seconds)
+        if not ok:
+            self.failures += 1
+        return ok
+
+    def loop(self, stop):
+        with self._lock:
+            self._next_run = time.monotonic() + self.initial_delay
+        while not stop.is_set():
+            with self._lock:
+                wait = self._next_run - time.monotonic()
+            if wait > 0:
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+
+            with self._lock:
+                scheduled = self._next_run
+            ok = self._run_once()
+
+            with self._lock:
+                if self._next_run != scheduled:
+                    continue  # 실행 중에 trigger() / reschedule()로 다음 실행이 정해짐
+                now = time.monotonic()
+                if not ok and self.retry_after is not None:
+                    self._next_run = now + self.retry_after
+                    continue
+                self._next_run = scheduled + self.interval
+                if now > self._next_run:
+                    # 주기 초과: 밀린 회차는 건너뛰고 다음 정시에 실행
+                    missed = int((now - self._next_run) // self.interval) + 1
+                    self.overruns += 1
+                    self.skipped += missed
+                    self._next_run += missed * self.interval
+
+    def shutdown(self):
+        self._wake.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "interval": self.interval, "runs": self.runs, "failures": self.failures,
+            "timeouts": self.timeouts, "overruns": self.overruns, "skipped": self.skipped,
+            "last_sec": round(self.last_seconds, 2), "max_sec": round(self.max_seconds, 2),
+        }
+
+
+class Scheduler:
+    def __init__(self):
+        self.tasks = {}
+        self._threads = []
+        self._stop = threading.Event()
+
+    def add(self, name, interval, fn, **options):
+        task = PeriodicTask(name, interval, fn, **options)
+        self.tasks[name] = task
+        return task
+
+    def start(self):
+        for task in self.tasks.values():
+            thread = threading.Thread(target=task.loop, args=(self._stop,), name=f"sched-{task.name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def run_forever(self):
+        """Ctrl+C(KeyboardInterrupt)까지 대기"""
+        self.start()
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        for task in self.tasks.values():
+            task.shutdown()
+
+    def summary(self):
+        """대시보드용 한 줄 요약 (작업별 최근 실행 시간 / 주기 초과 / 제한 시간 초과)"""
+        return " | ".join(
+            f"{name} {t.last_seconds:.1f}s" + (f" 초과{t.overruns}" if t.overruns else "")
+            + (f" 타임아웃{t.timeouts}" if t.timeouts else "")
+            for name, t in self.tasks.items()
+        )
@@ -1,7 +1,10 @@
 import requests
+import gzip
 import json
 import os
+import threading
 import time
+from requests.adapters import HTTPAdapter
 
 # 1. 설정 및 경로 초기화
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -28,6 +31,106 @@ PHOTO_URL = SENSOR_URL.replace("/api/sensors/report", "/api/ai/pi-photo")
 SERIAL_NUMBER = config['device']['serial_number']
 TIMEOUT = config['server'].get('timeout', 3)
 
+# 전송 계층 설정
+TRANSPORT_CONFIG = config.get('transport', {})
+GZIP_MIN_BYTES = TRANSPORT_CONFIG.get('gzip_min_bytes', 256)   # 이보다 작은 본문은 압축하지 않음
+
+# ------------------------------------------------------------------
+# [전송 계층] keep-alive 세션 + gzip 본문 + 엔드포인트별 통계
+# ------------------------------------------------------------------
+class Transport:
+    """
+    - 스레드마다 requests.Session 1개를 유지 (스케줄러 작업 스레드별 keep-alive 연결 재사용)
+    - JSON 본문은 공백 없이 직렬화 + gzip(Content-Encoding)으로 전송 (백엔드 express.json()이 자동 해제)
+    - 엔드포인트별 요청 수 / 실패 수 / 지연 / 원본·전송·수신 바이트 집계
+    """
+    def __init__(self, gzip_min_bytes=GZIP_MIN_BYTES):
+        self.gzip_min_bytes = gzip_min_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            # 연결이 끊긴 keep-alive 소켓 재사용 실패는 1회 재연결
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=2, max_retries=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def post_json(self, endpoint, url, payload, timeout):
+        """payload(dict)를 JSON + gzip으로 POST -> response (네트워크 오류는 예외)"""
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        raw_bytes = len(body)
+        headers = {"Content-Type": "application/json"}
+        if raw_bytes >= self.gzip_min_bytes:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        return self._send(endpoint, raw_bytes, len(body), lambda: self.session().post(
+            url, data=body, headers=headers, timeout=timeout))
+
+    def post_multipart(self, endpoint, url, data, files, timeout):
+        """멀티파트 업로드 (이미 압축된 JPEG이므로 gzip 없음)"""
+        size = sum(len(v) for v in data.values())
+        for _, stream, _ in files.values():
+            size += len(stream.getbuffer())
+        return self._send(endpoint, size, size, lambda: self.session().post(
+            url, data=data, files=files, timeout=timeout))
+
+    def _send(self, endpoint, raw_bytes, sent_bytes, do_post):
+        start = time.monotonic()
+        response = None
+        try:
+            response = do_post()
+            return response
+        finally:
+            ok = response is not None and response.status_code in [200, 201]
+            received = len(response.content) if response is not None else 0
+            self._record(endpoint, time.monotonic() - start, ok, raw_bytes, sent_bytes, received)
+
+    def _record(self, endpoint, seconds, ok, raw_bytes, sent_bytes, received):
+        with self._lock:
+            stat = self._stats.setdefault(endpoint, {
+                "requests": 0, "failures": 0, "total_sec": 0.0, "max_sec": 0.0, "last_sec": 0.0,
+                "raw_bytes": 0, "sent_bytes": 0, "received_bytes": 0,
+            })
+            stat["requests"] += 1
+            stat["failures"] += 0 if ok else 1
+            stat["total_sec"] += seconds
+            stat["last_sec"] = seconds
+            stat["max_sec"] = max(stat["max_sec"], seconds)
+            stat["raw_bytes"] += raw_bytes
+            stat["sent_bytes"] += sent_bytes
+            stat["received_bytes"] += received
+
+    def stats(self):
+        """엔드포인트별 통계 (평균 지연 ms, 압축률 포함)"""
+        with self._lock:
+            result = {}
+            for endpoint, stat in self._stats.items():
+                result[endpoint] = dict(
+                    stat,
+                    avg_ms=round(stat["total_sec"] / stat["requests"] * 1000, 1),
+                    compression=round(stat["sent_bytes"] / stat["raw_bytes"], 2) if stat["raw_bytes"] else None,
+                )
+            return result
+
+    def summary(self):
+        """대시보드용 한 줄 요약 (엔드포인트별 최근 지연 / 평균 전송 크기 / 실패 수)"""
+        parts = []
+        for endpoint, stat in self.stats().items():
+            avg_kb = stat["sent_bytes"] / stat["requests"] / 1024
+            part = f"{endpoint} {stat['last_sec'] * 1000:.0f}ms {avg_kb:.1f}KB"
+            if stat["failures"]:
+                part += f" 실패{stat['failures']}"
+            parts.append(part)
+        return " | ".join(parts) or "-"
+
+transport = Transport()
+
 def map_data_to_backend_format(sensor_data, analysis_result):
     """센서 원본 데이터를 백엔드 DB 구조에 맞게 매핑"""
     return {
@@ -62,7 +165,7 @@ def send_realtime_data(sensor_data, analysis_result):
         "sensor_data": formatted_data,
         "water_analysis": water_analysis_payload
     }
-    return _post_request(SENSOR_URL, payload)
+    return _post_request(SENSOR_URL, payload, "realtime")
 
 # ------------------------------------------------------------------
 # [기능 2] DB 저장용 데이터 전송 (15분 주기 or 이상 감지 시)
@@ -83,7 +186,7 @@ def send_db_log_data(sensor_data, analysis_result):
         "sensor_data": formatted_data,
         "water_analysis": water_analysis_payload
     }
-    return _post_request(SENSOR_URL, payload)
+    return _post_request(SENSOR_URL, payload, "db_log")
 
 # ------------------------------------------------------------------
 # [기능 3] 액추에이터 로그 전송 (작동 시 즉시)
@@ -96,7 +199,7 @@ def send_actuator_log(log_data):
         "duration_sec": log_data['duration_sec'],
         "reason": log_data['reason']
     }
-    return _post_request(ACTUATOR_URL, payload)
+    return _post_request(ACTUATOR_URL, payload, "actuator_log")
 
 # ------------------------------------------------------------------
 # [기능 4] 카메라 이미지 전송 (5분/24시간 주기)
@@ -116,7 +219,7 @@ def send_camera_image(image_stream, is_db_log=False):
     
     try:
         # 이미지 전송은 크기가 크므로 timeout을 넉넉하게 설정
-        response = requests.post(PHOTO_URL, data=data, files=files, timeout=15)
+        response = transport.post_multipart("camera", PHOTO_URL, data, files, timeout=15)
         if response.status_code in [200, 201]:
             return True, response.json()
         else:
@@ -124,10 +227,10 @@ def send_camera_image(image_stream, is_db_log=False):
     except Exception as e:
         return False, str(e)
 
-def _post_request(url, payload, timeout=3):
-    """공통 POST 요청 헬퍼 함수 (JSON 방식)"""
+def _post_request(url, payload, endpoint, timeout=3):
+    """공통 POST 요청 헬퍼 함수 (keep-alive 세션 + gzip, 통계는 endpoint 이름별로 집계)"""
     try:
-        response = requests.post(url, json=payload, timeout=timeout)
+        response = transport.post_json(endpoint, url, payload, timeout)
         if response.status_code in [200, 201]:
             return True, "Success"
         else:
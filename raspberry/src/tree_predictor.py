@@ -0,0 +1,151 @@
+import numpy as np
+
+# =========================================================
+# LightGBM 트리 앙상블 NumPy 예측기 (pandas / DataFrame 없이 예측)
+# - booster.dump_model()의 트리 구조를 노드 배열로 펼쳐 두고,
+#   입력 행렬의 모든 행 x 모든 트리를 깊이 단위로 한 번에 내려가며 평가
+# - LightGBM C++ 예측과 같은 규칙(수치 분기 <=, 결측 처리, 트리 순서대로 double 누적)이라
+#   결과가 model.predict(DataFrame)와 비트 단위로 같음 (변환 시 검증)
+# - 변환한 배열을 .npz로 저장해 두면 라즈베리파이에서는 numpy만으로 예측 가능
+#   (pandas / scikit-learn / lightgbm import 불필요 -> 시작 시간과 메모리 절약)
+# =========================================================
+ZERO_THRESHOLD = 1e-35  # LightGBM kZeroThreshold
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+_MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+
+
+class FeatureOrderError(ValueError):
+    """모델의 학습 Feature 순서가 코드에서 기대하는 순서와 다름"""
+
+
+class TreeEnsemble:
+    """
+    단일 출력 LightGBM 회귀 모델의 NumPy 예측기
+    predict(X): X는 학습 Feature 순서의 (n, f) 또는 (f,) 배열 -> (n,) float64
+    리프도 노드 배열에 함께 저장하고 자기 자신을 가리키게 해서(left = right = 자기 인덱스),
+    max_depth번 반복하면 모든 트리가 리프에 도착함 (행/트리별 분기 없이 배열 연산만 사용)
+    """
+
+    _FIELDS = ("roots", "split_feature", "threshold", "left", "right",
+               "default_left", "missing_type", "value", "max_depth")
+
+    def __init__(self, feature_names, roots, split_feature, threshold, left, right,
+                 default_left, missing_type, value, max_depth):
+        self.feature_names = list(feature_names)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.split_feature = np.asarray(split_feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int64)
+        self.right = np.asarray(right, dtype=np.int64)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.missing_type = np.asarray(missing_type, dtype=np.int8)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.max_depth = int(max_depth)
+        self._has_missing_rule = bool(np.any(self.missing_type != MISSING_NONE))
+
+    @classmethod
+    def from_booster(cls, booster, expected_features=None):
+        """
+        lightgbm.Booster -> TreeEnsemble
+        expected_features가 주어지면 모델의 Feature 순서와 비교 (다르면 FeatureOrderError)
+        """
+        dump = booster.dump_model()
+        names = dump.get("feature_names") or []
+        if expected_features is not None and list(expected_features) != list(names):
+            raise FeatureOrderError(f"feature order mismatch: model={names} expected={list(expected_features)}")
+        if dump.get("num_tree_per_iteration", 1) != 1 or dump.get("average_output"):
+            raise NotImplementedError("단일 출력 gbdt 회귀 모델만 지원")
+        if not str(dump.get("objective", "regression")).startswith("regression"):
+            raise NotImplementedError(f"지원하지 않는 objective: {dump.get('objective')}")
+
+        arrays = {k: [] for k in ("split_feature", "threshold", "left", "right",
+                                  "default_left", "missing_type", "value")}
+        max_depth = 0
+
+        def add(node, depth):
+            nonlocal max_depth
+            idx = len(arrays["value"])
+            is_leaf = "split_index" not in node
+            if not is_leaf and node["decision_type"] != "<=":
+                raise NotImplementedError("범주형 분기는 지원하지 않음")
+            arrays["split_feature"].append(0 if is_leaf else node["split_feature"])
+            arrays["threshold"].append(0.0 if is_leaf else node["threshold"])
+            arrays["default_left"].append(True if is_leaf else node["default_left"])
+            arrays["missing_type"].append(MISSING_NONE if is_leaf else _MISSING_TYPES[node["missing_type"]])
+            arrays["value"].append(node.get("leaf_value", 0.0) if is_leaf else 0.0)
+            arrays["left"].append(idx)
+            arrays["right"].append(idx)
+            if is_leaf:
+                max_depth = max(max_depth, depth)
+            else:
+                arrays["left"][idx] = add(node["left_child"], depth + 1)
+                arrays["right"][idx] = add(node["right_child"], depth + 1)
+            return idx
+
+        roots = [add(tree["tree_structure"], 0) for tree in dump["tree_info"]]
+        return cls(names, roots, max_depth=max_depth, **arrays)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != len(self.feature_names):
+            raise ValueError(f"expected {len(self.feature_names)} features, got {X.shape[1]}")
+
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            fval = X[rows, self.split_feature[node]]
+            if self._has_missing_rule:
+                missing = self.missing_type[node]
+                nan = np.isnan(fval)
+                # LightGBM: missing_type이 NaN이 아니면 NaN 입력은 0으로 취급
+                fval = np.where(nan & (missing != MISSING_NAN), 0.0, fval)
+                use_default = (((missing == MISSING_ZERO) & (np.abs(fval) <= ZERO_THRESHOLD))
+                               | ((missing == MISSING_NAN) & nan))
+                go_left = np.where(use_default, self.default_left[node], fval <= self.threshold[node])
+            else:
+                # 결측 규칙이 None뿐이면 NaN -> 0 변환만 필요
+                fval = np.nan_to_num(fval, nan=0.0, posinf=np.inf, neginf=-np.inf)
+                go_left = fval <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        # 트리 순서대로 하나씩 누적 (np.sum의 pairwise 합산은 마지막 비트가 달라질 수 있음)
+        return np.add.accumulate(self.value[node], axis=1)[:, -1]
+
+    # -----------------------------------------------------
+    # 저장 / 로드 (lightgbm 없이 NumPy만으로 예측하기 위한 캐시)
+    # -----------------------------------------------------
+    def to_arrays(self, prefix=""):
+        out = {f"{prefix}{k}": np.asarray(getattr(self, k)) for k in self._FIELDS}
+        out[f"{prefix}feature_names"] = np.array(self.feature_names)
+        return out
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix=""):
+        return cls([str(n) for n in arrays[f"{prefix}feature_names"]],
+                   **{k: arrays[f"{prefix}{k}"] for k in cls._FIELDS})
+
+
+def probe_matrix(ensembles, rows=256, seed=0):
+    """
+    검증용 입력: 각 Feature의 분기 임계값과 그 바로 위/아래 값을 섞은 행렬
+    (경계값에서 <= 비교가 어긋나지 않는지 확인)
+    """
+    n_features = len(ensembles[0].feature_names)
+    rng = np.random.default_rng(seed)
+    X = np.zeros((rows, n_features))
+    for f in range(n_features):
+        thresholds = np.concatenate([
+            e.threshold[(e.split_feature == f) & (e.left != np.arange(len(e.left)))] for e in ensembles
+        ])
+        if thresholds.size == 0:
+            continue
+        candidates = np.concatenate([thresholds, np.nextafter(thresholds, np.inf), np.nextafter(thresholds, -np.inf)])
+        X[:, f] = rng.choice(candidates, size=rows)
+    return X
+
+
+def verify_bit_exact(ensemble, booster, X):
+    """NumPy 예측과 LightGBM 예측이 비트 단위로 같은지 확인"""
+    return np.array_equal(ensemble.predict(X), booster.predict(X))